@@ -5,8 +5,459 @@
 #              the rules for check or checkmate.  This program also does not include the rules for castling, en passant,
 #              or pawn promotion.  The winner is declared when all pieces of one type are captured. For example, if all
 #              the black pawns are captured, then white wins the game.
-import copy
+import random
 import string
+import struct
+from array import array
+
+# One-character piece symbols, white pieces are capitalized, black pieces are lowercase, N stands for knight
+PIECE_SYMBOLS = "PRNBQKprnbqk"
+
+
+# What can be stored on a square, by its str(), to the one-character symbol kept for it
+_SQUARE_SYMBOLS = {**{symbol: symbol for symbol in PIECE_SYMBOLS}, ".": "", "": ""}
+
+
+def _piece_symbol(piece):
+    """
+    Converts whatever is stored on a square (piece object, symbol, "." or None) to its one-character symbol
+    :param piece: the piece, symbol or empty marker
+    :return: the piece symbol, or "" for an empty square
+    :raises ValueError: if piece is not a piece, a piece symbol or an empty marker
+    """
+    if piece is None:
+        return ""
+    symbol = _SQUARE_SYMBOLS.get(str(piece))
+    if symbol is None:
+        raise ValueError("not a piece or an empty square: %r" % (piece,))
+    return symbol
+
+
+def _symbol_color(symbol):
+    """
+    Gets the color of a piece symbol
+    :param symbol: one-character piece symbol
+    :return: "WHITE" or "BLACK"
+    """
+    return "WHITE" if symbol.isupper() else "BLACK"
+
+
+# 4-bit code for each piece symbol, the 8 bit marks black pieces and 0 is an empty square
+PIECE_CODES = {"": 0, "P": 1, "R": 2, "N": 3, "B": 4, "Q": 5, "K": 6,
+               "p": 9, "r": 10, "n": 11, "b": 12, "q": 13, "k": 14}
+CODE_SYMBOLS = [{code: symbol for symbol, code in PIECE_CODES.items()}.get(code, "") for code in range(16)]
+
+GAME_STATES = ("UNFINISHED", "WHITE_WON", "BLACK_WON")
+_GAME_STATE_CODES = {state: code for code, state in enumerate(GAME_STATES)}
+
+
+def square_name(row, col):
+    """
+    Converts a row and column to an algebraic square name
+    :param row: row of the square, 0 is row 1
+    :param col: column of the square, 0 is column a
+    :return: the square name, for example "e2"
+    """
+    return string.ascii_lowercase[col] + str(row + 1)
+
+
+def parse_square(point):
+    """
+    Converts an algebraic square name to a row and column
+    :param point: the square name, for example "e2"
+    :return: tuple of (row, col)
+    """
+    return int(point[1:]) - 1, ord(point[0]) - ord('a')
+
+
+def pack_move(start, end, moved, captured, turn, state):
+    """
+    Packs a move record into one 64-bit integer so the move history grows by 8 bytes per move
+    bits 0-7 start square, 8-15 end square, 16-19 moved piece code, 20-23 captured piece code,
+    24-25 game state before the move, 26 and up the turn number before the move
+    :param start: start square index
+    :param end: end square index
+    :param moved: code of the moved piece
+    :param captured: code of the captured piece, 0 if none
+    :param turn: turn number before the move
+    :param state: game state before the move
+    :return: the packed move record
+    """
+    return start | end << 8 | moved << 16 | captured << 20 | _GAME_STATE_CODES[state] << 24 | turn << 26
+
+
+def unpack_move(record):
+    """
+    Unpacks a move record made by pack_move
+    :param record: the packed move record
+    :return: tuple of (start, end, moved, captured, turn, state)
+    """
+    return (record & 0xFF, record >> 8 & 0xFF, record >> 16 & 0xF, record >> 20 & 0xF, record >> 26,
+            GAME_STATES[record >> 24 & 0x3])
+
+
+# Packed positions: the 64 squares as 4-bit piece codes (32 bytes, two squares per byte, square 0 in the high
+# half of the first byte) followed by a little-endian 32-bit word holding the turn and, in its top two bits,
+# the game state.  The player to move follows from the turn number
+BOARD_BYTES = 32
+POSITION_BYTES = BOARD_BYTES + 4
+_TURN_STATE = struct.Struct("<I")
+
+# Translation tables between board strings, one character per square with "." for empty, and hex digits of the
+# piece codes, so whole boards are packed and unpacked by bytes.fromhex and bytes.hex instead of square by square
+_HEX_FROM_SQUARE = str.maketrans(".PRNBQKprnbqk", "0123456" + "9abcde")
+_SQUARE_FROM_HEX = str.maketrans("0123456789abcdef", ".PRNBQK??prnbqk?")
+
+
+def _board_string(symbols):
+    """
+    Joins a flat list of square symbols into a board string, one character per square and "." for an empty
+    square, without looping over the squares in Python
+    :param symbols: list of piece symbols, "" for an empty square
+    :return: the board string
+    """
+    text = "|" + "|".join(symbols) + "|"  # an empty square shows up as "||"
+    return text.replace("||", "|.|").replace("||", "|.|").replace("|", "")
+
+
+def render_board(board_string, geometry=None):
+    """
+    Draws a board as text in one string, instead of printing it square by square: the column letters, then one line
+    per row from the top row down with its number
+    :param board_string: board string as made by GameBoard.get_board_string
+    :param geometry: optional BoardGeometry of the board, defaults to the standard 8x8 board
+    :return: the drawing, every line ending in a newline
+    """
+    geometry = geometry or STANDARD_GEOMETRY
+    rows, cols = geometry.rows, geometry.cols
+    width = len(str(rows))  # ranks past 9 take two digits
+    lines = [" " * width + " " + " ".join(string.ascii_lowercase[:cols])]
+    for row in range(rows - 1, -1, -1):
+        lines.append(str(row + 1).rjust(width) + " " + " ".join(board_string[row * cols:(row + 1) * cols]) + " ")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def _board_fen(board_string, geometry):
+    """
+    Writes a board string in FEN style, see GameBoard.to_fen
+    :param board_string: board string as made by GameBoard.get_board_string
+    :param geometry: BoardGeometry of the board
+    :return: the board text, for example "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR"
+    """
+    cols = geometry.cols
+    rows = []
+    for row in range(geometry.rows - 1, -1, -1):
+        row_text = ""
+        empty = 0
+        for square in board_string[row * cols:(row + 1) * cols]:
+            if square == ".":
+                empty += 1
+                continue
+            if empty:
+                row_text += str(empty)
+                empty = 0
+            row_text += square
+        rows.append(row_text + (str(empty) if empty else ""))
+    return "/".join(rows)
+
+
+def _position_fen(board_fen, turn, state):
+    """
+    Adds the player to move, the turn number and a finished game's state to the board part of a FEN style text
+    :param board_fen: the board text
+    :param turn: turn number, white moves on odd turns and black on even turns
+    :param state: game state
+    :return: the position text, see ChessVar.to_fen
+    """
+    fen = "%s %s %d" % (board_fen, "w" if turn % 2 == 1 else "b", turn)
+    return fen if state == "UNFINISHED" else fen + " " + state
+
+
+def _fen_board_string(fen):
+    """
+    Converts the board part of a FEN style text to a board string
+    :param fen: rows from the top one down to 1 separated by "/", for example
+                "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR".  Empty runs may take several digits, like "10"
+    :return: tuple of (BoardGeometry, board string), the size is the number of rows and the width of the first one
+    """
+    rows = fen.split("/")
+    squares = []
+    width = None
+    for row_text in reversed(rows):  # the text starts with the top row
+        row = []
+        empty = ""
+        for char in row_text + " ":
+            if char.isdigit():
+                empty += char
+                continue
+            if empty:
+                row.append("." * int(empty))
+                empty = ""
+            if char != " ":
+                if char not in PIECE_SYMBOLS:
+                    raise ValueError("unknown piece %r in FEN board: %s" % (char, fen))
+                row.append(char)
+        row_text = "".join(row)
+        if width is None:
+            width = len(row_text)
+        if len(row_text) != width:
+            raise ValueError("every FEN row must cover the same number of squares: " + fen)
+        squares.append(row_text)
+    return BoardGeometry(len(rows), width), "".join(squares)
+
+
+def validate_moves(position, moves):
+    """
+    Checks many moves against one position at once, see GameBoard.validate_moves
+    :param position: a GameBoard or a ChessVar game
+    :param moves: sequence of (start, end) pairs, each square a name like "e2" or a (row, col) tuple
+    :return: list of True or False, one per move
+    """
+    board = position.get_game_board() if isinstance(position, ChessVar) else position
+    return board.validate_moves(moves)
+
+
+def pack_boards(board_strings):
+    """
+    Packs board strings into 32 bytes each
+    :param board_strings: iterable of 64-character board strings
+    :return: the packed bytes
+    """
+    return bytes.fromhex("".join(board_strings).translate(_HEX_FROM_SQUARE))
+
+
+def unpack_boards(data):
+    """
+    Unpacks boards packed by pack_boards
+    :param data: bytes, a multiple of 32 long
+    :return: list of 64-character board strings
+    """
+    if len(data) % BOARD_BYTES:
+        raise ValueError("packed boards must be a multiple of %d bytes" % BOARD_BYTES)
+    text = bytes(data).hex().translate(_SQUARE_FROM_HEX)
+    if "?" in text:
+        raise ValueError("packed boards contain an unknown piece code")
+    return [text[index:index + 64] for index in range(0, len(text), 64)]
+
+
+def encode_positions(games):
+    """
+    Packs many games' positions, POSITION_BYTES per game
+    :param games: iterable of ChessVar games
+    :return: the packed bytes
+    :raises ValueError: if a game is not on the standard 8x8 board
+    """
+    games = list(games)
+    if any(game.get_game_board().get_geometry() is not STANDARD_GEOMETRY for game in games):
+        raise ValueError("only 8x8 positions can be packed")
+    boards = pack_boards([_board_string(game.get_game_board().get_symbols()) for game in games])
+    turns = [_TURN_STATE.pack(game.get_current_turn() | _GAME_STATE_CODES[game.get_game_state()] << 30)
+             for game in games]
+    return b"".join(boards[index * BOARD_BYTES:(index + 1) * BOARD_BYTES] + turns[index]
+                    for index in range(len(games)))
+
+
+def unpack_positions(data):
+    """
+    Unpacks positions packed by encode_positions without building any board or piece objects
+    :param data: bytes, a multiple of POSITION_BYTES long
+    :return: list of (board string, turn, game state) tuples
+    """
+    if len(data) % POSITION_BYTES:
+        raise ValueError("packed positions must be a multiple of %d bytes" % POSITION_BYTES)
+    view = memoryview(data)
+    count = len(data) // POSITION_BYTES
+    boards = unpack_boards(b"".join(view[index * POSITION_BYTES:index * POSITION_BYTES + BOARD_BYTES]
+                                    for index in range(count)))
+    positions = []
+    for index, (word,) in enumerate(_TURN_STATE.iter_unpack(b"".join(
+            view[index * POSITION_BYTES + BOARD_BYTES:(index + 1) * POSITION_BYTES] for index in range(count)))):
+        positions.append((boards[index], word & 0x3FFFFFFF, GAME_STATES[word >> 30]))
+    return positions
+
+
+def decode_positions(data, board_class=None):
+    """
+    Unpacks positions packed by encode_positions into games
+    :param data: bytes, a multiple of POSITION_BYTES long
+    :param board_class: GameBoard backend of the games, defaults to GameBoard
+    :return: list of ChessVar games
+    """
+    return [ChessVar.from_board_string(board, turn, state, board_class)
+            for board, turn, state in unpack_positions(data)]
+
+
+# Zobrist keys, one random 64-bit number per piece code and square plus one for black to move.  The seed is fixed
+# so keys are the same in every process and can be stored on disk
+_zobrist_random = random.Random(20231209)
+ZOBRIST_KEYS = [[_zobrist_random.getrandbits(64) if code else 0 for _ in range(64)] for code in range(16)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+del _zobrist_random
+
+
+# Steps of the pieces that jump or slide, as (row, col) offsets
+KNIGHT_STEPS = ((2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2))
+ROOK_STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+BISHOP_STEPS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+MAX_SQUARES = 256  # move records keep each square in 8 bits
+
+
+class _BetweenMasks(dict):
+    """
+    The squares strictly between two squares on one line, looked up as between_masks[start][end].  The entries of a
+    start square are built the first time it is looked up and only cover the ends on its lines, so no board builds
+    a squares * squares table
+    """
+
+    __slots__ = ("_queen_rays",)
+
+    def __init__(self, queen_rays):
+        """
+        :param queen_rays: the geometry's queen_rays
+        """
+        super().__init__()
+        self._queen_rays = queen_rays
+
+    def __missing__(self, start):
+        masks = {}  # end square -> mask of the squares before it on the ray
+        for ray in self._queen_rays[start]:
+            mask = 0
+            for _, _, end in ray:
+                masks[end] = mask
+                mask |= 1 << end
+        self[start] = masks
+        return masks
+
+
+class BoardGeometry:
+    """
+    Size of a board and the move tables built for it.  Square (row, col) is index row * cols + col, and the same bit
+    of the masks.  There is one shared, immutable geometry for each size, built the first time it is asked for, so
+    validating a move costs the same on any board: it follows the piece's jumps and rays, never the whole board
+    """
+
+    __slots__ = ("rows", "cols", "squares", "knight_jumps", "king_jumps", "rook_rays", "bishop_rays", "queen_rays",
+                 "knight_masks", "king_masks", "rook_lines", "bishop_lines", "between_masks", "zobrist_keys",
+                 "_start_position")
+    _instances = {}  # (rows, cols) -> the shared geometry
+
+    def __new__(cls, rows=8, cols=8):
+        """
+        Gets the geometry of a board size
+        :param rows: number of rows, at least 4
+        :param cols: number of columns, 2 to 26 so each has a letter
+        """
+        geometry = cls._instances.get((rows, cols))
+        if geometry is None:
+            if rows < 4 or not 2 <= cols <= 26 or rows * cols > MAX_SQUARES:
+                raise ValueError("a board has at least 4 rows, 2 to 26 columns and at most %d squares" % MAX_SQUARES)
+            geometry = object.__new__(cls)
+            geometry._build(rows, cols)
+            cls._instances[(rows, cols)] = geometry
+        return geometry
+
+    def _build(self, rows, cols):
+        """
+        Builds the move tables, masks and Zobrist keys of the board size
+        :param rows: number of rows
+        :param cols: number of columns
+        """
+        self.rows, self.cols, self.squares = rows, cols, rows * cols
+        squares = range(self.squares)
+        distance = max(rows, cols) - 1
+
+        # each entry is a (row, col, square) target of the given square, rays are ordered outward from it
+        self.knight_jumps = [[ray[0] for ray in self._targets(sq, KNIGHT_STEPS, 1) if ray] for sq in squares]
+        self.king_jumps = [[ray[0] for ray in self._targets(sq, ROOK_STEPS + BISHOP_STEPS, 1) if ray] for sq in squares]
+        self.rook_rays = [[ray for ray in self._targets(sq, ROOK_STEPS, distance) if ray] for sq in squares]
+        self.bishop_rays = [[ray for ray in self._targets(sq, BISHOP_STEPS, distance) if ray] for sq in squares]
+        self.queen_rays = [self.rook_rays[sq] + self.bishop_rays[sq] for sq in squares]
+
+        self.knight_masks = [sum(1 << end for _, _, end in jumps) for jumps in self.knight_jumps]
+        self.king_masks = [sum(1 << end for _, _, end in jumps) for jumps in self.king_jumps]
+        self.rook_lines = [sum(1 << end for ray in rays for _, _, end in ray) for rays in self.rook_rays]
+        self.bishop_lines = [sum(1 << end for ray in rays for _, _, end in ray) for rays in self.bishop_rays]
+
+        # between_masks[start][end] holds the squares strictly between two squares on one line
+        self.between_masks = _BetweenMasks(self.queen_rays)
+
+        if (rows, cols) == (8, 8):
+            self.zobrist_keys = ZOBRIST_KEYS
+        else:  # fixed seed for each size, so the keys match across processes like the standard ones
+            rng = random.Random("20231209 %dx%d" % (rows, cols))
+            self.zobrist_keys = [[rng.getrandbits(64) if code else 0 for _ in squares] for code in range(16)]
+        self._start_position = None
+
+    def _targets(self, sq, steps, max_distance):
+        """
+        Lists the squares reached from a square along each step, stopping at the edge of the board
+        :param sq: starting square index
+        :param steps: (row, col) step of each direction
+        :param max_distance: how many times each step is repeated, 1 for jumps
+        :return: one list of (row, col, square) targets per step, ordered outward from the square
+        """
+        rays = []
+        for row_step, col_step in steps:
+            ray = []
+            row, col = sq // self.cols + row_step, sq % self.cols + col_step
+            while 0 <= row < self.rows and 0 <= col < self.cols and len(ray) < max_distance:
+                ray.append((row, col, row * self.cols + col))
+                row += row_step
+                col += col_step
+            rays.append(ray)
+        return rays
+
+    def contains(self, row, col):
+        """
+        Checks if a square is on the board
+        :param row: row of the square
+        :param col: column of the square
+        :return: True if the square is on the board
+        """
+        return 0 <= row < self.rows and 0 <= col < self.cols
+
+    @property
+    def start_position(self):
+        """
+        The starting Position of this size: the queen and king in the middle of each back row with bishops, knights
+        and rooks repeating outward from them, and a row of pawns in front.  On 8x8 it is the usual setup
+        """
+        if self._start_position is None:
+            back_row = [""] * self.cols
+            queen = (self.cols - 1) // 2
+            back_row[queen:queen + 2] = "QK"
+            for offset in range(queen):
+                back_row[queen - 1 - offset] = "BNR"[offset % 3]
+            for offset in range(self.cols - queen - 2):
+                back_row[queen + 2 + offset] = "BNR"[offset % 3]
+            back_row = "".join(back_row)
+
+            empty_rows = "." * self.cols * (self.rows - 4)
+            self._start_position = Position(back_row + "P" * self.cols + empty_rows + "p" * self.cols +
+                                            back_row.lower(), geometry=self)
+        return self._start_position
+
+    def __reduce__(self):
+        return BoardGeometry, (self.rows, self.cols)
+
+    def __repr__(self):
+        return "BoardGeometry(%d, %d)" % (self.rows, self.cols)
+
+
+# The standard board, and its tables under their 8x8 names
+STANDARD_GEOMETRY = BoardGeometry(8, 8)
+KNIGHT_MASKS = STANDARD_GEOMETRY.knight_masks
+KING_MASKS = STANDARD_GEOMETRY.king_masks
+ROOK_LINES = STANDARD_GEOMETRY.rook_lines
+BISHOP_LINES = STANDARD_GEOMETRY.bishop_lines
+BETWEEN_MASKS = STANDARD_GEOMETRY.between_masks
+KNIGHT_JUMPS = STANDARD_GEOMETRY.knight_jumps
+KING_JUMPS = STANDARD_GEOMETRY.king_jumps
+ROOK_RAYS = STANDARD_GEOMETRY.rook_rays
+BISHOP_RAYS = STANDARD_GEOMETRY.bishop_rays
+QUEEN_RAYS = STANDARD_GEOMETRY.queen_rays
 
 
 class GameBoard:
@@ -14,53 +465,109 @@ class GameBoard:
     initializes the game board, and communicates with the ChessVar class
     """
 
-    def __init__(self):
+    _geometry = STANDARD_GEOMETRY  # boards of other sizes set their own
+    _attack_map = None  # AttackMap kept up to date by set_piece, made by get_attack_map
 
+    def __init__(self, geometry=None):
+        """
+        :param geometry: optional BoardGeometry of the board, defaults to the standard 8x8 board
+        """
+        if geometry is not None and geometry is not STANDARD_GEOMETRY:
+            self._geometry = geometry
         self._board = None
-        self._initial_board = [[''] * 8 for _ in range(8)]
         self._captured_pieces = {'WHITE': [], "BLACK": []}  # Keeps track of captured pieces
-        self._move_history = []  # Saves the current state of the board after each move
 
         self.initialize_board()
 
+    @classmethod
+    def _new_empty(cls, geometry=None):
+        """
+        Creates a board object without setting up any position, for _restore or _load_board to fill in
+        :param geometry: optional BoardGeometry of the board, defaults to the standard 8x8 board
+        :return: the board
+        """
+        board = cls.__new__(cls)
+        if geometry is not None and geometry is not STANDARD_GEOMETRY:
+            board._geometry = geometry
+        board._board = None
+        board._captured_pieces = {'WHITE': [], "BLACK": []}
+        return board
+
     def initialize_board(self):
         """
-        Initializes the board with the pieces in their starting positions
+        Initializes the board with the pieces in their starting positions, copied from the starting Position
+        template of the board's geometry
         :return:
         """
-        for row in range(0, 8):
-            for col in range(0, 8):
-                _col_let = string.ascii_lowercase[col]  # Convert column number to letter
-
-                # White pieces are capitalized, black pieces are lowercase, N stands for knight
-                if row == 1:
-                    self._initial_board[row][col] = "P"
-                elif row == 6:
-                    self._initial_board[row][col] = "p"
-                elif row == 0:
-                    if _col_let == "a" or _col_let == "h":
-                        self._initial_board[row][col] = "R"
-                    elif _col_let == "b" or _col_let == "g":
-                        self._initial_board[row][col] = "N"
-                    elif _col_let == "c" or _col_let == "f":
-                        self._initial_board[row][col] = "B"
-                    elif _col_let == "d":
-                        self._initial_board[row][col] = "Q"
-                    elif _col_let == "e":
-                        self._initial_board[row][col] = "K"
-                elif row == 7:  # lowercase black players pieces, N stands for knight
-                    if _col_let == "a" or _col_let == "h":
-                        self._initial_board[row][col] = "r"
-                    elif _col_let == "b" or _col_let == "g":
-                        self._initial_board[row][col] = "n"
-                    elif _col_let == "c" or _col_let == "f":
-                        self._initial_board[row][col] = "b"
-                    elif _col_let == "d":
-                        self._initial_board[row][col] = "q"
-                    elif _col_let == "e":
-                        self._initial_board[row][col] = "k"
-
-        self._board = copy.deepcopy(self._initial_board)  # Creates a copy of the initial board
+        self._restore(self._geometry.start_position.snapshot(type(self)))
+        if self._attack_map is not None:
+            self._attack_map.rebuild()
+
+    def _snapshot(self):
+        """
+        Copies the board storage, material table, piece squares and Zobrist key into a value that _restore can
+        load again
+        :return: the snapshot, it must not be changed
+        """
+        return (tuple(tuple(row) for row in self._board), {color: dict(counts) for color, counts in
+                                                           self._material.items()},
+                {color: frozenset(squares) for color, squares in self._squares.items()}, self._zobrist_key)
+
+    def _restore(self, snapshot):
+        """
+        Replaces the position on the board with a snapshot from _snapshot, without going through set_piece
+        :param snapshot: the snapshot
+        """
+        rows, material, squares, self._zobrist_key = snapshot
+        self._board = [list(row) for row in rows]
+        self._material = {'WHITE': dict(material['WHITE']), 'BLACK': dict(material['BLACK'])}
+        self._squares = {'WHITE': set(squares['WHITE']), 'BLACK': set(squares['BLACK'])}
+
+    def _load_board(self, rows):
+        """
+        Loads the given rows of piece symbols into the board storage
+        :param rows: list of rows, each a list of piece symbols with "" for an empty square
+        """
+        self._board = [[''] * self._geometry.cols for _ in range(self._geometry.rows)]
+        self._reset_material()
+        for row in range(self._geometry.rows):
+            for col in range(self._geometry.cols):
+                if rows[row][col]:
+                    self.set_piece(row, col, rows[row][col])
+
+    def _reset_material(self):
+        """
+        Empties the material table, the number of pieces of each type each color has on the board, and the
+        squares each color's pieces stand on
+        """
+        self._material = {'WHITE': dict.fromkeys("prnbqk", 0), 'BLACK': dict.fromkeys("prnbqk", 0)}
+        self._squares = {'WHITE': set(), 'BLACK': set()}  # square indexes of each color's pieces
+        self._zobrist_key = 0  # Zobrist key of the pieces on the board, kept up to date by set_piece
+
+    def get_geometry(self):
+        """
+        Gets the size of the board and its move tables
+        :return: the BoardGeometry
+        """
+        return self._geometry
+
+    def is_on_board(self, row, col):
+        """
+        Checks if a square is on the board
+        :param row: row of the square
+        :param col: column of the square
+        :return: True if the square is on the board
+        """
+        return 0 <= row < self._geometry.rows and 0 <= col < self._geometry.cols
+
+    def get_symbol(self, row, col):
+        """
+        Gets the symbol of the piece at the specified row and column without creating a piece object
+        :param row: The row the piece is on
+        :param col: The column the piece is on
+        :return: The one-character piece symbol, or "" if the square is empty
+        """
+        return self._board[row][col]
 
     def get_piece(self, row, col):
         """
@@ -69,79 +576,791 @@ class GameBoard:
         :param col: The column the piece is on
         :return: The piece at the specified row and column
         """
-        piece_type = str(self._board[row][col])
-
-        if piece_type == 'P':
-            return Pawn("WHITE")
-        elif piece_type == "p":
-            return Pawn("BLACK")
-        elif piece_type == "R":
-            return Rook("WHITE")
-        elif piece_type == "r":
-            return Rook("BLACK")
-        elif piece_type == "N":
-            return Knight("WHITE")
-        elif piece_type == "n":
-            return Knight("BLACK")
-        elif piece_type == "B":
-            return Bishop("WHITE")
-        elif piece_type == "b":
-            return Bishop("BLACK")
-        elif piece_type == "Q":
-            return Queen("WHITE")
-        elif piece_type == "q":
-            return Queen("BLACK")
-        elif piece_type == "K":
-            return King("WHITE")
-        elif piece_type == "k":
-            return King("BLACK")
-        elif piece_type == ".":
-            return None
-        else:
-            return None
+        return make_piece(self.get_symbol(row, col))
 
     def set_piece(self, row, col, piece):
         """
         Sets the piece at the specified row and column
         :param row: The row the piece is on
         :param col: The column the piece is on
-        :param piece: The piece to set
+        :param piece: The piece to set, a piece object, its symbol, or "." / None for an empty square
+        """
+        old_symbol = self.get_symbol(row, col)
+        new_symbol = _piece_symbol(piece)
+        self._place(row, col, old_symbol, new_symbol)
+
+        geometry = self._geometry
+        square = row * geometry.cols + col
+        if old_symbol:  # keep the material table, piece squares and Zobrist key up to date
+            self._material[_symbol_color(old_symbol)][old_symbol.lower()] -= 1
+            self._squares[_symbol_color(old_symbol)].discard(square)
+            self._zobrist_key ^= geometry.zobrist_keys[PIECE_CODES[old_symbol]][square]
+        if new_symbol:
+            self._material[_symbol_color(new_symbol)][new_symbol.lower()] += 1
+            self._squares[_symbol_color(new_symbol)].add(square)
+            self._zobrist_key ^= geometry.zobrist_keys[PIECE_CODES[new_symbol]][square]
+        if self._attack_map is not None:
+            self._attack_map.update(square, old_symbol, new_symbol)
+
+    def _place(self, row, col, old_symbol, new_symbol):
+        """
+        Stores a piece symbol on a square, the storage step of set_piece
+        :param row: The row of the square
+        :param col: The column of the square
+        :param old_symbol: The symbol currently on the square, "" if empty
+        :param new_symbol: The symbol to store, "" to empty the square
+        """
+        self._board[row][col] = new_symbol
+
+    def get_attack_map(self):
+        """
+        Gets the squares each color attacks.  The map is built on first use and from then on set_piece updates it,
+        so boards that never ask for it do not pay for it
+        :return: the AttackMap
+        """
+        if self._attack_map is None:
+            self._attack_map = AttackMap(self)
+        return self._attack_map
+
+    def get_piece_count(self, color, piece_type):
+        """
+        Gets how many pieces of a type a color has on the board
+        :param color: "WHITE" or "BLACK"
+        :param piece_type: lowercase piece symbol, one of "p", "r", "n", "b", "q", "k"
+        :return: the number of pieces
+        """
+        return self._material[color][piece_type]
+
+    def get_zobrist_key(self):
+        """
+        Gets the Zobrist key of the pieces on the board, it does not include the side to move
+        :return: 64-bit integer key
         """
-        self._board[row][col] = piece
+        return self._zobrist_key
 
-    def refresh_board(self, start_point, end_point):
+    def get_material(self, color):
         """
-        refreshes the board to the updated version
-        :param start_point: the square the piece starts on
-        :param end_point: the square the piece moved to
+        Gets the material table of a color
+        :param color: "WHITE" or "BLACK"
+        :return: dict of lowercase piece symbol to the number of those pieces on the board
         """
+        return dict(self._material[color])
 
-        _start_col = ord(start_point[0]) - ord('a')  # Convert column letter to integer
-        _start_row = int(start_point[1]) - 1  # Convert row number to integer
-        _end_col = ord(end_point[0]) - ord('a')  # Convert column letter to integer
-        _end_row = int(end_point[1]) - 1  # Convert row number to integer
+    def is_valid_move(self, start_row, start_col, end_row, end_col):
+        """
+        Determines if moving the piece on the start square to the end square is valid
+        :param start_row: Starting row of the piece
+        :param start_col: Starting column of the piece
+        :param end_row: Desired end row of the piece
+        :param end_col: Desired end column of the piece
+        :return: True if move is valid, false if invalid or the start square is empty
+        """
+        piece = self.get_piece(start_row, start_col)
+        return piece is not None and piece.is_valid_move(start_row, start_col, end_row, end_col, self)
+
+    def get_symbols(self):
+        """
+        Gets the symbols of all the squares in one flat list, square (row, col) is at index row * cols + col
+        :return: list of piece symbols, "" for an empty square
+        """
+        return [symbol for row in self._board for symbol in row]
+
+    def validate_moves(self, moves):
+        """
+        Checks many moves against this position at once.  The valid moves of each color are generated once and
+        every move is then a table lookup, the answers are the same as each piece's is_valid_move
+        :param moves: sequence of (start, end) pairs, each square a name like "e2" or a (row, col) tuple
+        :return: list of True or False, one per move, False also for squares off the board or an empty start
+        """
+        rows, cols, squares = self._geometry.rows, self._geometry.cols, self._geometry.squares
+        tables = {}  # color -> set of start * squares + end for each valid move, sized by the moves not the board
+        results = []
+
+        for start, end in moves:
+            start_row, start_col = parse_square(start) if isinstance(start, str) else start
+            end_row, end_col = parse_square(end) if isinstance(end, str) else end
+
+            if not (0 <= start_row < rows and 0 <= start_col < cols and 0 <= end_row < rows and 0 <= end_col < cols):
+                results.append(False)
+                continue
+            symbol = self._board[start_row][start_col]
+            if not symbol:
+                results.append(False)
+                continue
+
+            color = _symbol_color(symbol)
+            table = tables.get(color)
+            if table is None:
+                table = tables[color] = {(move[0] * cols + move[1]) * squares + move[2] * cols + move[3]
+                                         for move in self.generate_moves(color)}
+            results.append((start_row * cols + start_col) * squares + end_row * cols + end_col in table)
+
+        return results
+
+    def generate_moves(self, color):
+        """
+        Lists every valid move for the given color using the precomputed jump tables and rays.  Only the squares
+        the color's pieces stand on are visited, in square order.  Gives exactly the moves the pieces'
+        is_valid_move accepts
+        :param color: "WHITE" or "BLACK"
+        :return: list of (start_row, start_col, end_row, end_col) moves
+        """
+        geometry = self._geometry
+        rows, cols = geometry.rows, geometry.cols
+        board = self._board
+        white = color == "WHITE"
+        moves = []
+        append = moves.append
+
+        for start in sorted(self._squares[color]):
+            start_row, start_col = divmod(start, cols)
+            piece_type = board[start_row][start_col].upper()
+
+            if piece_type == "N" or piece_type == "K":
+                for end_row, end_col, end in (geometry.knight_jumps if piece_type == "N" else
+                                              geometry.king_jumps)[start]:
+                    target = board[end_row][end_col]
+                    if not target or target.isupper() != white:
+                        append((start_row, start_col, end_row, end_col))
+
+            elif piece_type == "R":  # slides over enemy pieces, stops in front of its own color
+                for ray in geometry.rook_rays[start]:
+                    for end_row, end_col, end in ray:
+                        target = board[end_row][end_col]
+                        if target and target.isupper() == white:
+                            break
+                        append((start_row, start_col, end_row, end_col))
+
+            elif piece_type == "B":  # stops at the first piece, capturing it if it is an enemy
+                for ray in geometry.bishop_rays[start]:
+                    for end_row, end_col, end in ray:
+                        target = board[end_row][end_col]
+                        if target:
+                            if target.isupper() != white:
+                                append((start_row, start_col, end_row, end_col))
+                            break
+                        append((start_row, start_col, end_row, end_col))
+
+            elif piece_type == "Q":  # reaches every empty square on its lines, captures only next to it
+                for ray in geometry.queen_rays[start]:
+                    for distance, (end_row, end_col, end) in enumerate(ray):
+                        target = board[end_row][end_col]
+                        if not target or (distance == 0 and target.isupper() != white):
+                            append((start_row, start_col, end_row, end_col))
+
+            else:  # pawns, the two square move only looks at the square in front of the starting row
+                forward, middle_row = (1, 2) if white else (-1, rows - 3)
+                end_row = start_row + forward
+
+                if 0 <= end_row < rows:
+                    if not board[end_row][start_col]:
+                        append((start_row, start_col, end_row, start_col))
+                    for end_col in (start_col - 1, start_col + 1):
+                        if 0 <= end_col < cols:
+                            target = board[end_row][end_col]
+                            if target and target.isupper() != white:
+                                append((start_row, start_col, end_row, end_col))
+
+                end_row += forward
+                if 0 <= end_row < rows and not board[middle_row][start_col]:
+                    target = board[end_row][start_col]
+                    if not target or target.isupper() != white:
+                        append((start_row, start_col, end_row, start_col))
+
+        return moves
+
+    def get_board_state(self):
+        """
+        Gets the current state of the board as text, one line per row starting from row 1
+        :return: the board as a string
+        """
+        return "\n".join(" ".join(self.get_symbol(row, col) for col in range(self._geometry.cols))
+                         for row in range(self._geometry.rows))
 
-        current_state = "\n".join([" ".join(str(piece) for piece in row) for row in self._board])
-        self._move_history.append(current_state)
+    def get_board_string(self):
+        """
+        Gets the board as one character per square, square (row, col) at index row * cols + col, "." if empty
+        :return: string with one character per square, 64 on the standard board
+        """
+        return _board_string(self.get_symbols())
+
+    def load_board_string(self, text):
+        """
+        Replaces the position on the board with the one in a board string
+        :param text: string with one character per square as made by get_board_string
+        """
+        rows, cols = self._geometry.rows, self._geometry.cols
+        if len(text) != rows * cols or text.strip(".PRNBQKprnbqk"):
+            raise ValueError("a board string has one of . P R N B Q K p r n b q k for each of the %d squares" %
+                             (rows * cols))
+        attack_map, self._attack_map = self._attack_map, None  # rebuilt once instead of updated square by square
+        self._load_board([[square if square != "." else "" for square in text[row * cols:(row + 1) * cols]]
+                          for row in range(rows)])
+        if attack_map is not None:
+            self._attack_map = attack_map
+            attack_map.rebuild()
+
+    def to_fen(self):
+        """
+        Writes the board in FEN style: rows from the top one down to 1 separated by "/", pieces by symbol and runs
+        of empty squares by their length.  The number of rows and their width give the size of the board
+        :return: the board text, for example "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR"
+        """
+        return _board_fen(self.get_board_string(), self._geometry)
+
+    @classmethod
+    def from_fen(cls, fen):
+        """
+        Creates a board from the board part of a FEN style text, of the size the text describes
+        :param fen: board text as written by to_fen
+        :return: the board
+        """
+        geometry, text = _fen_board_string(fen)
+        board = cls(geometry)
+        board.load_board_string(text)
+        return board
+
+    def to_bytes(self):
+        """
+        Packs the board into 32 bytes, one 4-bit piece code per square
+        :return: the packed board
+        :raises ValueError: if the board is not the standard 8x8 size
+        """
+        if self._geometry is not STANDARD_GEOMETRY:
+            raise ValueError("only 8x8 boards can be packed")
+        return pack_boards([self.get_board_string()])
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Creates a board from 32 bytes made by to_bytes
+        :param data: the packed board
+        :return: the board
+        """
+        if len(data) != BOARD_BYTES:
+            raise ValueError("a packed board is %d bytes" % BOARD_BYTES)
+        board = cls()
+        board.load_board_string(unpack_boards(data)[0])
+        return board
 
     def show_board(self):
         """
         show the current board
         return: The current board
         """
-        print("\n   Current Board")
-        print("  " + " ".join(string.ascii_lowercase[:8]))
-        for row_num, row in enumerate(self._board[::-1], start=1):  # enumerate the board
-            print(9 - row_num, end=" ")  # print the row number
-            for col in row:  # print the column
-                print(col if col else '.', end=" ")
-            print()
+        print("\n   Current Board\n" + render_board(self.get_board_string(), self._geometry), end="")
 
     @property
     def captured_pieces(self):
         return self._captured_pieces
 
 
+class BitboardGameBoard(GameBoard):
+    """
+    GameBoard backend that keeps one occupancy mask per piece type and color next to the list of rows, square
+    (row, col) is bit row * cols + col, so the masks are 64-bit on the standard board.  Move validation works on the
+    masks, and get_symbol still reads the rows in constant time.  Has the same API as GameBoard
+    """
+
+    def _load_board(self, rows):
+        """
+        Loads the given rows of piece symbols into the board storage and the piece masks
+        :param rows: list of rows, each a list of piece symbols with "" for an empty square
+        """
+        self._board = [[''] * self._geometry.cols for _ in range(self._geometry.rows)]
+        self._bitboards = dict.fromkeys(PIECE_SYMBOLS, 0)  # one mask per piece type and color
+        self._occupied = {'WHITE': 0, 'BLACK': 0}  # all the squares held by each color
+        self._reset_material()
+        for row in range(self._geometry.rows):
+            for col in range(self._geometry.cols):
+                if rows[row][col]:
+                    self.set_piece(row, col, rows[row][col])
+
+    def _snapshot(self):
+        """
+        Copies the board storage, piece masks, material table, piece squares and Zobrist key into a value that
+        _restore can load again
+        :return: the snapshot, it must not be changed
+        """
+        return (tuple(tuple(row) for row in self._board), dict(self._bitboards), dict(self._occupied),
+                {color: dict(counts) for color, counts in self._material.items()},
+                {color: frozenset(squares) for color, squares in self._squares.items()}, self._zobrist_key)
+
+    def _restore(self, snapshot):
+        """
+        Replaces the position on the board with a snapshot from _snapshot, without going through set_piece
+        :param snapshot: the snapshot
+        """
+        rows, bitboards, occupied, material, squares, self._zobrist_key = snapshot
+        self._board = [list(row) for row in rows]
+        self._bitboards = dict(bitboards)
+        self._occupied = dict(occupied)
+        self._material = {'WHITE': dict(material['WHITE']), 'BLACK': dict(material['BLACK'])}
+        self._squares = {'WHITE': set(squares['WHITE']), 'BLACK': set(squares['BLACK'])}
+
+    def _place(self, row, col, old_symbol, new_symbol):
+        """
+        Stores a piece symbol on a square and updates the piece and color masks
+        :param row: The row of the square
+        :param col: The column of the square
+        :param old_symbol: The symbol currently on the square, "" if empty
+        :param new_symbol: The symbol to store, "" to empty the square
+        """
+        self._board[row][col] = new_symbol
+        bit = 1 << (row * self._geometry.cols + col)
+
+        if old_symbol:  # clear the square first
+            self._bitboards[old_symbol] &= ~bit
+            self._occupied[_symbol_color(old_symbol)] &= ~bit
+
+        if new_symbol:
+            self._bitboards[new_symbol] |= bit
+            self._occupied[_symbol_color(new_symbol)] |= bit
+
+    def is_valid_move(self, start_row, start_col, end_row, end_col):
+        """
+        Determines if moving the piece on the start square to the end square is valid, gives the same answer
+        as the piece's own is_valid_move but only uses the precomputed masks
+        :param start_row: Starting row of the piece
+        :param start_col: Starting column of the piece
+        :param end_row: Desired end row of the piece
+        :param end_col: Desired end column of the piece
+        :return: True if move is valid, false if invalid or the start square is empty
+        """
+        geometry = self._geometry
+        if not (0 <= end_row < geometry.rows and 0 <= end_col < geometry.cols):
+            return False  # Check if the piece is moving off the board
+
+        symbol = self._board[start_row][start_col]
+        if not symbol:
+            return False
+
+        cols = geometry.cols
+        start = start_row * cols + start_col
+        end = end_row * cols + end_col
+        end_bit = 1 << end
+        white = symbol.isupper()
+        occupied = self._occupied
+        own, enemy = (occupied['WHITE'], occupied['BLACK']) if white else (occupied['BLACK'], occupied['WHITE'])
+
+        if own & end_bit:
+            return False  # Check if the piece is moving to a square with a piece of the same color
+
+        piece_type = symbol.upper()
+
+        if piece_type == "N":
+            return bool(geometry.knight_masks[start] & end_bit)
+
+        if piece_type == "K":
+            return bool(geometry.king_masks[start] & end_bit)
+
+        if piece_type == "R":  # only pieces of the rook's own color block it
+            return bool(geometry.rook_lines[start] & end_bit) and not geometry.between_masks[start][end] & own
+
+        if piece_type == "B":  # any piece in between blocks the bishop
+            return bool(geometry.bishop_lines[start] & end_bit) and not geometry.between_masks[start][end] & (
+                    own | enemy)
+
+        if piece_type == "Q":  # the queen slides to any empty square on its lines but only captures next to it
+            return bool((geometry.rook_lines[start] | geometry.bishop_lines[start]) & end_bit) and (
+                    not enemy & end_bit or bool(geometry.king_masks[start] & end_bit))
+
+        # Pawns, the two square move only looks at the square in front of the pawns' starting row
+        forward, middle_row = (1, 2) if white else (-1, geometry.rows - 3)
+
+        if end_row == start_row + 2 * forward and end_col == start_col:
+            return not (own | enemy) & (1 << (middle_row * cols + start_col))
+
+        if end_row == start_row + forward:
+            if end_col == start_col:
+                return not enemy & end_bit
+            if abs(end_col - start_col) == 1:
+                return bool(enemy & end_bit)
+
+        return False
+
+
+class AttackMap:
+    """
+    The squares each color attacks, kept up to date as set_piece changes the board.  A piece attacks a square when
+    it could capture an enemy piece standing there: knights and kings on their jumps, queens on the squares next to
+    them since that is the only place they capture, bishops up to and including the first piece on each diagonal,
+    rooks along their lines up to and including the first piece of their own color, and pawns diagonally forward and
+    two squares straight ahead while their column's square on the pawns' middle row is empty.
+
+    Each change only looks again at the pieces whose attacks it can change: the old and new piece on the square,
+    bishops and rooks with a line through it, and on a middle row the pawns of its column.  Squares are numbered
+    row * cols + col and sets of squares are bit masks, so every query is a lookup
+    """
+
+    def __init__(self, board):
+        """
+        Builds the map of a board, use GameBoard.get_attack_map to get one the board keeps up to date
+        :param board: the GameBoard
+        """
+        self._board = board
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Recomputes the whole map from the board, for when the position was replaced without set_piece
+        """
+        geometry = self._board.get_geometry()
+        self._geometry = geometry
+        self._masks = [0] * geometry.squares  # squares attacked by the piece on each square
+        self._attackers = {"WHITE": [0] * geometry.squares, "BLACK": [0] * geometry.squares}  # square -> attackers
+        self._attacked = {"WHITE": 0, "BLACK": 0}  # all the squares each color attacks
+
+        for square, symbol in enumerate(self._board.get_symbols()):
+            if symbol:
+                self._set(square, _symbol_color(symbol), self._compute(square, symbol))
+
+    def update(self, square, old_symbol, new_symbol):
+        """
+        Brings the map up to date after set_piece changed a square, called by the board
+        :param square: the changed square
+        :param old_symbol: the symbol that was on the square, "" if empty
+        :param new_symbol: the symbol now on the square, "" if empty
+        """
+        if old_symbol == new_symbol:
+            return
+        if old_symbol and (not new_symbol or new_symbol.isupper() != old_symbol.isupper()):
+            self._set(square, _symbol_color(old_symbol), 0)
+
+        self._refresh_lines(square)
+        self._refresh_pawns(square)
+        if new_symbol:
+            self._set(square, _symbol_color(new_symbol), self._compute(square, new_symbol))
+
+    def _compute(self, square, symbol):
+        """
+        Works out the squares a piece attacks from the board
+        :param square: the piece's square
+        :param symbol: the piece's symbol
+        :return: mask of the attacked squares
+        """
+        geometry = self._geometry
+        piece_type = symbol.upper()
+
+        if piece_type == "N":
+            return geometry.knight_masks[square]
+        if piece_type == "K" or piece_type == "Q":
+            return geometry.king_masks[square]
+
+        get_symbol = self._board.get_symbol
+        white = symbol.isupper()
+        mask = 0
+
+        if piece_type == "B":  # any piece stops the bishop
+            for ray in geometry.bishop_rays[square]:
+                for row, col, end in ray:
+                    mask |= 1 << end
+                    if get_symbol(row, col):
+                        break
+
+        elif piece_type == "R":  # the rook slides over enemy pieces, its own pieces stop it
+            for ray in geometry.rook_rays[square]:
+                for row, col, end in ray:
+                    mask |= 1 << end
+                    target = get_symbol(row, col)
+                    if target and target.isupper() == white:
+                        break
+
+        else:  # pawns
+            rows, cols = geometry.rows, geometry.cols
+            row, col = divmod(square, cols)
+            forward, middle_row = (1, 2) if white else (-1, rows - 3)
+            end_row = row + forward
+            if 0 <= end_row < rows:
+                for end_col in (col - 1, col + 1):
+                    if 0 <= end_col < cols:
+                        mask |= 1 << (end_row * cols + end_col)
+            end_row += forward  # a piece captured on the middle row would itself block the two square move
+            if 0 <= end_row < rows and end_row != middle_row and not get_symbol(middle_row, col):
+                mask |= 1 << (end_row * cols + col)
+
+        return mask
+
+    def _refresh_lines(self, square):
+        """
+        Recomputes the bishops and rooks whose attacks pass over or reach a square
+        :param square: the changed square
+        """
+        geometry = self._geometry
+        get_symbol = self._board.get_symbol
+
+        for ray in geometry.bishop_rays[square]:  # only the first piece on each diagonal can see the square
+            for row, col, end in ray:
+                symbol = get_symbol(row, col)
+                if symbol:
+                    if symbol == "B" or symbol == "b":
+                        self._set(end, _symbol_color(symbol), self._compute(end, symbol))
+                    break
+
+        for ray in geometry.rook_rays[square]:  # a rook sees the square while none of its own pieces are between
+            white_seen = black_seen = False
+            for row, col, end in ray:
+                symbol = get_symbol(row, col)
+                if not symbol:
+                    continue
+                white = symbol.isupper()
+                if (symbol == "R" or symbol == "r") and not (white_seen if white else black_seen):
+                    self._set(end, _symbol_color(symbol), self._compute(end, symbol))
+                if white:
+                    white_seen = True
+                else:
+                    black_seen = True
+                if white_seen and black_seen:
+                    break  # every rook further out is blocked by a piece of its own color
+
+    def _refresh_pawns(self, square):
+        """
+        Recomputes the pawns whose two square move passes over a square on a middle row
+        :param square: the changed square
+        """
+        rows, cols = self._geometry.rows, self._geometry.cols
+        row, col = divmod(square, cols)
+        for pawn, middle_row in (("P", 2), ("p", rows - 3)):
+            if row == middle_row:
+                for pawn_row in range(rows):
+                    pawn_square = pawn_row * cols + col
+                    if self._board.get_symbol(pawn_row, col) == pawn:
+                        self._set(pawn_square, _symbol_color(pawn), self._compute(pawn_square, pawn))
+
+    def _set(self, square, color, mask):
+        """
+        Replaces the attacks of the piece on a square and updates the attackers of every square that changed
+        :param square: the piece's square
+        :param color: the piece's color
+        :param mask: the squares it now attacks, 0 when the piece left
+        """
+        old = self._masks[square]
+        if old == mask:
+            return
+        self._masks[square] = mask
+
+        attackers = self._attackers[color]
+        attacked = self._attacked[color]
+        bit = 1 << square
+        changed = old ^ mask
+        while changed:
+            low_bit = changed & -changed
+            target = low_bit.bit_length() - 1
+            if mask & low_bit:
+                attackers[target] |= bit
+                attacked |= low_bit
+            else:
+                attackers[target] &= ~bit
+                if not attackers[target]:
+                    attacked &= ~low_bit
+            changed ^= low_bit
+        self._attacked[color] = attacked
+
+    def attacked_squares(self, color):
+        """
+        Gets every square a color attacks
+        :param color: "WHITE" or "BLACK"
+        :return: mask of the squares, bit row * cols + col
+        """
+        return self._attacked[color]
+
+    def is_attacked(self, row, col, color):
+        """
+        Checks if a color attacks a square
+        :param row: row of the square
+        :param col: column of the square
+        :param color: "WHITE" or "BLACK"
+        :return: True if a piece of the color attacks the square
+        """
+        return bool(self._attackers[color][row * self._geometry.cols + col])
+
+    def attackers(self, row, col, color=None):
+        """
+        Gets the pieces attacking a square
+        :param row: row of the square
+        :param col: column of the square
+        :param color: "WHITE" or "BLACK", None for both colors
+        :return: mask of the squares of the attacking pieces
+        """
+        square = row * self._geometry.cols + col
+        if color is None:
+            return self._attackers["WHITE"][square] | self._attackers["BLACK"][square]
+        return self._attackers[color][square]
+
+    def attack_count(self, row, col, color):
+        """
+        Counts the pieces of a color attacking a square
+        :param row: row of the square
+        :param col: column of the square
+        :param color: "WHITE" or "BLACK"
+        :return: the number of attackers
+        """
+        return self._attackers[color][row * self._geometry.cols + col].bit_count()
+
+    def attacks_from(self, row, col):
+        """
+        Gets the squares attacked by the piece on a square
+        :param row: row of the piece
+        :param col: column of the piece
+        :return: mask of the squares, 0 for an empty square
+        """
+        return self._masks[row * self._geometry.cols + col]
+
+    def squares(self, mask):
+        """
+        Lists the squares of a mask
+        :param mask: mask of squares, as returned by the queries
+        :return: list of (row, col) in square order
+        """
+        squares = []
+        while mask:
+            low_bit = mask & -mask
+            squares.append(divmod(low_bit.bit_length() - 1, self._geometry.cols))
+            mask ^= low_bit
+        return squares
+
+    def verify(self):
+        """
+        Compares the map with one computed from scratch, to check the incremental updates
+        :return: list of the differences as text, empty when the map is correct
+        """
+        fresh = AttackMap(self._board)
+        differences = []
+
+        for square in range(self._geometry.squares):
+            name = square_name(*divmod(square, self._geometry.cols))
+            if self._masks[square] != fresh._masks[square]:
+                differences.append("%s attacks %s, recomputed %s" % (
+                    name, _square_names(self.squares(self._masks[square])),
+                    _square_names(self.squares(fresh._masks[square]))))
+            for color in ("WHITE", "BLACK"):
+                if self._attackers[color][square] != fresh._attackers[color][square]:
+                    differences.append("%s attackers of %s are %s, recomputed %s" % (
+                        color, name, _square_names(self.squares(self._attackers[color][square])),
+                        _square_names(self.squares(fresh._attackers[color][square]))))
+
+        for color in ("WHITE", "BLACK"):
+            if self._attacked[color] != fresh._attacked[color]:
+                differences.append("%s attacked squares are %s, recomputed %s" % (
+                    color, _square_names(self.squares(self._attacked[color])),
+                    _square_names(self.squares(fresh._attacked[color]))))
+        return differences
+
+
+def _square_names(squares):
+    return " ".join(square_name(row, col) for row, col in squares) or "-"
+
+
+class Position:
+    """
+    Immutable template of a game position: the board, turn, game state and captured pieces.  The board storage of
+    each backend is built once, the first time it is needed, and every game made from the template copies it
+    instead of placing the pieces one by one
+    """
+
+    __slots__ = ("_board_string", "_turn", "_state", "_captured", "_geometry", "_snapshots")
+
+    def __init__(self, board_string, turn=1, state="UNFINISHED", captured=None, geometry=None):
+        """
+        :param board_string: board string as made by GameBoard.get_board_string
+        :param turn: turn number, white moves on odd turns and black on even turns
+        :param state: game state, "UNFINISHED", "WHITE_WON" or "BLACK_WON"
+        :param captured: optional dict of color to the symbols of the pieces it has captured
+        :param geometry: optional BoardGeometry of the board, defaults to the standard 8x8 board
+        """
+        geometry = geometry or STANDARD_GEOMETRY
+        if len(board_string) != geometry.squares or board_string.strip(".PRNBQKprnbqk"):
+            raise ValueError("a board string has one of . P R N B Q K p r n b q k for each of the %d squares" %
+                             geometry.squares)
+        if turn < 1 or state not in _GAME_STATE_CODES:
+            raise ValueError("invalid turn or game state")
+        self._board_string = board_string
+        self._turn = turn
+        self._state = state
+        self._captured = {color: tuple(_piece_symbol(piece) for piece in (captured or {}).get(color, ()))
+                          for color in ("WHITE", "BLACK")}
+        self._geometry = geometry
+        self._snapshots = {}  # board class -> snapshot of its storage holding this position
+
+    @classmethod
+    def from_game(cls, game):
+        """
+        Makes a template of a game's current position, without its move history
+        :param game: the ChessVar game
+        :return: the Position
+        """
+        board = game.get_game_board()
+        return cls(board.get_board_string(), game.get_current_turn(), game.get_game_state(), board.captured_pieces,
+                   board.get_geometry())
+
+    @property
+    def board_string(self):
+        return self._board_string
+
+    @property
+    def turn(self):
+        return self._turn
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def captured(self):
+        """
+        dict of color to a tuple of the symbols of the pieces it has captured
+        """
+        return dict(self._captured)
+
+    @property
+    def geometry(self):
+        return self._geometry
+
+    def to_fen(self):
+        """
+        Writes the position in FEN style, see ChessVar.to_fen
+        :return: the position text
+        """
+        return _position_fen(_board_fen(self._board_string, self._geometry), self._turn, self._state)
+
+    def snapshot(self, board_class):
+        """
+        Gets the board storage of one backend holding this position, building it on first use
+        :param board_class: GameBoard backend
+        :return: snapshot for the backend's _restore
+        """
+        snapshot = self._snapshots.get(board_class)
+        if snapshot is None:
+            cols = self._geometry.cols
+            board = board_class._new_empty(self._geometry)
+            board._load_board([[square if square != "." else "" for square in
+                                self._board_string[row * cols:(row + 1) * cols]] for row in range(self._geometry.rows)])
+            snapshot = self._snapshots[board_class] = board._snapshot()
+        return snapshot
+
+    def make_board(self, board_class=None):
+        """
+        Creates a board holding this position and its captured pieces
+        :param board_class: GameBoard backend to use, defaults to GameBoard
+        :return: the board
+        """
+        board_class = board_class or GameBoard
+        board = board_class._new_empty(self._geometry)
+        board._restore(self.snapshot(board_class))
+        for color, symbols in self._captured.items():
+            board.captured_pieces[color].extend(make_piece(symbol) for symbol in symbols)
+        return board
+
+    def __repr__(self):
+        if self._geometry is not STANDARD_GEOMETRY:
+            return "Position(%r, %d, %r, geometry=%r)" % (self._board_string, self._turn, self._state, self._geometry)
+        return "Position(%r, %d, %r)" % (self._board_string, self._turn, self._state)
+
+
+# The starting position, every new standard GameBoard is copied from it
+START_POSITION = STANDARD_GEOMETRY.start_position
+
+
 class ChessVar:
     """
     Controls the unique gameplay of a variant of chess by
@@ -152,18 +1371,27 @@ class ChessVar:
     communicates with the GameBoard class
     """
 
-    def __init__(self):
+    def __init__(self, game_board=None, geometry=None):
         """
         Initiates a game of ChessVar
 
         sets current player to white, sets game state as unfinished, and sets up
         game board
+        :param game_board: optional board to play on, for example a BitboardGameBoard, defaults to a new GameBoard
+        :param geometry: optional BoardGeometry of the new GameBoard when no board is given, for example
+                         BoardGeometry(10, 10), defaults to the standard 8x8 board
         """
         self._current_player = "WHITE"  # Keeps track of the current player
         self._game_state = "UNFINISHED"  # Keeps track of the current state of the game
-        self._game_board = GameBoard()
+        self._game_board = game_board if game_board is not None else GameBoard(geometry)
+        self._cols = self._game_board.get_geometry().cols  # square numbers in the move records are row * cols + col
         self._current_turn = 1  # Keeps track of the current turn
-        self._move_history = []  # Saves the current state of the board after each move
+        self._move_history = array('Q')  # Packed record of each move played, see pack_move
+        self._undone_moves = array('Q')  # Packed records of the moves taken back, for redo_move
+        self._key_history = array('Q')  # Zobrist key of the position before each move, for repetitions
+
+        # Position the game started from, a game given its own board takes it when the first move is recorded
+        self._start_position = self._game_board.get_geometry().start_position if game_board is None else None
 
     def get_game_state(self):
         """
@@ -172,6 +1400,154 @@ class ChessVar:
         """
         return self._game_state
 
+    def get_current_player(self):
+        """
+        Gets the player whose turn it is
+        :return: "WHITE" or "BLACK"
+        """
+        return self._current_player
+
+    def get_current_turn(self):
+        """
+        Gets the current turn number, it starts at 1 and goes up by one after each move
+        :return: the turn number
+        """
+        return self._current_turn
+
+    def get_game_board(self):
+        """
+        Gets the board the game is played on
+        :return: the GameBoard
+        """
+        return self._game_board
+
+    def generate_moves(self):
+        """
+        Lists every valid move for the player whose turn it is
+        :return: list of (start_row, start_col, end_row, end_col) moves, empty once the game is over
+        """
+        if self._game_state != "UNFINISHED":
+            return []
+        return self._game_board.generate_moves(self._current_player)
+
+    def get_zobrist_key(self):
+        """
+        Gets the Zobrist key of the current position, including the player whose turn it is
+        :return: 64-bit integer key
+        """
+        if self._current_player == "BLACK":
+            return self._game_board.get_zobrist_key() ^ ZOBRIST_BLACK_TO_MOVE
+        return self._game_board.get_zobrist_key()
+
+    def get_repetition_count(self):
+        """
+        Counts how many times the current position has appeared before in this game
+        :return: number of earlier occurrences, 0 if the position is new
+        """
+        return self._key_history.count(self.get_zobrist_key())
+
+    def get_start_position(self):
+        """
+        Gets the position the game started from, before the moves of get_move_history
+        :return: the Position
+        """
+        if self._start_position is None:  # no move has been played on the board the game was given
+            return Position.from_game(self)
+        return self._start_position
+
+    def get_move_history(self):
+        """
+        Gets the moves played so far
+        :return: list of (start_point, end_point) square names, for example ("e2", "e4")
+        """
+        moves = []
+        for record in self._move_history:
+            start, end = record & 0xFF, record >> 8 & 0xFF
+            moves.append((square_name(*divmod(start, self._cols)), square_name(*divmod(end, self._cols))))
+        return moves
+
+    @classmethod
+    def from_position(cls, position=START_POSITION, board_class=None):
+        """
+        Creates a game from a Position template, copying its board instead of setting up each square
+        :param position: the Position, defaults to the starting position
+        :param board_class: GameBoard backend to use, defaults to GameBoard
+        :return: the game, it has no move history to undo
+        """
+        game = cls(position.make_board(board_class))
+        game._current_turn = position.turn
+        game._current_player = "WHITE" if position.turn % 2 == 1 else "BLACK"
+        game._game_state = position.state
+        game._start_position = position
+        return game
+
+    @classmethod
+    def from_board_string(cls, text, turn=1, state="UNFINISHED", board_class=None, geometry=None):
+        """
+        Creates a game at a given position, it has no move history to undo
+        :param text: board string as made by GameBoard.get_board_string
+        :param turn: turn number, white moves on odd turns and black on even turns
+        :param state: game state, "UNFINISHED", "WHITE_WON" or "BLACK_WON"
+        :param board_class: GameBoard backend to use, defaults to GameBoard
+        :param geometry: optional BoardGeometry of the board, defaults to the standard 8x8 board
+        :return: the game
+        """
+        if turn < 1 or state not in _GAME_STATE_CODES:
+            raise ValueError("invalid turn or game state")
+        board = (board_class or GameBoard)(geometry)
+        board.load_board_string(text)
+        game = cls(board)
+        game._current_turn = turn
+        game._current_player = "WHITE" if turn % 2 == 1 else "BLACK"
+        game._game_state = state
+        game._start_position = Position(text, turn, state, geometry=board.get_geometry())
+        return game
+
+    def to_fen(self):
+        """
+        Writes the position in FEN style: the board, "w" or "b" for the player to move, the turn number, and the
+        game state when the game is over
+        :return: the position text, for example "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w 1"
+        """
+        return _position_fen(self._game_board.to_fen(), self._current_turn, self._game_state)
+
+    @classmethod
+    def from_fen(cls, fen, board_class=None):
+        """
+        Creates a game from a position written by to_fen, on a board of the size the text describes
+        :param fen: the position text
+        :param board_class: GameBoard backend to use, defaults to GameBoard
+        :return: the game
+        """
+        fields = fen.split()
+        if len(fields) not in (3, 4) or fields[1] not in ("w", "b") or not fields[2].isdigit():
+            raise ValueError("a FEN position is '<board> <w|b> <turn> [<state>]': " + fen)
+        turn = int(fields[2])
+        if (fields[1] == "w") != (turn % 2 == 1):
+            raise ValueError("white moves on odd turns and black on even turns: " + fen)
+        geometry, text = _fen_board_string(fields[0])
+        return cls.from_board_string(text, turn, fields[3] if len(fields) == 4 else "UNFINISHED", board_class,
+                                     geometry)
+
+    def to_bytes(self):
+        """
+        Packs the position into POSITION_BYTES bytes, see encode_positions
+        :return: the packed position
+        """
+        return encode_positions([self])
+
+    @classmethod
+    def from_bytes(cls, data, board_class=None):
+        """
+        Creates a game from a position packed by to_bytes
+        :param data: the packed position
+        :param board_class: GameBoard backend to use, defaults to GameBoard
+        :return: the game
+        """
+        if len(data) != POSITION_BYTES:
+            raise ValueError("a packed position is %d bytes" % POSITION_BYTES)
+        return decode_positions(data, board_class)[0]
+
     def make_move(self, start_point, end_point):
         """
         Moves the chess piece if it is a valid move
@@ -183,71 +1559,171 @@ class ChessVar:
         if self._game_state != "UNFINISHED":
             return False
 
-        # If is_valid, refresh board(start_point, end_point)
-        _start_row = int(start_point[1]) - 1  # Convert row number to integer
-        _start_col = ord(start_point[0]) - ord('a')  # Convert column letter to integer
-        _end_row = int(end_point[1]) - 1  # Convert row number to integer
-        _end_col = ord(end_point[0]) - ord('a')  # Convert column letter to integer
+        _start_row, _start_col = parse_square(start_point)  # Convert to row and column integers
+        _end_row, _end_col = parse_square(end_point)
 
-        piece = self._game_board.get_piece(_start_row, _start_col)
+        if not self._game_board.is_on_board(_start_row, _start_col):
+            return False  # No square there, the end square is checked with the move
 
-        if piece and piece.get_color == self._current_player:
+        symbol = self._game_board.get_symbol(_start_row, _start_col)
 
-            if piece and piece.is_valid_move(_start_row, _start_col, _end_row, _end_col,
-                                             self._game_board):  # Check if the move is valid
-                captured_piece = self._game_board.get_piece(_end_row, _end_col)  # capture the piece
-                self._game_board.set_piece(_end_row, _end_col, piece)  # move the piece
-                self._game_board.set_piece(_start_row, _start_col, ".")
+        if not symbol or _symbol_color(symbol) != self._current_player:
+            return False  # No piece of the current player on the start square
 
-                if captured_piece and captured_piece is not None:  # Check if there is a piece at the end point
-                    self._game_board.captured_pieces[self._current_player].append(captured_piece)
+        if not self._game_board.is_valid_move(_start_row, _start_col, _end_row, _end_col):  # Check if the move is valid
+            return False  # Invalid move, game is not over
 
-                current_state = "\n".join([" ".join(str(piece) for piece in row) for row in self._game_board._board])
-                self._move_history.append(current_state)
-                self._game_board.refresh_Board(start_point, end_point)
+        self.apply_move(_start_row, _start_col, _end_row, _end_col)
+        return True
 
-                self._current_turn += 1  # Increment the turn number
+    def apply_move(self, start_row, start_col, end_row, end_col):
+        """
+        Plays a move that is already known to be valid for the current player, for example one from
+        generate_moves, without checking it again.  Clears the moves that could be redone
+        :param start_row: Starting row of the piece
+        :param start_col: Starting column of the piece
+        :param end_row: End row of the piece
+        :param end_col: End column of the piece
+        """
+        del self._undone_moves[:]
+        self._play(start_row, start_col, end_row, end_col)
 
-                # Determine the current player based on the turn number
-                self._current_player = "WHITE" if self._current_turn % 2 == 1 else "BLACK"
+    def _play(self, start_row, start_col, end_row, end_col):
+        """
+        Moves the piece, records the move, passes the turn and checks for a winner
+        :param start_row: Starting row of the piece
+        :param start_col: Starting column of the piece
+        :param end_row: End row of the piece
+        :param end_col: End column of the piece
+        """
+        symbol = self._game_board.get_symbol(start_row, start_col)
+        captured_symbol = self._game_board.get_symbol(end_row, end_col)
 
-                for color in ["WHITE", "BLACK"]:
-                    piece_count = {'p': 8, 'r': 2, 'n': 2, 'b': 2, 'q': 1, 'k': 1}  # set the amount of pieces
+        self._record_move(start_row * self._cols + start_col, end_row * self._cols + end_col, symbol, captured_symbol)
 
-                    for piece_type, count in piece_count.items():
-                        captured_count = len(
-                            [p for p in self._game_board.captured_pieces[color] if str(p).lower() == piece_type])
+        self._game_board.set_piece(end_row, end_col, symbol)  # move the piece
+        self._game_board.set_piece(start_row, start_col, ".")
 
-                        if captured_count == count:
-                            self._game_state = "WHITE_WON" if color == "WHITE" else "BLACK_WON"
-                            return True  # Game is over
+        if captured_symbol:  # Check if there is a piece at the end point
+            self._game_board.captured_pieces[self._current_player].append(make_piece(captured_symbol))
 
-                return True  # Valid move, game is not over
+        self._current_turn += 1  # Increment the turn number
 
-            self._current_player = "WHITE" if self._current_turn % 2 == 1 else "BLACK"
-            return False  # Invalid move, game is not over
+        # Determine the current player based on the turn number
+        self._current_player = "WHITE" if self._current_turn % 2 == 1 else "BLACK"
+
+        if captured_symbol:
+            self._check_winner(captured_symbol)
+
+    def _record_move(self, start, end, symbol, captured_symbol):
+        """
+        Appends a move about to be played to the move history, with the position key before it
+        :param start: start square, row * cols + col
+        :param end: end square, row * cols + col
+        :param symbol: symbol of the moving piece
+        :param captured_symbol: symbol of the captured piece, "" if none
+        """
+        if self._start_position is None:
+            self._start_position = Position.from_game(self)
+        self._key_history.append(self.get_zobrist_key())
+        self._move_history.append(pack_move(start, end, PIECE_CODES[symbol], PIECE_CODES[captured_symbol],
+                                            self._current_turn, self._game_state))
+
+    def _check_winner(self, captured_symbol):
+        """
+        Ends the game if a capture took the last piece of its type off the board, called after the turn has passed
+        :param captured_symbol: symbol of the captured piece
+        """
+        if not self._game_board.get_piece_count(self._current_player, captured_symbol.lower()):
+            self._game_state = "WHITE_WON" if self._current_player == "BLACK" else "BLACK_WON"
+
+    def undo_move(self):
+        """
+        Takes back the last move played, restoring the board, captured pieces, turn and game state
+        :return: True if a move was taken back, False if there are no moves to take back
+        """
+        if not self._move_history:
+            return False
+
+        record = self._move_history.pop()
+        self._key_history.pop()
+        start, end, moved, captured, turn, state = unpack_move(record)
+
+        self._game_board.set_piece(*divmod(start, self._cols), CODE_SYMBOLS[moved])  # put the pieces back
+        self._game_board.set_piece(*divmod(end, self._cols), CODE_SYMBOLS[captured])
+
+        self._current_turn = turn
+        self._current_player = "WHITE" if turn % 2 == 1 else "BLACK"
+        self._game_state = state
+
+        if captured:
+            self._game_board.captured_pieces[self._current_player].pop()
+
+        self._undone_moves.append(record)
+        return True
+
+    def redo_move(self):
+        """
+        Plays again the last move taken back with undo_move
+        :return: True if a move was played again, False if there are no moves to redo
+        """
+        if not self._undone_moves:
+            return False
+
+        record = self._undone_moves.pop()
+        start, end = record & 0xFF, record >> 8 & 0xFF
+        self._play(*divmod(start, self._cols), *divmod(end, self._cols))
+        return True
 
 
 class ChessPiece:
     """
-    Creates the chess pieces and their attributes
+    Creates the chess pieces and their attributes.  Pieces are immutable and shared: there is one instance for each
+    type and color, and creating a piece returns that instance
     """
 
-    def __init__(self, color, piece_type):
+    __slots__ = ("_color", "_symbol")
+    _piece_type = None  # the type of piece, set by each subclass
+    _letter = None  # the piece's symbol for white, set by each subclass
+    _instances = {}  # (piece class, color) -> the shared piece
+
+    def __new__(cls, color):
         """
-        Creates the chess pieces and their attributes
+        Gets the piece of this type and color
         :param color: the color of the piece
-        :param piece_type: the type of piece
         """
-        self.get_color = color
-        self._piece_type = piece_type
+        piece = ChessPiece._instances.get((cls, color))
+        if piece is None:
+            piece = object.__new__(cls)
+            object.__setattr__(piece, "_color", color)
+            object.__setattr__(piece, "_symbol", cls._letter if color == "WHITE" else cls._letter.lower())
+            ChessPiece._instances[(cls, color)] = piece
+        return piece
 
+    @property
     def get_color(self):
         """
-        Gets the color of the piece
-        :return: color of the piece
+        The color of the piece
         """
-        return self.get_color
+        return self._color
+
+    def __str__(self):
+        return self._symbol  # string representation of the piece
+
+    def __setattr__(self, name, value):
+        raise AttributeError("pieces are shared and cannot be changed")
+
+    def __delattr__(self, name):
+        raise AttributeError("pieces are shared and cannot be changed")
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return type(self), (self._color,)
 
 
 class Pawn(ChessPiece):
@@ -255,11 +1731,9 @@ class Pawn(ChessPiece):
     Creates the pawn piece and its attributes
     """
 
-    def __init__(self, color):
-        super().__init__(color, piece_type="Pawn")
-
-    def __str__(self):
-        return "P" if self.get_color == "WHITE" else "p"  # string representation of the piece
+    __slots__ = ()
+    _piece_type = "Pawn"
+    _letter = "P"
 
     def is_valid_move(self, start_row, start_col, end_row, end_col, game_board):
 
@@ -272,7 +1746,7 @@ class Pawn(ChessPiece):
         :param game_board: The current game board
         :return: True if move is valid, false if invalid
         """
-        if not (0 <= end_row < 8 and 0 <= end_col < 8):  # Check if the piece is moving off the board
+        if not game_board.is_on_board(end_row, end_col):  # Check if the piece is moving off the board
             return False
 
         end_piece = game_board.get_piece(end_row, end_col)  # get the piece at the end point
@@ -287,7 +1761,7 @@ class Pawn(ChessPiece):
             if start_row == end_row - 2 and start_col == end_col and middle_piece is None:
                 return True
 
-            elif start_row == end_row - 1 and start_col == end_col and end_piece.get_color == "BLACK":
+            elif start_row == end_row - 1 and start_col == end_col and end_piece is not None:
                 return False
 
             elif start_row == end_row - 1 and start_col == end_col and end_piece is None:
@@ -298,13 +1772,13 @@ class Pawn(ChessPiece):
                 return end_piece is not None and end_piece.get_color == "BLACK"
 
         elif self.get_color == "BLACK":
-            middle_piece = game_board.get_piece(5, start_col)
+            middle_piece = game_board.get_piece(game_board.get_geometry().rows - 3, start_col)
 
             # Check if the piece is moving forward two spaces on its first turn and the space is empty
             if start_row == end_row + 2 and start_col == end_col and middle_piece is None:
                 return True
 
-            elif start_row == end_row + 1 and start_col == end_col and end_piece.get_color == "WHITE":
+            elif start_row == end_row + 1 and start_col == end_col and end_piece is not None:
                 return False
 
             elif start_row == end_row + 1 and start_col == end_col and end_piece is None:
@@ -322,11 +1796,9 @@ class Rook(ChessPiece):
     Creates the rook piece and its attributes
     """
 
-    def __init__(self, color):
-        super().__init__(color, piece_type="Rook")
-
-    def __str__(self):
-        return "R" if self.get_color == "WHITE" else "r"  # string representation of the piece
+    __slots__ = ()
+    _piece_type = "Rook"
+    _letter = "R"
 
     def is_valid_move(self, start_row, start_col, end_row, end_col, game_board):
         """
@@ -339,7 +1811,7 @@ class Rook(ChessPiece):
         :param game_board: the current game board
         :return: True if move is valid, false if invalid
         """
-        if not (0 <= end_row < 8 and 0 <= end_col < 8):  # Check if the piece is moving off the board
+        if not game_board.is_on_board(end_row, end_col):  # Check if the piece is moving off the board
             return False
 
         end_piece = game_board.get_piece(end_row, end_col)
@@ -392,11 +1864,9 @@ class Knight(ChessPiece):
     Creates the knight piece and its attributes
     """
 
-    def __init__(self, color):
-        super().__init__(color, piece_type="Knight")
-
-    def __str__(self):
-        return "N" if self.get_color == "WHITE" else "n"  # string representation of the piece
+    __slots__ = ()
+    _piece_type = "Knight"
+    _letter = "N"
 
     def is_valid_move(self, start_row, start_col, end_row, end_col, game_board):
         """
@@ -409,7 +1879,7 @@ class Knight(ChessPiece):
         :return: True if move is valid, false if invalid
         """
 
-        if not (0 <= end_row < 8 and 0 <= end_col < 8):  # Check if the piece is moving off the board
+        if not game_board.is_on_board(end_row, end_col):  # Check if the piece is moving off the board
             return False
 
         end_piece = game_board.get_piece(end_row, end_col)
@@ -431,11 +1901,9 @@ class Bishop(ChessPiece):
     Creates the bishop piece and its attributes
     """
 
-    def __init__(self, color):
-        super().__init__(color, piece_type="Bishop")
-
-    def __str__(self):
-        return "B" if self.get_color == "WHITE" else "b"  # string representation of the piece
+    __slots__ = ()
+    _piece_type = "Bishop"
+    _letter = "B"
 
     def is_valid_move(self, start_row, start_col, end_row, end_col, game_board):
         """
@@ -447,7 +1915,7 @@ class Bishop(ChessPiece):
         :param game_board: The current game board
         :return: True if move is valid, false if invalid
         """
-        if not (0 <= end_row < 8 and 0 <= end_col < 8):  # Check if the piece is moving off the board
+        if not game_board.is_on_board(end_row, end_col):  # Check if the piece is moving off the board
             return False
 
         end_piece = game_board.get_piece(end_row, end_col)
@@ -478,11 +1946,9 @@ class Queen(ChessPiece):
     Creates the queen piece and its attributes, combination of rook and bishop moves
     """
 
-    def __init__(self, color):
-        super().__init__(color, piece_type="Queen")
-
-    def __str__(self):
-        return "Q" if self.get_color == "WHITE" else "q"  # string representation of the piece
+    __slots__ = ()
+    _piece_type = "Queen"
+    _letter = "Q"
 
     def is_valid_move(self, start_row, start_col, end_row, end_col, game_board):
         """
@@ -494,7 +1960,7 @@ class Queen(ChessPiece):
         :param game_board: The current game board
         :return: True if move is valid, false if invalid
         """
-        if not (0 <= end_row < 8 and 0 <= end_col < 8):  # Check if the piece is moving off the board
+        if not game_board.is_on_board(end_row, end_col):  # Check if the piece is moving off the board
             return False
 
         end_piece = game_board.get_piece(end_row, end_col)
@@ -525,11 +1991,9 @@ class King(ChessPiece):
     Creates the king piece and its attributes
     """
 
-    def __init__(self, color):
-        super().__init__(color, piece_type="King")
-
-    def __str__(self):
-        return "K" if self.get_color == "WHITE" else "k"  # string representation of the piece
+    __slots__ = ()
+    _piece_type = "King"
+    _letter = "K"
 
     def is_valid_move(self, start_row, start_col, end_row, end_col, game_board):
         """
@@ -542,7 +2006,7 @@ class King(ChessPiece):
         :return: True if move is valid, false if invalid
         """
 
-        if not (0 <= end_row < 8 and 0 <= end_col < 8):  # Check if the piece is moving off the board
+        if not game_board.is_on_board(end_row, end_col):  # Check if the piece is moving off the board
             return False
 
         end_piece = game_board.get_piece(end_row, end_col)
@@ -553,6 +2017,29 @@ class King(ChessPiece):
         return abs(start_row - end_row) <= 1 and abs(start_col - end_col) <= 1  # Check if the piece is moving one space
 
 
+# Piece class and color for each piece symbol
+_PIECE_TYPES = {
+    "P": (Pawn, "WHITE"), "p": (Pawn, "BLACK"),
+    "R": (Rook, "WHITE"), "r": (Rook, "BLACK"),
+    "N": (Knight, "WHITE"), "n": (Knight, "BLACK"),
+    "B": (Bishop, "WHITE"), "b": (Bishop, "BLACK"),
+    "Q": (Queen, "WHITE"), "q": (Queen, "BLACK"),
+    "K": (King, "WHITE"), "k": (King, "BLACK"),
+}
+
+# The shared piece for each piece symbol
+_PIECES = {symbol: piece_class(color) for symbol, (piece_class, color) in _PIECE_TYPES.items()}
+
+
+def make_piece(symbol):
+    """
+    Gets the shared piece object for a piece symbol
+    :param symbol: one-character piece symbol
+    :return: the piece, or None if the symbol is not a piece
+    """
+    return _PIECES.get(symbol)
+
+
 # Test the game board
 
 # game = ChessVar()
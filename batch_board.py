@@ -0,0 +1,195 @@
+# Description: Many ChessVar positions held together in NumPy arrays so thousands of independent games can be
+#              stepped in lockstep, for training data and Monte Carlo rollouts.  Each board is a row of 64 piece
+#              codes (see ChessVar.PIECE_CODES, square row * 8 + col), next to arrays of the turn, game state,
+#              piece counts and captured piece counts of every game.  Moves are applied to all the boards at once
+#              and the win rule of ChessVar.make_move is checked with array operations.
+#
+#              Example:  batch = BoardBatch.from_games([ChessVar() for _ in range(4096)])
+#                        batch.apply_moves(starts, ends)      # one start and end square per game
+#                        games = batch.to_games()
+import numpy as np
+
+from ChessVar import ChessVar, GAME_STATES, PIECE_CODES, CODE_SYMBOLS, make_piece
+
+BLACK = 8  # piece codes of black pieces have this bit set
+UNFINISHED, WHITE_WON, BLACK_WON = range(3)  # game state codes, indexes into ChessVar.GAME_STATES
+
+# Lookup tables between the characters of a board string and piece codes
+_CODE_FROM_CHAR = np.zeros(256, dtype=np.int8)
+for _symbol, _code in PIECE_CODES.items():
+    if _symbol:
+        _CODE_FROM_CHAR[ord(_symbol)] = _code
+_CHAR_FROM_CODE = np.array([ord(symbol or ".") for symbol in CODE_SYMBOLS], dtype=np.uint8)
+
+
+def count_material(boards):
+    """
+    Counts the pieces of every code on many boards
+    :param boards: N x 64 array of piece codes
+    :return: N x 16 int16 array, entry [n, code] is the number of pieces with that code on board n
+    """
+    count = len(boards)
+    offsets = (np.arange(count, dtype=np.int64) * 16)[:, None]
+    return np.bincount((boards + offsets).ravel(), minlength=16 * count).reshape(count, 16).astype(np.int16)
+
+
+class BoardBatch:
+    """
+    N ChessVar positions in arrays:
+
+        boards    N x 64 int8, piece code on each square, 0 for an empty square
+        turns     N int32, turn number, white moves on odd turns
+        states    N int8, game state code, UNFINISHED, WHITE_WON or BLACK_WON
+        material  N x 16 int16, number of pieces of each code on the board
+        captured  N x 16 int16, number of pieces of each code that have been captured
+    """
+
+    def __init__(self, boards, turns=None, states=None, captured=None):
+        """
+        :param boards: N x 64 array of piece codes
+        :param turns: N turn numbers, default 1
+        :param states: N game state codes, default UNFINISHED
+        :param captured: N x 16 captured piece counts, default none
+        """
+        self.boards = np.array(boards, dtype=np.int8).reshape(-1, 64)
+        count = len(self.boards)
+        self.turns = np.ones(count, dtype=np.int32) if turns is None else np.array(turns, dtype=np.int32)
+        self.states = np.zeros(count, dtype=np.int8) if states is None else np.array(states, dtype=np.int8)
+        self.captured = (np.zeros((count, 16), dtype=np.int16) if captured is None else
+                         np.array(captured, dtype=np.int16).reshape(count, 16))
+        self.material = count_material(self.boards)
+
+    def __len__(self):
+        return len(self.boards)
+
+    @classmethod
+    def from_board_strings(cls, board_strings, turns=None, states=None):
+        """
+        Creates a batch from board strings
+        :param board_strings: list of 64-character board strings as made by GameBoard.get_board_string
+        :param turns: N turn numbers, default 1
+        :param states: N game state codes, default UNFINISHED
+        :return: the BoardBatch
+        """
+        text = "".join(board_strings).encode("ascii")
+        if len(text) != 64 * len(board_strings):
+            raise ValueError("board strings are 64 characters long")
+        return cls(_CODE_FROM_CHAR[np.frombuffer(text, dtype=np.uint8)].reshape(-1, 64), turns, states)
+
+    @classmethod
+    def from_boards(cls, boards, turns=None):
+        """
+        Creates a batch from GameBoards
+        :param boards: list of GameBoard
+        :param turns: N turn numbers, default 1
+        :return: the BoardBatch
+        """
+        return cls.from_board_strings([board.get_board_string() for board in boards], turns)
+
+    @classmethod
+    def from_games(cls, games):
+        """
+        Creates a batch from games, keeping their turn, game state and captured pieces
+        :param games: list of ChessVar games
+        :return: the BoardBatch
+        """
+        batch = cls.from_board_strings([game.get_game_board().get_board_string() for game in games],
+                                       [game.get_current_turn() for game in games],
+                                       [GAME_STATES.index(game.get_game_state()) for game in games])
+        for number, game in enumerate(games):
+            for pieces in game.get_game_board().captured_pieces.values():
+                for piece in pieces:
+                    batch.captured[number, PIECE_CODES[str(piece)]] += 1
+        return batch
+
+    def get_board_string(self, number):
+        """
+        :param number: index of the board in the batch
+        :return: the board's 64-character board string
+        """
+        return _CHAR_FROM_CODE[self.boards[number]].tobytes().decode("ascii")
+
+    def to_game(self, number, board_class=None):
+        """
+        Rebuilds one game of the batch, with its captured pieces but without move history
+        :param number: index of the game in the batch
+        :param board_class: GameBoard backend to use, defaults to GameBoard
+        :return: the ChessVar game
+        """
+        game = ChessVar.from_board_string(self.get_board_string(number), int(self.turns[number]),
+                                          GAME_STATES[self.states[number]], board_class)
+        captured = game.get_game_board().captured_pieces
+        for code in np.flatnonzero(self.captured[number]):
+            color = "WHITE" if code & BLACK else "BLACK"  # white captures black pieces
+            captured[color].extend(make_piece(CODE_SYMBOLS[code])
+                                   for _ in range(self.captured[number, code]))
+        return game
+
+    def to_games(self, board_class=None):
+        """
+        :param board_class: GameBoard backend to use, defaults to GameBoard
+        :return: list of every game in the batch
+        """
+        return [self.to_game(number, board_class) for number in range(len(self))]
+
+    def to_board(self, number, board_class=None):
+        """
+        :param number: index of the board in the batch
+        :param board_class: GameBoard backend to use, defaults to GameBoard
+        :return: the board as a GameBoard
+        """
+        return self.to_game(number, board_class).get_game_board()
+
+    def white_to_move(self):
+        """
+        :return: N bools, True where white is to move
+        """
+        return self.turns % 2 == 1
+
+    def active(self):
+        """
+        :return: N bools, True where the game is unfinished
+        """
+        return self.states == UNFINISHED
+
+    def piece_counts(self, color):
+        """
+        Gets the number of pieces of each type one color has, in the order p, r, n, b, q, k
+        :param color: "WHITE" or "BLACK"
+        :return: N x 6 array
+        """
+        first = PIECE_CODES["p"] if color == "BLACK" else PIECE_CODES["P"]
+        return self.material[:, first:first + 6]
+
+    def apply_moves(self, starts, ends):
+        """
+        Plays one move on every unfinished board at once, without checking that the moves are valid, the same as
+        ChessVar.apply_move on each game: the piece moves, a captured piece is counted, the turn passes and a capture
+        of the last piece of a type wins the game for the player who made it
+        :param starts: N start squares, row * 8 + col, a negative square leaves that board as it is
+        :param ends: N end squares, row * 8 + col
+        :return: N bools, True where the move won the game
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        rows = np.flatnonzero((self.states == UNFINISHED) & (starts >= 0))
+        starts, ends = starts[rows], ends[rows]
+
+        moved = self.boards[rows, starts]
+        victims = self.boards[rows, ends]
+        self.boards[rows, ends] = moved
+        self.boards[rows, starts] = 0
+        self.turns[rows] += 1
+
+        won = np.zeros(len(self), dtype=bool)
+        capture = victims != 0
+        rows, victims, moved = rows[capture], victims[capture], moved[capture]
+        np.subtract.at(self.material, (rows, victims), 1)
+        np.add.at(self.captured, (rows, victims), 1)
+
+        # The capture wins the game if it took the last piece of its type off the board
+        last = self.material[rows, victims] == 0
+        winners = rows[last]
+        self.states[winners] = np.where(moved[last] & BLACK, BLACK_WON, WHITE_WON)
+        won[winners] = True
+        return won
@@ -0,0 +1,107 @@
+# Description: Microbenchmark comparing the GameBoard (8x8 list) and BitboardGameBoard (piece masks) backends on
+#              move validation throughput.  Every piece on each test position is checked against all 64 end squares
+#              and both backends must give the same answers.
+#
+#              Run from the repository root:  python -m benchmarks.bench_backends [--positions N] [--repeat N]
+import argparse
+import random
+import time
+
+from ChessVar import GameBoard, BitboardGameBoard
+
+
+def random_positions(count, plies=30, seed=1):
+    """
+    Builds positions by playing random valid moves from the starting position
+    :param count: number of positions to build
+    :param plies: number of random moves played for each position
+    :param seed: random seed so every run benchmarks the same positions
+    :return: list of 8x8 lists of piece symbols
+    """
+    rng = random.Random(seed)
+    positions = []
+
+    for _ in range(count):
+        board = GameBoard()
+        color = "WHITE"
+
+        for _ in range(plies):
+            moves = [(start_row, start_col, end_row, end_col)
+                     for start_row in range(8) for start_col in range(8)
+                     if board.get_symbol(start_row, start_col)
+                     and (board.get_symbol(start_row, start_col).isupper()) == (color == "WHITE")
+                     for end_row in range(8) for end_col in range(8)
+                     if board.is_valid_move(start_row, start_col, end_row, end_col)]
+            if not moves:
+                break
+            start_row, start_col, end_row, end_col = rng.choice(moves)
+            board.set_piece(end_row, end_col, board.get_symbol(start_row, start_col))
+            board.set_piece(start_row, start_col, ".")
+            color = "BLACK" if color == "WHITE" else "WHITE"
+
+        positions.append([[board.get_symbol(row, col) for col in range(8)] for row in range(8)])
+
+    return positions
+
+
+def load(board_class, rows):
+    """
+    Creates a board of the given backend holding the given position
+    :param board_class: GameBoard or BitboardGameBoard
+    :param rows: 8x8 list of piece symbols
+    :return: the board
+    """
+    board = board_class()
+    for row in range(8):
+        for col in range(8):
+            board.set_piece(row, col, rows[row][col])
+    return board
+
+
+def validate_all(board):
+    """
+    Checks every piece on the board against every end square
+    :param board: the board to validate moves on
+    :return: tuple of (number of checks, list of results)
+    """
+    results = []
+    for start_row in range(8):
+        for start_col in range(8):
+            if board.get_symbol(start_row, start_col):
+                for end_row in range(8):
+                    for end_col in range(8):
+                        results.append(board.is_valid_move(start_row, start_col, end_row, end_col))
+    return len(results), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare GameBoard backends on move validation")
+    parser.add_argument("--positions", type=int, default=20, help="number of random test positions")
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes over the positions per backend")
+    args = parser.parse_args()
+
+    positions = random_positions(1, plies=0) + random_positions(args.positions)  # the starting position first
+    expected = None
+
+    for board_class in (GameBoard, BitboardGameBoard):
+        boards = [load(board_class, rows) for rows in positions]
+        results = [validate_all(board)[1] for board in boards]  # warm up and collect answers
+
+        if expected is None:
+            expected = results
+        elif [[bool(r) for r in result] for result in results] != [[bool(r) for r in result] for result in expected]:
+            raise SystemExit(board_class.__name__ + " disagrees with GameBoard")
+
+        checks = 0
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for board in boards:
+                checks += validate_all(board)[0]
+        elapsed = time.perf_counter() - start
+
+        print("%-18s %10d checks  %8.3f s  %12.0f checks/s" % (board_class.__name__, checks, elapsed,
+                                                                 checks / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Description: Microbenchmark of fanning board updates out to in-process spectators.  Broadcasts random moves to
+#              thousands of subscribers that poll after every move, and reports the publish time per move, the
+#              delivery rate and the bytes each subscriber receives per move, against sending every subscriber a
+#              full board snapshot of the same format.  A board rebuilt from the deltas must match the game
+#              after every move.
+#
+#              Moves are picked at random among the non-captures, so the game lasts.
+#
+#              Run from the repository root:  python -m benchmarks.bench_broadcast [--subscribers 5000] [--moves 60]
+#                                             [--format json|text]
+import argparse
+import random
+import time
+
+from ChessVar import ChessVar
+from broadcast import Broadcaster
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure broadcasting moves to in-process subscribers")
+    parser.add_argument("--subscribers", type=int, default=5000, help="number of subscribers")
+    parser.add_argument("--moves", type=int, default=60, help="random moves to broadcast")
+    parser.add_argument("--format", choices=("text", "json"), default="json", help="frame format")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    broadcaster = Broadcaster(ChessVar())
+    subscribers = [broadcaster.subscribe(args.format) for _ in range(args.subscribers)]
+    for subscriber in subscribers:
+        subscriber.poll()  # the opening snapshot
+    watcher = broadcaster.subscribe("delta")  # keeps a board from the deltas to check them
+    squares = list(watcher.poll()[0].board_string)
+
+    publish_time = delivery_time = snapshot_time = 0.0
+    frames = delta_bytes = snapshot_bytes = moves = 0
+    for _ in range(args.moves):
+        game = broadcaster.get_game()
+        legal = game.generate_moves()
+        if not legal:
+            break
+        board = game.get_game_board()
+        quiet = [move for move in legal if not board.get_symbol(move[2], move[3])]  # captures end games quickly
+        start = time.perf_counter()
+        broadcaster.apply_move(*rng.choice(quiet or legal))
+        publish_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        for subscriber in subscribers:
+            for frame in subscriber.poll():
+                frames += 1
+                delta_bytes += len(frame)
+        delivery_time += time.perf_counter() - start
+
+        start = time.perf_counter()  # the same move sent as a full board
+        frame = broadcaster.snapshot().render(args.format)
+        snapshot_time += time.perf_counter() - start
+        snapshot_bytes += len(frame) * args.subscribers
+
+        for delta in watcher.poll():
+            delta.apply(squares)
+        if "".join(squares) != broadcaster.get_game().get_game_board().get_board_string():
+            raise SystemExit("the deltas do not rebuild the board")
+        moves += 1
+
+    print("%d subscribers, %d moves, %d frames delivered" % (args.subscribers, moves, frames))
+    print("publish %.1f us/move  delivery %.0f frames/s, %.2f us per subscriber per move" % (
+        publish_time / moves * 1e6, frames / delivery_time, delivery_time / moves / args.subscribers * 1e6))
+    print("%s bytes per subscriber per move: delta %.1f, full board %.1f (snapshot render %.1f us/move)" % (
+        args.format, delta_bytes / frames, snapshot_bytes / moves / args.subscribers, snapshot_time / moves * 1e6))
+
+
+if __name__ == "__main__":
+    main()
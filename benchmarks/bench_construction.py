@@ -0,0 +1,52 @@
+# Description: Microbenchmark of how many games per second can be created, for each GameBoard backend: new games
+#              copied from the START_POSITION template, games made from a saved mid-game Position template, and
+#              games set up square by square from a board string for comparison.  Every way must give the same
+#              position.
+#
+#              Run from the repository root:  python -m benchmarks.bench_construction [--games N]
+import argparse
+import time
+
+from ChessVar import ChessVar, GameBoard, BitboardGameBoard
+from perft import fixture_position
+
+
+def rate(make, games):
+    """
+    Times creating games
+    :param make: function taking no arguments that returns a new game
+    :param games: number of games to create
+    :return: games per second
+    """
+    start = time.perf_counter()
+    for _ in range(games):
+        make()
+    return games / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure ChessVar construction rate")
+    parser.add_argument("--games", type=int, default=20000, help="games created per measurement")
+    args = parser.parse_args()
+
+    middlegame = fixture_position("tactical")
+
+    for board_class in (GameBoard, BitboardGameBoard):
+        ways = [
+            ("ChessVar()", lambda: ChessVar(board_class())),
+            ("from_position(start)", lambda: ChessVar.from_position(board_class=board_class)),
+            ("from_position(fixture)", lambda: ChessVar.from_position(middlegame, board_class)),
+            ("from_board_string(fixture)",
+             lambda: ChessVar.from_board_string(middlegame.board_string, middlegame.turn, board_class=board_class)),
+        ]
+
+        if ChessVar.from_position(middlegame, board_class).to_fen() != ChessVar.from_board_string(
+                middlegame.board_string, middlegame.turn, board_class=board_class).to_fen():
+            raise SystemExit(board_class.__name__ + ": the template and the board string give different games")
+
+        for name, make in ways:
+            print("%-18s %-28s %10.0f games/s" % (board_class.__name__, name, rate(make, args.games)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Description: Microbenchmark of move validation as the board grows.  On 8x8, 10x10, 12x12 and 16x16 boards it plays
+#              random games from the starting position and then checks every piece against its valid moves and as
+#              many random end squares with each backend's is_valid_move, and also times apply_move/undo_move.  The
+#              cost per check should follow the pieces' jumps and rays, not the number of squares.  Both backends
+#              must give the same answers.
+#
+#              Run from the repository root:  python -m benchmarks.bench_geometry [--positions N] [--sizes 8 10 12 16]
+import argparse
+import random
+import time
+
+from ChessVar import BitboardGameBoard, BoardGeometry, ChessVar, GameBoard
+
+
+def random_games(geometry, count, plies=30, seed=1):
+    """
+    Plays random valid moves from the starting position
+    :param geometry: BoardGeometry of the games
+    :param count: number of games
+    :param plies: number of random moves played in each game
+    :param seed: random seed so every run benchmarks the same positions
+    :return: list of ChessVar games
+    """
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        game = ChessVar(geometry=geometry)
+        for _ in range(plies):
+            moves = game.generate_moves()
+            if not moves:
+                break
+            game.apply_move(*rng.choice(moves))
+        games.append(game)
+    return games
+
+
+def checks_for(game, rng):
+    """
+    Lists the moves to validate on a position: every valid move of both colors and one random end square for each
+    :param game: the ChessVar game
+    :param rng: random.Random choosing the end squares
+    :return: list of (start_row, start_col, end_row, end_col)
+    """
+    board = game.get_game_board()
+    geometry = board.get_geometry()
+    checks = []
+    for color in ("WHITE", "BLACK"):
+        for start_row, start_col, end_row, end_col in board.generate_moves(color):
+            checks.append((start_row, start_col, end_row, end_col))
+            checks.append((start_row, start_col, rng.randrange(geometry.rows), rng.randrange(geometry.cols)))
+    return checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure move validation on boards of different sizes")
+    parser.add_argument("--positions", type=int, default=20, help="number of random test positions per size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8, 10, 12, 16], help="board sizes, N for NxN")
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes over the positions")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    for size in args.sizes:
+        geometry = BoardGeometry(size, size)
+        games = random_games(geometry, args.positions)
+        work = [(game, checks_for(game, rng)) for game in games]
+        pieces = sum(len([symbol for symbol in game.get_game_board().get_symbols() if symbol]) for game in games)
+
+        rates = []
+        expected = None
+        for board_class in (GameBoard, BitboardGameBoard):
+            boards = []
+            for game, checks in work:
+                board = board_class(geometry)
+                board.load_board_string(game.get_game_board().get_board_string())
+                boards.append((board, checks))
+
+            results = [[board.is_valid_move(*check) for check in checks] for board, checks in boards]
+            if expected is None:
+                expected = results
+            elif results != expected:
+                raise SystemExit("%s disagrees with GameBoard on %dx%d" % (board_class.__name__, size, size))
+
+            count = 0
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for board, checks in boards:
+                    is_valid_move = board.is_valid_move
+                    for check in checks:
+                        is_valid_move(*check)
+                    count += len(checks)
+            rates.append(count / (time.perf_counter() - start))
+
+        plays = 0
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for game in games:
+                for move in game.generate_moves()[:20]:
+                    game.apply_move(*move)
+                    game.undo_move()
+                    plays += 1
+        play_rate = plays / (time.perf_counter() - start)
+
+        print("%2dx%-2d %4d squares %5.1f pieces  GameBoard %9.0f checks/s  BitboardGameBoard %9.0f checks/s  "
+              "apply+undo %8.0f/s" % (size, size, geometry.squares, pieces / len(games), rates[0], rates[1],
+                                      play_rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Description: Scaling benchmark of the parallel engine search.  Searches the same quiet positions to a fixed depth
+#              with 1, 2, 4 and 8 worker processes and reports nodes per second and time to depth, with the speedup
+#              of each over one worker.  The worker pools are started before timing, and the shared table is
+#              emptied before every search so each one starts cold.
+#
+#              Run from the repository root:  python -m benchmarks.bench_parallel [--depth 4] [--positions 4]
+import argparse
+import random
+
+from ChessVar import ChessVar
+from engine import ParallelEngine
+
+
+def quiet_positions(count, plies=12, seed=1):
+    """
+    Plays random moves from the starting position to get positions where no capture wins at once, so the search
+    has to reach its full depth
+    :param count: number of positions
+    :param plies: number of random moves played for each position
+    :param seed: random seed so every run benchmarks the same positions
+    :return: list of ChessVar games
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        game = ChessVar()
+        for _ in range(plies):
+            if game.get_game_state() != "UNFINISHED":
+                break
+            game.apply_move(*rng.choice(game.generate_moves()))
+
+        quiet = game.get_game_state() == "UNFINISHED"
+        for move in game.generate_moves() if quiet else []:
+            game.apply_move(*move)
+            quiet = game.get_game_state() == "UNFINISHED"
+            game.undo_move()
+            if not quiet:
+                break
+        if quiet:
+            positions.append(game)
+    return positions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure parallel search scaling")
+    parser.add_argument("--depth", type=int, default=4, help="search depth")
+    parser.add_argument("--positions", type=int, default=4, help="number of test positions")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="worker counts to compare")
+    args = parser.parse_args()
+
+    positions = quiet_positions(args.positions)
+    baseline = None
+
+    for workers in args.workers:
+        with ParallelEngine(workers) as engine:
+            engine.search(positions[0], depth=1)  # start the worker processes before timing
+
+            nodes = 0
+            elapsed = 0.0
+            for game in positions:
+                engine.clear()
+                result = engine.search(game, depth=args.depth)
+                nodes += result.nodes
+                elapsed += result.elapsed
+
+        if baseline is None:
+            baseline = elapsed, nodes / elapsed
+        print("workers %d  %10d nodes  %8.3f s to depth %d  %8.0f nodes/s  time speedup %.2f  nps speedup %.2f" % (
+            workers, nodes, elapsed, args.depth, nodes / elapsed, baseline[0] / elapsed,
+            nodes / elapsed / baseline[1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+# Description: Spectator broadcast for ChessVar games.  Moves played through a Broadcaster become deltas holding only
+#              the squares that changed, the captured piece, the player to move and the game state.  Each delta is
+#              encoded once per format and every subscriber gets the same frame, so a move costs the same whether
+#              ten or ten thousand spectators watch.  Subscribers read from one shared log with their own cursor.
+#              One that falls behind the log, or has just joined, gets a full snapshot instead.  A snapshot of any
+#              ply is rebuilt from the nearest keyframe and the deltas after it.
+#
+#              Example:  broadcaster = Broadcaster(ChessVar())
+#                        spectator = broadcaster.subscribe("json")
+#                        broadcaster.make_move("e2", "e4")
+#                        for frame in spectator.poll():           # a snapshot, then one delta per move
+#                            send(frame)
+#                        print(broadcaster.snapshot(0).render("text").decode())
+import json
+
+from ChessVar import parse_square, render_board, square_name
+
+FORMATS = ("delta", "text", "json")  # delta gives the BoardDelta and BoardSnapshot objects themselves
+DEFAULT_LOG_SIZE = 256  # frames kept for subscribers to catch up on before they are sent a snapshot
+DEFAULT_KEYFRAME_INTERVAL = 32  # plies between the full boards kept for snapshots
+
+
+class BoardDelta:
+    """
+    The change one move, or one move taken back, made to the board.  Encoded frames are cached, so a delta is
+    rendered once per format however many subscribers get it
+    """
+
+    __slots__ = ("ply", "changes", "capture", "to_move", "state", "_cols", "_frames")
+
+    def __init__(self, ply, changes, capture, to_move, state, cols=8):
+        """
+        :param ply: the ply the board is at after the change, the turn number less one
+        :param changes: tuple of (row, col, symbol) for each changed square, "." for an emptied square
+        :param capture: symbol of the captured piece, "" if none
+        :param to_move: "WHITE" or "BLACK", the player to move after the change
+        :param state: the game state after the change
+        :param cols: number of columns of the board, for the square numbers
+        """
+        self.ply = ply
+        self.changes = changes
+        self.capture = capture
+        self.to_move = to_move
+        self.state = state
+        self._cols = cols
+        self._frames = {}
+
+    def apply(self, squares):
+        """
+        Plays the delta on a board string held as a list
+        :param squares: list of one symbol per square, "." for empty, changed in place
+        """
+        for row, col, symbol in self.changes:
+            squares[row * self._cols + col] = symbol
+
+    def render(self, format):
+        """
+        Gets the delta as a frame
+        :param format: "text" for one line "DELTA <ply> <w|b> <square>=<symbol> ... [x<captured>] [<state>]",
+                       "json" for one JSON object per line, or "delta" for the delta itself
+        :return: the frame as bytes ending in a newline, or the delta
+        """
+        frame = self._frames.get(format)
+        if frame is None:
+            if format == "text":
+                fields = ["DELTA", str(self.ply), "w" if self.to_move == "WHITE" else "b"]
+                fields += ["%s=%s" % (square_name(row, col), symbol) for row, col, symbol in self.changes]
+                if self.capture:
+                    fields.append("x" + self.capture)
+                if self.state != "UNFINISHED":
+                    fields.append(self.state)
+                frame = (" ".join(fields) + "\n").encode()
+            elif format == "json":
+                frame = (json.dumps({"type": "delta", "ply": self.ply,
+                                     "changes": {square_name(row, col): symbol for row, col, symbol in self.changes},
+                                     "capture": self.capture or None, "to_move": self.to_move,
+                                     "state": self.state}, separators=(",", ":")) + "\n").encode()
+            elif format == "delta":
+                frame = self
+            else:
+                raise ValueError("format must be one of " + ", ".join(FORMATS))
+            self._frames[format] = frame
+        return frame
+
+
+class BoardSnapshot:
+    """
+    The full board at one ply
+    """
+
+    __slots__ = ("ply", "board_string", "to_move", "state", "geometry")
+
+    def __init__(self, ply, board_string, to_move, state, geometry):
+        """
+        :param ply: the ply, the turn number less one
+        :param board_string: the board, one character per square with "." for empty
+        :param to_move: "WHITE" or "BLACK"
+        :param state: the game state
+        :param geometry: BoardGeometry of the board
+        """
+        self.ply = ply
+        self.board_string = board_string
+        self.to_move = to_move
+        self.state = state
+        self.geometry = geometry
+
+    def render(self, format):
+        """
+        Gets the snapshot as a frame
+        :param format: "text" for a "SNAPSHOT <ply> <w|b> [<state>]" line followed by the board drawn as text,
+                       "json" for one JSON object per line with the rows from the top down, or "delta" for the
+                       snapshot itself
+        :return: the frame as bytes ending in a newline, or the snapshot
+        """
+        if format == "text":
+            header = "SNAPSHOT %d %s" % (self.ply, "w" if self.to_move == "WHITE" else "b")
+            if self.state != "UNFINISHED":
+                header += " " + self.state
+            return (header + "\n" + render_board(self.board_string, self.geometry)).encode()
+        if format == "json":
+            cols = self.geometry.cols
+            rows = [self.board_string[row * cols:(row + 1) * cols] for row in range(self.geometry.rows - 1, -1, -1)]
+            return (json.dumps({"type": "snapshot", "ply": self.ply, "rows": rows, "to_move": self.to_move,
+                                "state": self.state}, separators=(",", ":")) + "\n").encode()
+        if format == "delta":
+            return self
+        raise ValueError("format must be one of " + ", ".join(FORMATS))
+
+
+class Subscriber:
+    """
+    One spectator of a Broadcaster, reading the shared frame log from its own position
+    """
+
+    __slots__ = ("format", "_broadcaster", "_next")
+
+    def __init__(self, broadcaster, format):
+        self.format = format
+        self._broadcaster = broadcaster
+        self._next = None  # sequence number of the next frame to read, None until the first snapshot
+
+    def poll(self):
+        """
+        Gets the frames since the last poll.  The first poll, and any poll after falling further behind than the
+        log holds, gets a snapshot of the current board instead
+        :return: list of frames in the subscriber's format
+        """
+        return self._broadcaster._read(self)
+
+    def snapshot(self, ply=None):
+        """
+        Gets the full board at a ply in this subscriber's format
+        :param ply: the ply, defaults to the current one
+        :return: the frame
+        """
+        return self._broadcaster.snapshot(ply).render(self.format)
+
+
+class Broadcaster:
+    """
+    Plays moves on a game and publishes each change to subscribers.  Moves must go through the broadcaster to be
+    published
+    """
+
+    def __init__(self, game, log_size=DEFAULT_LOG_SIZE, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+        """
+        :param game: the ChessVar game to broadcast, snapshots go back to its position at this point
+        :param log_size: frames kept for subscribers that fall behind before they are sent a snapshot
+        :param keyframe_interval: plies between full boards kept for snapshots
+        """
+        self._game = game
+        self._geometry = game.get_game_board().get_geometry()
+        self._log_size = log_size
+        self._keyframe_interval = keyframe_interval
+
+        self._first_ply = game.get_current_turn() - 1
+        self._first_position = (game.get_current_player(), game.get_game_state())
+        self._history = []  # the delta leading to each ply after the first
+        self._keyframes = [game.get_game_board().get_board_string()]  # every keyframe_interval plies
+
+        self._log = []  # recent frames, self._log[0] has sequence number self._log_start
+        self._log_start = 0
+        self._subscribers = set()
+
+    @property
+    def ply(self):
+        return self._first_ply + len(self._history)
+
+    def get_game(self):
+        return self._game
+
+    def subscribe(self, format="text"):
+        """
+        Adds a subscriber, its first poll returns a snapshot of the current board
+        :param format: "text", "json" or "delta"
+        :return: the Subscriber
+        """
+        if format not in FORMATS:
+            raise ValueError("format must be one of " + ", ".join(FORMATS))
+        subscriber = Subscriber(self, format)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.discard(subscriber)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def make_move(self, start_point, end_point):
+        """
+        Plays a move with ChessVar.make_move and publishes it if it was valid
+        :param start_point: start square name, for example "e2"
+        :param end_point: end square name
+        :return: True if the move was valid and played
+        """
+        board = self._game.get_game_board()
+        start_row, start_col = parse_square(start_point)
+        end_row, end_col = parse_square(end_point)
+        if not (board.is_on_board(start_row, start_col) and board.is_on_board(end_row, end_col)):
+            return False
+        symbol, captured = board.get_symbol(start_row, start_col), board.get_symbol(end_row, end_col)
+
+        if not self._game.make_move(start_point, end_point):
+            return False
+        self._publish_move(start_row, start_col, end_row, end_col, symbol, captured)
+        return True
+
+    def apply_move(self, start_row, start_col, end_row, end_col):
+        """
+        Plays a move already known to be valid with ChessVar.apply_move and publishes it
+        :param start_row: Starting row of the piece
+        :param start_col: Starting column of the piece
+        :param end_row: End row of the piece
+        :param end_col: End column of the piece
+        """
+        board = self._game.get_game_board()
+        symbol, captured = board.get_symbol(start_row, start_col), board.get_symbol(end_row, end_col)
+        self._game.apply_move(start_row, start_col, end_row, end_col)
+        self._publish_move(start_row, start_col, end_row, end_col, symbol, captured)
+
+    def undo_move(self):
+        """
+        Takes back the last move with ChessVar.undo_move and publishes the squares it restored
+        :return: True if a move was taken back, False if there is no published move to take back
+        """
+        if not self._history or not self._game.undo_move():
+            return False
+
+        delta = self._history.pop()
+        if len(self._history) // self._keyframe_interval + 1 < len(self._keyframes):
+            self._keyframes.pop()  # the keyframe of the ply taken back
+
+        board = self._game.get_game_board()
+        changes = tuple((row, col, board.get_symbol(row, col) or ".") for row, col, _ in delta.changes)
+        self._append(BoardDelta(self.ply, changes, "", self._game.get_current_player(),
+                                self._game.get_game_state(), self._geometry.cols))
+        return True
+
+    def _publish_move(self, start_row, start_col, end_row, end_col, symbol, captured):
+        """
+        Records the delta of a move just played and adds it to the log
+        """
+        delta = BoardDelta(self.ply + 1, ((start_row, start_col, "."), (end_row, end_col, symbol)), captured,
+                           self._game.get_current_player(), self._game.get_game_state(), self._geometry.cols)
+        self._history.append(delta)
+        if not len(self._history) % self._keyframe_interval:
+            self._keyframes.append(self._game.get_game_board().get_board_string())
+        self._append(delta)
+
+    def _append(self, delta):
+        """
+        Adds a frame to the shared log, dropping the oldest half once it holds twice log_size frames
+        """
+        self._log.append(delta)
+        if len(self._log) >= 2 * self._log_size:
+            del self._log[:self._log_size]
+            self._log_start += self._log_size
+
+    def _read(self, subscriber):
+        """
+        Gets a subscriber's frames since its last read and moves its position to the end of the log
+        """
+        end = self._log_start + len(self._log)
+        position = subscriber._next
+        subscriber._next = end
+
+        if position is None or position < self._log_start or end - position > self._log_size:
+            return [self.snapshot().render(subscriber.format)]  # new, or too far behind to catch up
+        format = subscriber.format
+        return [delta.render(format) for delta in self._log[position - self._log_start:]]
+
+    def snapshot(self, ply=None):
+        """
+        Rebuilds the full board at a ply from the nearest keyframe before it and the deltas after that
+        :param ply: the ply, from the one the broadcaster started at to the current one, defaults to the current one
+        :return: BoardSnapshot
+        """
+        if ply is None:
+            ply = self.ply
+        if not self._first_ply <= ply <= self.ply:
+            raise ValueError("ply %d is not between %d and %d" % (ply, self._first_ply, self.ply))
+
+        index = ply - self._first_ply  # number of deltas played to reach the ply
+        keyframe = index // self._keyframe_interval
+        squares = list(self._keyframes[keyframe])
+        for delta in self._history[keyframe * self._keyframe_interval:index]:
+            delta.apply(squares)
+
+        if index:
+            to_move, state = self._history[index - 1].to_move, self._history[index - 1].state
+        else:
+            to_move, state = self._first_position
+        return BoardSnapshot(ply, "".join(squares), to_move, state, self._geometry)
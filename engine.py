@@ -0,0 +1,392 @@
+# Description: Alpha-beta search engine for ChessVar.  Negamax with iterative deepening, a transposition table,
+#              move ordering and a time budget.  The game is won by capturing the last piece of a type, so the
+#              evaluation scores how close each side is to losing a whole type instead of looking for checkmate.
+#
+#              With workers=N the search runs Lazy SMP style in N processes: every process searches the same
+#              position, sharing a transposition table in shared memory, with the helpers trying moves in
+#              different orders so they fill the table with lines the others can use.
+#
+#              Example:  result = best_move(game, time_limit=1.0)
+#                        game.apply_move(*result.move)
+#                        print(result)  # depth, score, nodes per second and principal variation
+import concurrent.futures
+import random
+import time
+
+from ChessVar import ChessVar, GameBoard, STANDARD_GEOMETRY, ZOBRIST_BLACK_TO_MOVE, square_name
+from transposition import SharedTranspositionTable, TranspositionTable
+
+WIN_SCORE = 100000  # score of a won position, less the number of plies it takes to win
+DEFAULT_DEPTH = 3  # depth searched when neither a depth nor a time limit is given
+MAX_DEPTH = 64  # depth limit of a search that only has a time limit
+QUIESCENCE_DEPTH = 6  # how many captures deep the search follows after reaching its depth
+
+# Value of one piece of each type
+PIECE_VALUES = {'p': 100, 'n': 300, 'b': 320, 'r': 500, 'q': 900, 'k': 300}
+
+# Losing the last piece of any type loses the game, so each type is penalized by SCARCITY_PENALTY / count: a side
+# down to one queen, one king or one rook is closer to losing than its material alone says
+SCARCITY_PENALTY = 400
+
+# Transposition table entry flags
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time budget runs out
+    """
+
+
+class SearchResult:
+    """
+    The outcome of a search: the best move, its score and the search statistics
+    """
+
+    def __init__(self, move, score, depth, nodes, elapsed, pv):
+        """
+        :param move: best move as (start_row, start_col, end_row, end_col), None if there is no move
+        :param score: score of the move for the player to move, WIN_SCORE minus plies for a forced win
+        :param depth: deepest completed search depth
+        :param nodes: number of positions searched
+        :param elapsed: search time in seconds
+        :param pv: principal variation, the expected line of moves starting with move
+        """
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.pv = pv
+
+    @property
+    def nodes_per_second(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return "depth %d score %d nodes %d nps %.0f pv %s" % (
+            self.depth, self.score, self.nodes, self.nodes_per_second,
+            " ".join(square_name(m[0], m[1]) + square_name(m[2], m[3]) for m in self.pv))
+
+
+def evaluate(board, color):
+    """
+    Scores a position for one color from the material table
+    :param board: the GameBoard
+    :param color: the color to score for
+    :return: score, positive when the color is ahead
+    """
+    score = 0
+    for side, sign in (("WHITE", 1), ("BLACK", -1)):
+        for piece_type, count in board.get_material(side).items():
+            if count:
+                score += sign * (PIECE_VALUES[piece_type] * count - SCARCITY_PENALTY // count)
+    return score if color == "WHITE" else -score
+
+
+class Engine:
+    """
+    Searches ChessVar positions, keeping its transposition table between searches
+    """
+
+    def __init__(self, tt_size=1 << 18, replacement="depth", table=None, seed=None):
+        """
+        :param tt_size: number of transposition table entries
+        :param replacement: transposition table replacement policy, "depth" or "always"
+        :param table: transposition table to use instead of a new one, for example a SharedTranspositionTable
+        :param seed: when given, quiet moves are searched in a random order from this seed instead of the order
+                     they were generated in, so parallel searches of one position spread over different moves
+        """
+        self._table = table if table is not None else TranspositionTable(tt_size, replacement)
+        self._rng = random.Random(seed) if seed is not None else None
+        self._board = None
+        self._nodes = 0
+        self._deadline = None
+        self._stop = None
+
+    def search(self, game, depth=None, time_limit=None, stop=None):
+        """
+        Finds the best move for the player to move with iterative deepening
+        :param game: the ChessVar game, it is not changed
+        :param depth: depth to search to, defaults to DEFAULT_DEPTH, or MAX_DEPTH when a time limit is given
+        :param time_limit: seconds to search for, the last fully searched depth is used when it runs out
+        :param stop: optional function returning True when the search must end early, checked with the time
+        :return: SearchResult
+        """
+        start_time = time.perf_counter()
+        if depth is None:
+            depth = MAX_DEPTH if time_limit is not None else DEFAULT_DEPTH
+        self._deadline = start_time + time_limit if time_limit is not None else None
+        self._stop = stop
+        self._nodes = 0
+
+        color = game.get_current_player()
+        geometry = game.get_game_board().get_geometry()
+        self._board = GameBoard(geometry)
+        for square, symbol in enumerate(game.get_game_board().get_symbols()):
+            self._board.set_piece(square // geometry.cols, square % geometry.cols, symbol)
+
+        root_moves = game.generate_moves()
+        if not root_moves:
+            return SearchResult(None, 0, 0, 0, time.perf_counter() - start_time, [])
+
+        result = SearchResult(self._order(root_moves, color, None)[0], 0, 0, 0, 0.0, [])
+        for current_depth in range(1, depth + 1):
+            try:
+                score, pv = self._negamax(color, current_depth, -WIN_SCORE - 1, WIN_SCORE + 1, 0)
+            except SearchTimeout:
+                break  # keep the result of the last completed depth
+
+            result = SearchResult(pv[0], score, current_depth, 0, 0.0, pv)
+            if abs(score) >= WIN_SCORE - MAX_DEPTH:
+                break  # forced win or loss found, searching deeper will not change it
+
+        result.nodes = self._nodes
+        result.elapsed = time.perf_counter() - start_time
+        return result
+
+    def _key(self, color):
+        return self._board.get_zobrist_key() ^ (ZOBRIST_BLACK_TO_MOVE if color == "BLACK" else 0)
+
+    def _make(self, move):
+        """
+        Plays a move on the search board
+        :param move: (start_row, start_col, end_row, end_col)
+        :return: tuple of (moved symbol, captured symbol, True if the capture won the game)
+        """
+        start_row, start_col, end_row, end_col = move
+        board = self._board
+        moved = board.get_symbol(start_row, start_col)
+        captured = board.get_symbol(end_row, end_col)
+        board.set_piece(end_row, end_col, moved)
+        board.set_piece(start_row, start_col, "")
+        won = bool(captured) and not board.get_piece_count(
+            "WHITE" if captured.isupper() else "BLACK", captured.lower())
+        return moved, captured, won
+
+    def _unmake(self, move, moved, captured):
+        start_row, start_col, end_row, end_col = move
+        self._board.set_piece(start_row, start_col, moved)
+        self._board.set_piece(end_row, end_col, captured)
+
+    def _order(self, moves, color, best):
+        """
+        Orders moves so the strongest are searched first: the transposition table move, captures that win the
+        game, other captures by most valuable victim and least valuable attacker, then quiet moves
+        :param moves: list of moves
+        :param color: the color moving
+        :param best: best move stored for this position, or None
+        :return: the ordered list
+        """
+        board = self._board
+        opponent = "BLACK" if color == "WHITE" else "WHITE"
+
+        def priority(move):
+            if move == best:
+                return -10 ** 9
+            victim = board.get_symbol(move[2], move[3])
+            if not victim:
+                return 0
+            victim_type = victim.lower()
+            attacker_value = PIECE_VALUES[board.get_symbol(move[0], move[1]).lower()]
+            if board.get_piece_count(opponent, victim_type) == 1:
+                return -10 ** 6 - attacker_value  # the capture wins the game
+            return attacker_value - 10 * PIECE_VALUES[victim_type]
+
+        if self._rng is not None:
+            moves = list(moves)
+            self._rng.shuffle(moves)  # the sort keeps this order among moves of the same priority
+        return sorted(moves, key=priority)
+
+    def _check_time(self):
+        self._nodes += 1
+        if not self._nodes & 1023 and ((self._deadline is not None and time.perf_counter() > self._deadline) or
+                                       (self._stop is not None and self._stop())):
+            raise SearchTimeout()
+
+    def _negamax(self, color, depth, alpha, beta, ply):
+        """
+        Negamax alpha-beta search
+        :param color: the color to move
+        :param depth: remaining depth
+        :param alpha: lower bound of the score
+        :param beta: upper bound of the score
+        :param ply: distance from the root
+        :return: tuple of (score for the color to move, principal variation)
+        """
+        self._check_time()
+        if depth <= 0:
+            return self._quiesce(color, alpha, beta, ply, QUIESCENCE_DEPTH), []
+
+        key = self._key(color)
+        entry = self._table.probe(key)
+        best = None
+        original_alpha = alpha
+
+        if entry is not None:
+            entry_depth, (entry_score, flag, best) = entry
+            entry_score = _score_from_table(entry_score, ply)
+            if entry_depth >= depth and ply > 0:
+                if flag == EXACT or (flag == LOWER_BOUND and entry_score >= beta) or (
+                        flag == UPPER_BOUND and entry_score <= alpha):
+                    return entry_score, [best] if best else []
+
+        moves = self._board.generate_moves(color)
+        if not moves:
+            return 0, []  # a player without moves cannot lose a piece type, score it as even
+
+        opponent = "BLACK" if color == "WHITE" else "WHITE"
+        best_score, best_pv = -WIN_SCORE - 1, []
+
+        for move in self._order(moves, color, best):
+            moved, captured, won = self._make(move)
+            if won:
+                score, line = WIN_SCORE - ply - 1, []
+            else:
+                score, line = self._negamax(opponent, depth - 1, -beta, -alpha, ply + 1)
+                score = -score
+            self._unmake(move, moved, captured)
+
+            if score > best_score:
+                best_score, best_pv = score, [move] + line
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        flag = UPPER_BOUND if best_score <= original_alpha else LOWER_BOUND if best_score >= beta else EXACT
+        self._table.store(key, depth, (_score_to_table(best_score, ply), flag, best_pv[0]))
+        return best_score, best_pv
+
+    def _quiesce(self, color, alpha, beta, ply, depth):
+        """
+        Searches captures only until the position is quiet, so the evaluation is not taken in the middle of
+        an exchange
+        :return: score for the color to move
+        """
+        stand_pat = evaluate(self._board, color)
+        if stand_pat >= beta or depth == 0:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        board = self._board
+        captures = [move for move in board.generate_moves(color) if board.get_symbol(move[2], move[3])]
+        opponent = "BLACK" if color == "WHITE" else "WHITE"
+
+        for move in self._order(captures, color, None):
+            self._check_time()
+            moved, captured, won = self._make(move)
+            score = WIN_SCORE - ply - 1 if won else -self._quiesce(opponent, -beta, -alpha, ply + 1, depth - 1)
+            self._unmake(move, moved, captured)
+
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
+
+
+def _score_to_table(score, ply):
+    """
+    Stores win scores as distance from the position instead of from the root
+    """
+    if score >= WIN_SCORE - MAX_DEPTH * 2:
+        return score + ply
+    if score <= -WIN_SCORE + MAX_DEPTH * 2:
+        return score - ply
+    return score
+
+
+def _score_from_table(score, ply):
+    if score >= WIN_SCORE - MAX_DEPTH * 2:
+        return score - ply
+    if score <= -WIN_SCORE + MAX_DEPTH * 2:
+        return score + ply
+    return score
+
+
+def _search_worker(fen, table, number, depth, time_limit):
+    """
+    Searches a position in a worker process of a ParallelEngine
+    :param fen: the position, as written by ChessVar.to_fen
+    :param table: the SharedTranspositionTable
+    :param number: worker number, 0 searches like a single process engine, the others are helpers
+    :param depth: depth to search to, helpers with an odd number search one move deeper
+    :param time_limit: seconds to search for
+    :return: SearchResult
+    """
+    if depth is not None:
+        depth += number % 2
+    engine = Engine(table=table, seed=number if number else None)
+    result = engine.search(ChessVar.from_fen(fen), depth, time_limit, stop=table.stop_requested)
+    table.request_stop()  # the first worker to finish ends the search for all of them
+    return result
+
+
+class ParallelEngine:
+    """
+    Searches with several worker processes sharing one transposition table.  Keep it around between moves so the
+    processes and the table are reused, and close it when done
+    """
+
+    def __init__(self, workers, tt_size=1 << 18):
+        """
+        :param workers: number of worker processes
+        :param tt_size: number of shared transposition table entries
+        """
+        self.workers = workers
+        self._table = SharedTranspositionTable(tt_size)
+        self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+
+    def search(self, game, depth=None, time_limit=None):
+        """
+        Finds the best move for the player to move
+        :param game: the ChessVar game, it is not changed
+        :param depth: depth to search to, defaults to DEFAULT_DEPTH, or MAX_DEPTH when a time limit is given
+        :param time_limit: seconds to search for
+        :return: SearchResult of the deepest search, with the nodes of every worker
+        :raises ValueError: if the game is not on the standard 8x8 board, the shared table packs 8x8 moves
+        """
+        if game.get_game_board().get_geometry() is not STANDARD_GEOMETRY:
+            raise ValueError("parallel search needs the standard 8x8 board")
+        start_time = time.perf_counter()
+        self._table.reset_stop()
+        fen = game.to_fen()
+        futures = [self._executor.submit(_search_worker, fen, self._table, number, depth, time_limit)
+                   for number in range(self.workers)]
+        results = [future.result() for future in futures]
+
+        best = max(results, key=lambda result: result.depth)  # the first of the deepest, worker 0 on ties
+        return SearchResult(best.move, best.score, best.depth, sum(result.nodes for result in results),
+                            time.perf_counter() - start_time, best.pv)
+
+    def clear(self):
+        """
+        Empties the shared transposition table, for starting a new game
+        """
+        self._table.clear()
+
+    def close(self):
+        self._executor.shutdown()
+        self._table.close()
+        self._table.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def best_move(game, depth=None, time_limit=None, workers=1):
+    """
+    Finds the best move for the player to move
+    :param game: the ChessVar game, it is not changed
+    :param depth: depth to search to, defaults to DEFAULT_DEPTH, or MAX_DEPTH when a time limit is given
+    :param time_limit: seconds to search for
+    :param workers: number of processes to search with, see ParallelEngine to keep them between moves
+    :return: SearchResult, its move is None when the game is over
+    """
+    if workers > 1:
+        with ParallelEngine(workers) as engine:
+            return engine.search(game, depth, time_limit)
+    return Engine().search(game, depth, time_limit)
@@ -0,0 +1,202 @@
+# Description: PGN-like game records for ChessVar.  A record is a block of [Tag "value"] lines followed by the moves
+#              in coordinate notation and the result, with a blank line between games:
+#
+#                  [White "engine"]
+#                  [Black "greedy"]
+#                  [Result "1-0"]
+#
+#                  1. e2e4 d7d5 2. e4d5 ... 1-0
+#
+#              read_games streams records from a file one at a time, so memory stays flat however large the file
+#              is, and GameWriter appends finished games to a file as they come in.
+import re
+
+from ChessVar import ChessVar, parse_square
+
+RESULTS = {"WHITE_WON": "1-0", "BLACK_WON": "0-1", "UNFINISHED": "*"}
+STATES = {result: state for state, result in RESULTS.items()}
+START_FEN = ChessVar().to_fen()
+LINE_LENGTH = 80
+
+_TAG = re.compile(r'^\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]\s*$')
+_MOVE = re.compile(r"^([a-z]\d+)[-x]?([a-z]\d+)$")
+
+
+class GameRecord:
+    """
+    One game read from a record file: its tags and its moves
+    """
+
+    def __init__(self, tags, moves):
+        """
+        :param tags: dict of tag name to value
+        :param moves: list of (start_point, end_point) square names
+        """
+        self.tags = tags
+        self.moves = moves
+
+    @property
+    def result(self):
+        """
+        The game state the record ends with, "UNFINISHED" if it has no result
+        """
+        return STATES.get(self.tags.get("Result", "*"), "UNFINISHED")
+
+    def replay(self, validate=True, board_class=None):
+        """
+        Plays the record's moves from its starting position
+        :param validate: check every move with make_move, turn off for trusted archives to play the moves
+                         without checking them
+        :param board_class: GameBoard backend to use, defaults to GameBoard
+        :return: the ChessVar game after the last move
+        :raises ValueError: if validate is on and a move is not valid
+        """
+        fen = self.tags.get("FEN")
+        game = ChessVar.from_fen(fen, board_class) if fen else ChessVar(board_class() if board_class else None)
+
+        for ply, (start_point, end_point) in enumerate(self.moves):
+            if validate:
+                if not game.make_move(start_point, end_point):
+                    raise ValueError("move %d %s%s is not valid" % (ply + 1, start_point, end_point))
+            else:
+                game.apply_move(*(parse_square(start_point) + parse_square(end_point)))
+        return game
+
+
+def format_game(game, tags=None):
+    """
+    Writes a game as a record
+    :param game: the ChessVar game, its moves come from get_move_history
+    :param tags: optional dict of extra tags, for example {"White": "engine"}
+    :return: the record text, ending with a blank line
+    """
+    moves = game.get_move_history()
+    start_position = game.get_start_position()
+    start_fen = start_position.to_fen()
+    start_turn = start_position.turn
+
+    all_tags = dict(tags or {})
+    all_tags["Result"] = RESULTS[game.get_game_state()]
+    if start_fen != START_FEN:
+        all_tags["FEN"] = start_fen
+
+    lines = ['[%s "%s"]' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+             for name, value in all_tags.items()]
+    lines.append("")
+
+    tokens = []  # move numbers stay on the same line as the move after them
+    for ply, (start_point, end_point) in enumerate(moves):
+        turn = start_turn + ply
+        if turn % 2 == 1:
+            tokens.append("%d. %s%s" % ((turn + 1) // 2, start_point, end_point))
+        elif ply == 0:
+            tokens.append("%d... %s%s" % (turn // 2, start_point, end_point))  # the record starts with black
+        else:
+            tokens.append(start_point + end_point)
+    tokens.append(all_tags["Result"])
+
+    line = ""
+    for token in tokens:  # wrap the move text
+        if line and len(line) + 1 + len(token) > LINE_LENGTH:
+            lines.append(line)
+            line = token
+        else:
+            line = line + " " + token if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+
+def _parse(tag_lines, move_lines):
+    tags = {}
+    for line in tag_lines:
+        match = _TAG.match(line)
+        if not match:
+            raise ValueError("bad tag line: " + line)
+        tags[match.group(1)] = re.sub(r"\\(.)", r"\1", match.group(2))
+
+    moves = []
+    for token in " ".join(move_lines).split():
+        if token.endswith(".") or token in STATES:
+            continue  # move numbers and the result
+        match = _MOVE.match(token)
+        if not match:
+            raise ValueError("bad move: " + token)
+        moves.append((match.group(1), match.group(2)))
+    return GameRecord(tags, moves)
+
+
+def read_games(source):
+    """
+    Reads records one at a time
+    :param source: path of a record file, or an open text file
+    :return: generator of GameRecord
+    """
+    if isinstance(source, str):
+        with open(source) as file:
+            yield from read_games(file)
+        return
+
+    tag_lines, move_lines = [], []
+    for line in source:
+        line = line.strip()
+        if line.startswith("["):
+            if move_lines:  # a new game starts without a blank line after the last one
+                yield _parse(tag_lines, move_lines)
+                tag_lines, move_lines = [], []
+            tag_lines.append(line)
+        elif line:
+            move_lines.append(line)
+        elif move_lines:  # the blank line after the moves ends the game
+            yield _parse(tag_lines, move_lines)
+            tag_lines, move_lines = [], []
+
+    if tag_lines or move_lines:
+        yield _parse(tag_lines, move_lines)
+
+
+def replay_games(source, validate=True, board_class=None):
+    """
+    Reads records one at a time and replays each of them
+    :param source: path of a record file, or an open text file
+    :param validate: check every move with make_move, turn off for trusted archives
+    :param board_class: GameBoard backend to use, defaults to GameBoard
+    :return: generator of (GameRecord, ChessVar) pairs
+    """
+    for record in read_games(source):
+        yield record, record.replay(validate, board_class)
+
+
+class GameWriter:
+    """
+    Appends games to a record file as they finish
+    """
+
+    def __init__(self, path, flush_every=1):
+        """
+        :param path: path of the record file, created if it does not exist
+        :param flush_every: number of games between flushes to disk
+        """
+        self._file = open(path, "a")
+        self._flush_every = flush_every
+        self._unflushed = 0
+
+    def write(self, game, tags=None):
+        """
+        Appends one game
+        :param game: the ChessVar game
+        :param tags: optional dict of extra tags
+        """
+        self._file.write(format_game(game, tags))
+        self._unflushed += 1
+        if self._unflushed >= self._flush_every:
+            self._file.flush()
+            self._unflushed = 0
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,201 @@
+# Description: Optional timing of the stages of the ChessVar move pipeline: move generation, make_move and
+#              apply_move, the boards' and the pieces' is_valid_move, GameBoard.get_piece, the move history record
+#              and the win check after a capture.  While enabled each stage's methods are wrapped with a timer that
+#              counts calls and keeps cumulative and sampled times for percentiles.  Disabling puts the original
+#              methods back, so it costs nothing when it is off.
+#
+#              Example:  with instrument.profile() as stats:
+#                            tournament.play_game("greedy", "random", seed=1)   # generate_moves and apply_move
+#                            game = ChessVar()
+#                            game.make_move("e2", "e4")                         # make_move down to the pieces
+#                        print(json.dumps(stats.snapshot(), indent=2))
+import contextlib
+import json
+import random
+import time
+from array import array
+
+from ChessVar import BitboardGameBoard, Bishop, ChessVar, GameBoard, King, Knight, Pawn, Queen, Rook
+
+MAX_SAMPLES = 100000  # timings kept per stage for percentiles, later calls replace them at random
+
+# Stage name -> the (class, method name) pairs it times
+STAGES = {
+    "generate_moves": [(GameBoard, "generate_moves")],
+    "make_move": [(ChessVar, "make_move")],
+    "apply_move": [(ChessVar, "apply_move")],
+    "get_piece": [(GameBoard, "get_piece")],
+    "is_valid_move": [(GameBoard, "is_valid_move"), (BitboardGameBoard, "is_valid_move")],
+    "piece_is_valid_move": [(piece_class, "is_valid_move") for piece_class in (Pawn, Rook, Knight, Bishop, Queen,
+                                                                                King)],
+    "record_history": [(ChessVar, "_record_move")],
+    "win_check": [(ChessVar, "_check_winner")],
+}
+
+PERCENTILES = (50, 90, 99)
+
+
+class StageStats:
+    """
+    Call count, total time and a reservoir of sampled call times of one stage
+    """
+
+    __slots__ = ("calls", "total_ns", "max_ns", "samples", "_rng")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.samples = array('Q')
+        self._rng = random.Random(0)
+
+    def add(self, elapsed_ns):
+        self.calls += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(elapsed_ns)
+        else:
+            slot = self._rng.randrange(self.calls)  # reservoir sampling keeps every call equally likely
+            if slot < MAX_SAMPLES:
+                self.samples[slot] = elapsed_ns
+
+    def snapshot(self):
+        """
+        :return: dict of the call count, total seconds, and mean, percentile and maximum call times in microseconds
+        """
+        ordered = sorted(self.samples)
+        result = {"calls": self.calls, "total_s": self.total_ns / 1e9,
+                  "mean_us": self.total_ns / self.calls / 1000 if self.calls else 0.0}
+        for percentile in PERCENTILES:
+            result["p%d_us" % percentile] = (
+                ordered[min(len(ordered) * percentile // 100, len(ordered) - 1)] / 1000 if ordered else 0.0)
+        result["max_us"] = self.max_ns / 1000
+        return result
+
+
+class Instrumentation:
+    """
+    The timing wrappers and the statistics they collect
+    """
+
+    def __init__(self, stages=None):
+        """
+        :param stages: names from STAGES to time, defaults to all of them
+        """
+        self.stages = list(stages or STAGES)
+        unknown = set(self.stages) - set(STAGES)
+        if unknown:
+            raise ValueError("unknown stages: " + ", ".join(sorted(unknown)))
+        self.stats = {stage: StageStats() for stage in self.stages}
+        self._timing = []  # (class, method name, StageStats) of every method this instrumentation times
+
+    @property
+    def enabled(self):
+        return bool(self._timing)
+
+    def enable(self):
+        """
+        Wraps the stages' methods with timers, does nothing if they are already wrapped
+        """
+        if self.enabled:
+            return
+        for stage in self.stages:
+            for cls, name in STAGES[stage]:
+                _wrap(cls, name, self.stats[stage])
+                self._timing.append((cls, name, self.stats[stage]))
+
+    def disable(self):
+        """
+        Stops timing, the original methods are put back once no instrumentation times them
+        """
+        for cls, name, stats in reversed(self._timing):
+            _unwrap(cls, name, stats)
+        self._timing = []
+
+    def reset(self):
+        """
+        Clears the statistics collected so far
+        """
+        self.stats = {stage: StageStats() for stage in self.stages}
+        if self.enabled:  # the wrappers hold the old statistics
+            self.disable()
+            self.enable()
+
+    def snapshot(self):
+        """
+        :return: dict of stage name to its StageStats.snapshot
+        """
+        return {stage: stats.snapshot() for stage, stats in self.stats.items()}
+
+    def to_json(self, **kwargs):
+        """
+        :param kwargs: passed to json.dumps, for example indent=2
+        :return: the snapshot as JSON text
+        """
+        return json.dumps(self.snapshot(), **kwargs)
+
+
+# (class, method name) -> (original method, list of the StageStats timing it) of every method wrapped at the moment.
+# A method has one wrapper however many instrumentations time it, so they can be enabled and disabled in any order
+_WRAPPED = {}
+
+
+def _wrap(cls, name, stats):
+    """
+    Adds stats to the timers of a method, wrapping the method if it is not wrapped yet
+    """
+    entry = _WRAPPED.get((cls, name))
+    if entry is None:
+        original = cls.__dict__[name]
+        entry = _WRAPPED[(cls, name)] = (original, [])
+        setattr(cls, name, _timed(original, entry[1]))
+    entry[1].append(stats)
+
+
+def _unwrap(cls, name, stats):
+    """
+    Removes stats from the timers of a method, putting the original method back when it was the last one
+    """
+    original, timers = _WRAPPED[(cls, name)]
+    timers.remove(stats)
+    if not timers:
+        setattr(cls, name, original)
+        del _WRAPPED[(cls, name)]
+
+
+def _timed(method, timers):
+    """
+    Wraps a method to add the time of every call to each StageStats in timers
+    """
+    clock = time.perf_counter_ns
+
+    def timed(*args, **kwargs):
+        start = clock()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            elapsed = clock() - start
+            for stats in timers:
+                stats.add(elapsed)
+
+    timed.__name__ = method.__name__
+    timed.__doc__ = method.__doc__
+    timed.__wrapped__ = method
+    return timed
+
+
+@contextlib.contextmanager
+def profile(stages=None):
+    """
+    Times the pipeline stages for the code inside the with block
+    :param stages: names from STAGES to time, defaults to all of them
+    :return: context manager giving the Instrumentation, its statistics stay readable after the block
+    """
+    instrumentation = Instrumentation(stages)
+    instrumentation.enable()
+    try:
+        yield instrumentation
+    finally:
+        instrumentation.disable()
@@ -0,0 +1,266 @@
+# Description: Monte Carlo tree search player for ChessVar.  UCT picks which line to explore, random playouts score
+#              the positions it reaches, and the tree is kept between moves so the search under the moves actually
+#              played is not thrown away.  Playouts run straight on a GameBoard with set_piece, without the move
+#              history, captured piece lists or display work of ChessVar.make_move, and are undone the same way.
+#
+#              Example:  player = MCTSPlayer(playouts=2000)
+#                        result = player.search(game)
+#                        game.apply_move(*result.move)
+#                        print(result)  # playouts, playouts per second and the move's win rate
+#
+#              Run:  python mcts.py [--playouts 1000] [--moves 10]
+import argparse
+import math
+import random
+import time
+
+from ChessVar import ChessVar, GameBoard, ZOBRIST_BLACK_TO_MOVE, square_name
+from engine import evaluate
+
+DEFAULT_PLAYOUTS = 1000
+DEFAULT_EXPLORATION = 1.4  # UCT exploration constant, about sqrt(2)
+MAX_PLAYOUT_PLIES = 80  # a playout still unfinished after this many moves is scored by material
+REUSE_DEPTH = 2  # how many moves below the last root the next root is looked for
+
+
+class Node:
+    """
+    One position in the search tree, reached by move from its parent
+    """
+
+    __slots__ = ("move", "parent", "children", "untried", "key", "visits", "score", "winner")
+
+    def __init__(self, move, parent, key, winner):
+        """
+        :param move: move from the parent, None for the root
+        :param parent: parent Node, None for the root
+        :param key: Zobrist key of the position with the player to move
+        :param winner: "WHITE" or "BLACK" if the move won the game, otherwise None
+        """
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried = None  # moves not yet expanded, generated on the first visit
+        self.key = key
+        self.visits = 0
+        self.score = 0.0  # total playout result for the player who made move, 1 a win, 0.5 a draw
+        self.winner = winner
+
+
+class MCTSResult:
+    """
+    The outcome of a search: the chosen move and the search statistics
+    """
+
+    def __init__(self, move, visits, win_rate, playouts, elapsed, tree_size):
+        """
+        :param move: chosen move as (start_row, start_col, end_row, end_col), None if there is no move
+        :param visits: number of playouts through the move
+        :param win_rate: average playout result of the move for the player making it
+        :param playouts: number of playouts this search ran
+        :param elapsed: search time in seconds
+        :param tree_size: visits of the root, including playouts kept from earlier searches
+        """
+        self.move = move
+        self.visits = visits
+        self.win_rate = win_rate
+        self.playouts = playouts
+        self.elapsed = elapsed
+        self.tree_size = tree_size
+
+    @property
+    def playouts_per_second(self):
+        return self.playouts / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        move = square_name(self.move[0], self.move[1]) + square_name(self.move[2], self.move[3]) if self.move else "-"
+        return "move %s visits %d win rate %.3f playouts %d pps %.0f tree %d" % (
+            move, self.visits, self.win_rate, self.playouts, self.playouts_per_second, self.tree_size)
+
+
+def _opponent(color):
+    return "BLACK" if color == "WHITE" else "WHITE"
+
+
+class MCTSPlayer:
+    """
+    Monte Carlo tree search with UCT selection.  Keep one player for a whole game so each search can start from
+    the part of the last tree under the moves that were played
+    """
+
+    def __init__(self, playouts=DEFAULT_PLAYOUTS, time_limit=None, exploration=DEFAULT_EXPLORATION,
+                 max_playout_plies=MAX_PLAYOUT_PLIES, seed=None):
+        """
+        :param playouts: playouts per search
+        :param time_limit: seconds per search, the search stops at whichever of the two limits comes first
+        :param exploration: UCT exploration constant, higher explores more
+        :param max_playout_plies: moves after which a playout is stopped and scored by material
+        :param seed: seed of the playout random.Random
+        """
+        self.playouts = playouts
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.max_playout_plies = max_playout_plies
+        self._rng = random.Random(seed)
+        self._root = None
+        self._board = None
+
+    def search(self, game):
+        """
+        Finds a move for the player to move
+        :param game: the ChessVar game, it is not changed
+        :return: MCTSResult, the move with the most visits
+        """
+        start_time = time.perf_counter()
+        deadline = start_time + self.time_limit if self.time_limit is not None else None
+
+        if game.get_game_state() != "UNFINISHED":
+            return MCTSResult(None, 0, 0.0, 0, 0.0, 0)
+
+        color = game.get_current_player()
+        geometry = game.get_game_board().get_geometry()
+        self._board = GameBoard(geometry)
+        for square, symbol in enumerate(game.get_game_board().get_symbols()):
+            self._board.set_piece(square // geometry.cols, square % geometry.cols, symbol)
+        self._root = self._reuse(game.get_zobrist_key()) or Node(None, None, game.get_zobrist_key(), None)
+        self._root.parent = None
+
+        playouts = 0
+        while playouts < self.playouts and (deadline is None or time.perf_counter() < deadline):
+            self._playout(color)
+            playouts += 1
+
+        elapsed = time.perf_counter() - start_time
+        if not self._root.children:
+            return MCTSResult(None, 0, 0.0, playouts, elapsed, self._root.visits)
+        best = max(self._root.children, key=lambda child: child.visits)
+        return MCTSResult(best.move, best.visits, best.score / best.visits, playouts, elapsed, self._root.visits)
+
+    def reset(self):
+        """
+        Drops the tree, for starting a new game
+        """
+        self._root = None
+
+    def _reuse(self, key):
+        """
+        Finds the position being searched in the last tree, at most REUSE_DEPTH moves below the last root
+        :param key: Zobrist key of the position with the player to move
+        :return: the Node, or None if it is not in the tree
+        """
+        level = [self._root] if self._root is not None else []
+        for _ in range(REUSE_DEPTH + 1):
+            for node in level:
+                if node.key == key:
+                    return node
+            level = [child for node in level for child in node.children]
+        return None
+
+    def _key(self, color):
+        return self._board.get_zobrist_key() ^ (ZOBRIST_BLACK_TO_MOVE if color == "BLACK" else 0)
+
+    def _move(self, move, played):
+        """
+        Plays a move on the search board and remembers how to take it back
+        :param move: (start_row, start_col, end_row, end_col)
+        :param played: list the (move, moved symbol, captured symbol) is appended to
+        :return: True if the capture won the game
+        """
+        start_row, start_col, end_row, end_col = move
+        board = self._board
+        moved = board.get_symbol(start_row, start_col)
+        captured = board.get_symbol(end_row, end_col)
+        board.set_piece(end_row, end_col, moved)
+        board.set_piece(start_row, start_col, "")
+        played.append((move, moved, captured))
+        return bool(captured) and not board.get_piece_count(
+            "WHITE" if captured.isupper() else "BLACK", captured.lower())
+
+    def _playout(self, color):
+        """
+        Runs one playout: selects a line with UCT, expands one new node, plays random moves to the end of the game
+        or the ply limit, backs the result up the line and takes every move back
+        :param color: the color to move at the root
+        """
+        board = self._board
+        rng = self._rng
+        played = []
+        node = self._root
+
+        # Selection, down fully expanded nodes
+        while node.winner is None and node.untried is not None and not node.untried and node.children:
+            log_visits = self.exploration * math.sqrt(math.log(node.visits))
+            node = max(node.children, key=lambda child: child.score / child.visits +
+                       log_visits / math.sqrt(child.visits))
+            self._move(node.move, played)
+            color = _opponent(color)
+
+        # Expansion of one untried move
+        if node.winner is None:
+            if node.untried is None:
+                node.untried = board.generate_moves(color)
+                rng.shuffle(node.untried)
+            if node.untried:
+                move = node.untried.pop()
+                won = self._move(move, played)
+                child = Node(move, node, self._key(_opponent(color)), color if won else None)
+                node.children.append(child)
+                node = child
+                color = _opponent(color)
+
+        # Random playout
+        mover = _opponent(color)  # the player who made node's move
+        winner = node.winner
+        depth = len(played)
+        while winner is None and len(played) - depth < self.max_playout_plies:
+            moves = board.generate_moves(color)
+            if not moves:
+                break
+            if self._move(rng.choice(moves), played):
+                winner = color
+            color = _opponent(color)
+
+        if winner is None:  # stopped by the ply limit, the side ahead on material gets the win
+            score = evaluate(board, "WHITE")
+            winner = "WHITE" if score > 0 else "BLACK" if score < 0 else None
+
+        # Backpropagation, each node is scored for the player who made its move
+        while node is not None:
+            node.visits += 1
+            node.score += 0.5 if winner is None else 1.0 if winner == mover else 0.0
+            mover = _opponent(mover)
+            node = node.parent
+
+        for move, moved, captured in reversed(played):
+            board.set_piece(move[0], move[1], moved)
+            board.set_piece(move[2], move[3], captured)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play ChessVar moves with Monte Carlo tree search")
+    parser.add_argument("--playouts", type=int, default=DEFAULT_PLAYOUTS, help="playouts per move")
+    parser.add_argument("--time-limit", type=float, default=None, help="seconds per move")
+    parser.add_argument("--moves", type=int, default=10, help="moves to play from the starting position")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    game = ChessVar()
+    player = MCTSPlayer(args.playouts, args.time_limit, seed=args.seed)
+    playouts = 0
+    elapsed = 0.0
+
+    for _ in range(args.moves):
+        result = player.search(game)
+        if result.move is None:
+            break
+        print(result)
+        playouts += result.playouts
+        elapsed += result.elapsed
+        game.apply_move(*result.move)
+
+    if elapsed:
+        print("total %d playouts in %.3f s, %.0f playouts/s" % (playouts, elapsed, playouts / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+# Description: Opening book for ChessVar built from archived games.  For every position in the first plies of the
+#              games it stores each move played there, how often it was played and how often the player making it
+#              went on to win or lose, from get_game_state at the end of the game.  The book file holds the entries
+#              sorted by Zobrist key behind a table indexed by the top bits of the key, so a lookup reads one table
+#              slot and a few entries straight from the memory-mapped file, without building a board or any pieces.
+#
+#              Example:  builder = BookBuilder(max_plies=16)        # or: python opening_book.py build games.txt
+#                        for record in game_record.read_games("games.txt"):
+#                            builder.add_moves(record.moves, record.result)
+#                        builder.write("book.cvob")
+#                        book = OpeningBook("book.cvob")
+#                        move = book.choose(game)                    # None when the position is not in the book
+#
+#              Run:  python opening_book.py build games.txt [--out book.cvob] [--plies 16]
+#                    python opening_book.py probe book.cvob [e2e4 d7d5 ...]
+import argparse
+import mmap
+import struct
+import time
+
+from ChessVar import ChessVar, parse_square, square_name
+from game_record import read_games
+
+MAGIC = b"CVOB"
+VERSION = 1
+HEADER = struct.Struct("<4sHB9x")  # magic, version, prefix bits, padding to 16 bytes
+ENTRY = struct.Struct("<QHHIII")  # key, start square, end square, games, wins and losses of the player moving
+_SLOT = struct.Struct("<I")
+_SLOTS = struct.Struct("<II")  # a slot and the next one
+
+DEFAULT_PLIES = 16
+
+
+class BookMove:
+    """
+    One book move and its statistics
+    """
+
+    __slots__ = ("move", "games", "wins", "losses")
+
+    def __init__(self, move, games, wins, losses):
+        """
+        :param move: (start_row, start_col, end_row, end_col)
+        :param games: number of games the move was played in
+        :param wins: games the player making the move won
+        :param losses: games the player making the move lost
+        """
+        self.move = move
+        self.games = games
+        self.wins = wins
+        self.losses = losses
+
+    @property
+    def win_rate(self):
+        """
+        Score of the move for the player making it, a win counting 1 and an unfinished game 0.5
+        """
+        return (self.wins + 0.5 * (self.games - self.wins - self.losses)) / self.games if self.games else 0.0
+
+    def __str__(self):
+        return "%s%s games %d win rate %.3f" % (square_name(self.move[0], self.move[1]),
+                                                 square_name(self.move[2], self.move[3]), self.games, self.win_rate)
+
+
+class BookBuilder:
+    """
+    Collects move statistics from games and writes them as a book file
+    """
+
+    def __init__(self, max_plies=DEFAULT_PLIES):
+        """
+        :param max_plies: moves from the start of each game that go into the book
+        """
+        self.max_plies = max_plies
+        self.games = 0
+        self._counts = {}  # (key, start square, end square) -> [games, wins, losses]
+
+    def add_moves(self, moves, result=None, validate=True):
+        """
+        Adds one game played from the starting position
+        :param moves: the game's moves, each a (start_point, end_point) pair of square names as returned by
+                      get_move_history or a (start_row, start_col, end_row, end_col) tuple
+        :param result: the game state the game ended with, found by playing the moves when not given
+        :param validate: check every move with make_move before anything is added, turn off for trusted archives
+        :raises ValueError: if validate is on and a move is not valid, the book is left unchanged
+        """
+        game = ChessVar()
+        played = []  # (key, mover, start square, end square) of the moves that go into the book
+
+        for ply, move in enumerate(moves):
+            if len(move) == 2:
+                move = parse_square(move[0]) + parse_square(move[1])
+            start_row, start_col, end_row, end_col = move
+            if ply < self.max_plies:
+                played.append((game.get_zobrist_key(), game.get_current_player(),
+                               start_row * 8 + start_col, end_row * 8 + end_col))
+            elif result is not None and not validate:
+                break  # the rest of the game is only needed for its result
+
+            if validate:
+                if not game.make_move(square_name(start_row, start_col), square_name(end_row, end_col)):
+                    raise ValueError("move %d %s%s is not valid" % (ply + 1, square_name(start_row, start_col),
+                                                                   square_name(end_row, end_col)))
+            else:
+                game.apply_move(start_row, start_col, end_row, end_col)
+
+        if result is None:
+            result = game.get_game_state()
+        winner = {"WHITE_WON": "WHITE", "BLACK_WON": "BLACK"}.get(result)
+
+        for key, mover, start, end in played:
+            counts = self._counts.setdefault((key, start, end), [0, 0, 0])
+            counts[0] += 1
+            if winner == mover:
+                counts[1] += 1
+            elif winner is not None:
+                counts[2] += 1
+        self.games += 1
+
+    def add_game(self, game):
+        """
+        Adds a finished ChessVar game played from the starting position
+        :param game: the ChessVar game
+        """
+        self.add_moves(game.get_move_history(), game.get_game_state(), validate=False)
+
+    def __len__(self):
+        return len(self._counts)
+
+    def write(self, path):
+        """
+        Writes the book, sorted by key behind a table of where each key prefix starts
+        :param path: path of the book file
+        """
+        entries = sorted((key, start, end, counts) for (key, start, end), counts in self._counts.items())
+        bits = max(8, min(24, len(entries).bit_length()))  # about one entry per table slot
+        shift = 64 - bits
+
+        slots = [0] * ((1 << bits) + 1)  # slots[p] is the first entry whose key starts with prefix p
+        for key, _, _, _ in entries:
+            slots[(key >> shift) + 1] += 1
+        for prefix in range(1 << bits):
+            slots[prefix + 1] += slots[prefix]
+
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, bits))
+            file.write(struct.pack("<%dI" % len(slots), *slots))
+            file.write(b"".join(ENTRY.pack(key, start, end, *counts) for key, start, end, counts in entries))
+
+
+class OpeningBook:
+    """
+    Read-only, memory-mapped book file
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path of a book written by BookBuilder.write
+        """
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, version, self._bits = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(path + " is not a version %d opening book" % VERSION)
+        self._shift = 64 - self._bits
+        self._entries = HEADER.size + _SLOT.size * ((1 << self._bits) + 1)  # offset of the first entry
+        self._count = (len(self._map) - self._entries) // ENTRY.size
+
+    def __len__(self):
+        return self._count
+
+    def lookup(self, key):
+        """
+        Gets the book moves of a position
+        :param key: Zobrist key of the position, see ChessVar.get_zobrist_key
+        :return: list of (start square, end square, games, wins, losses) tuples, squares numbered row * 8 + col,
+                 empty if the position is not in the book
+        """
+        slot = HEADER.size + _SLOT.size * (key >> self._shift)
+        first, last = _SLOTS.unpack_from(self._map, slot)
+        if first == last:
+            return []
+        entries = self._view[self._entries + first * ENTRY.size:self._entries + last * ENTRY.size]
+        return [entry[1:] for entry in ENTRY.iter_unpack(entries) if entry[0] == key]
+
+    def moves(self, game):
+        """
+        Gets the book moves of a game's position, most played first
+        :param game: the ChessVar game
+        :return: list of BookMove
+        """
+        return sorted((BookMove((start // 8, start % 8, end // 8, end % 8), games, wins, losses)
+                       for start, end, games, wins, losses in self.lookup(game.get_zobrist_key())),
+                      key=lambda book_move: -book_move.games)
+
+    def choose(self, game, rng=None, min_games=1):
+        """
+        Picks a book move for the player to move
+        :param game: the ChessVar game
+        :param rng: random.Random to pick among the moves in proportion to how often they were played, the move
+                    with the best win rate is played when not given
+        :param min_games: moves played in fewer games are left out
+        :return: the move as (start_row, start_col, end_row, end_col), or None if the position is not in the book
+        """
+        choices = [entry for entry in self.lookup(game.get_zobrist_key()) if entry[2] >= min_games]
+        if not choices:
+            return None
+        if rng is None:
+            start, end = max(choices, key=lambda entry: ((entry[3] + 0.5 * (entry[2] - entry[3] - entry[4])) /
+                                                         entry[2], entry[2]))[:2]
+        else:
+            start, end = rng.choices(choices, weights=[entry[2] for entry in choices])[0][:2]
+        return start // 8, start % 8, end // 8, end % 8
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query ChessVar opening books")
+    parser.add_argument("mode", choices=("build", "probe"))
+    parser.add_argument("path", help="game record file to build from, or book file to probe")
+    parser.add_argument("moves", nargs="*", help="probe: moves played from the start, for example e2e4 d7d5")
+    parser.add_argument("--out", default="book.cvob", help="build: book file to write")
+    parser.add_argument("--plies", type=int, default=DEFAULT_PLIES, help="build: moves of each game to keep")
+    parser.add_argument("--no-validate", action="store_true", help="build: trust the moves in the records")
+    args = parser.parse_args()
+
+    if args.mode == "build":
+        start = time.perf_counter()
+        builder = BookBuilder(args.plies)
+        for record in read_games(args.path):
+            if "FEN" not in record.tags:  # only games from the starting position
+                builder.add_moves(record.moves, record.result, not args.no_validate)
+        builder.write(args.out)
+        print("%d games, %d book entries, %.1f s" % (builder.games, len(builder), time.perf_counter() - start))
+        return
+
+    with OpeningBook(args.path) as book:
+        game = ChessVar()
+        for move in args.moves:
+            split = 2 if move[2].isalpha() else 3
+            if not game.make_move(move[:split], move[split:]):
+                raise SystemExit("invalid move " + move)
+        for book_move in book.moves(game):
+            print(book_move)
+
+        key = game.get_zobrist_key()
+        count = 100000
+        start = time.perf_counter()
+        for _ in range(count):
+            book.lookup(key)
+        print("lookup %.2f us" % ((time.perf_counter() - start) / count * 1e6))
+
+
+if __name__ == "__main__":
+    main()
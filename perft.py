@@ -0,0 +1,186 @@
+# Description: Perft node counting for ChessVar.  Counts the positions reached after every sequence of N valid
+#              moves from the starting position and a set of fixture positions, checks the counts against stored
+#              values and reports nodes per second.  A rewrite of is_valid_move, the move generator or GameBoard
+#              is equivalent when every count still matches, and faster when the nodes per second go up.
+#
+#              Run:  python perft.py [--depth N] [--fixture NAME] [--divide] [--validate] [--backend bitboard]
+import argparse
+import sys
+import time
+
+from ChessVar import ChessVar, GameBoard, BitboardGameBoard, Position, square_name
+
+# Fixture positions, each reached by playing its moves from the starting position, with the expected perft count
+# at each depth.  A game that is won stops, so won positions add no nodes below them
+FIXTURES = [
+    ("start", [], {1: 29, 2: 845, 3: 27431, 4: 890731}),
+    ("queen_raid", ["d1a4", "c7c6", "a4d4", "d8f6", "g1h3", "f6f4", "d4b6", "f4d4", "b6b4", "d4d3", "b4a5",
+                    "d3f5"],
+     {1: 35, 2: 1136, 3: 39946}),
+    ("open_middlegame", ["b1a3", "b7b6", "b2b3", "h7h6", "d1d3", "d7d5", "c2c3", "d8d1", "g1h3", "c8h3", "f2f4",
+                         "d1a4", "e1f2", "b8a6", "f4f6", "a6c5", "e2e3", "a4g4", "f1e2", "e7f6"],
+     {1: 42, 2: 1870, 3: 77329}),
+    ("tactical", ["d2d4", "d7d6", "b2b4", "c7c5", "b4c5", "b7b6", "c5c6", "a7a5", "d1d7", "g8f6", "d7f5", "d8c7",
+                  "d4d6", "c7g3", "f5g5", "b8d7", "g5e5", "f6e4", "e2e4", "g3b8", "c6c8", "d7f6", "e5g3", "h7h5",
+                  "c1f4", "b8b5", "g3c7", "g7g5", "h2h4", "f6d5"],
+     {1: 53, 2: 2274, 3: 115489}),
+]
+
+BACKENDS = {"list": GameBoard, "bitboard": BitboardGameBoard}
+
+_FIXTURE_POSITIONS = {}  # fixture name -> Position template, filled in by fixture_position
+
+
+def fixture_game(moves, board_class=GameBoard):
+    """
+    Plays a fixture's moves from the starting position
+    :param moves: list of moves written as start and end square, for example "e2e4"
+    :param board_class: GameBoard backend to play on
+    :return: the ChessVar game
+    """
+    game = ChessVar(board_class())
+    for move in moves:
+        split = 2 if move[2].isalpha() else 3  # the start square may have a two digit row
+        if not game.make_move(move[:split], move[split:]):
+            raise ValueError("invalid fixture move " + move)
+    return game
+
+
+def fixture_position(name):
+    """
+    Gets a fixture's position as an immutable template, its moves are only played the first time
+    :param name: fixture name from FIXTURES
+    :return: the Position, see ChessVar.from_position
+    """
+    position = _FIXTURE_POSITIONS.get(name)
+    if position is None:
+        moves = next(moves for fixture_name, moves, _ in FIXTURES if fixture_name == name)
+        position = _FIXTURE_POSITIONS[name] = Position.from_game(fixture_game(moves))
+    return position
+
+
+def perft(game, depth):
+    """
+    Counts the positions reached after every sequence of depth valid moves
+    :param game: the ChessVar game, it is left as it was
+    :param depth: number of moves
+    :return: the number of positions
+    """
+    if depth == 0:
+        return 1
+
+    moves = game.generate_moves()
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        game.apply_move(*move)
+        nodes += perft(game, depth - 1)
+        game.undo_move()
+    return nodes
+
+
+def divide(game, depth):
+    """
+    Splits the perft count by first move, for finding which move a wrong count comes from
+    :param game: the ChessVar game
+    :param depth: number of moves, at least 1
+    :return: dict of move name, for example "e2e4", to its perft count at depth - 1
+    """
+    counts = {}
+    for move in game.generate_moves():
+        game.apply_move(*move)
+        counts[square_name(move[0], move[1]) + square_name(move[2], move[3])] = perft(game, depth - 1)
+        game.undo_move()
+    return counts
+
+
+def validate(game, depth):
+    """
+    Walks the same tree as perft and checks at every position that generate_moves gives exactly the moves
+    accepted by make_move, which checks each piece's is_valid_move
+    :param game: the ChessVar game
+    :param depth: number of moves
+    :return: the perft count
+    :raises AssertionError: at the first position where they disagree
+    """
+    if depth == 0:
+        return 1
+
+    board = game.get_game_board()
+    geometry = board.get_geometry()
+    squares = [divmod(square, geometry.cols) for square in range(geometry.squares)]
+    generated = set(game.generate_moves())
+    accepted = set()
+    for start_row, start_col in squares:
+        symbol = board.get_symbol(start_row, start_col)
+        if not symbol or (symbol.isupper()) != (game.get_current_player() == "WHITE"):
+            continue
+        for end_row, end_col in squares:
+            if game.make_move(square_name(start_row, start_col), square_name(end_row, end_col)):
+                accepted.add((start_row, start_col, end_row, end_col))
+                game.undo_move()
+
+    if generated != accepted:
+        raise AssertionError("move generator disagrees with make_move after %s: extra %s, missing %s" % (
+            game.get_move_history(), sorted(generated - accepted), sorted(accepted - generated)))
+
+    nodes = 0
+    for move in generated:
+        game.apply_move(*move)
+        nodes += validate(game, depth - 1)
+        game.undo_move()
+    return nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count and check ChessVar perft nodes")
+    parser.add_argument("--depth", type=int, default=3, help="deepest depth to count")
+    parser.add_argument("--fixture", action="append", help="only run the named fixture, may be repeated")
+    parser.add_argument("--divide", action="store_true", help="print the count of each first move at --depth")
+    parser.add_argument("--validate", action="store_true",
+                        help="also check the move generator against make_move at every position (slow)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="list", help="GameBoard backend")
+    args = parser.parse_args()
+
+    board_class = BACKENDS[args.backend]
+    failures = 0
+    total_nodes = 0
+    total_time = 0.0
+
+    for name, moves, expected in FIXTURES:
+        if args.fixture and name not in args.fixture:
+            continue
+        game = fixture_game(moves, board_class)
+
+        if args.divide:
+            for move, count in sorted(divide(game, args.depth).items()):
+                print("%s %s: %d" % (name, move, count))
+
+        for depth in range(1, args.depth + 1):
+            start = time.perf_counter()
+            nodes = validate(game, depth) if args.validate else perft(game, depth)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+
+            if depth not in expected:
+                status = "no stored count"
+            elif nodes == expected[depth]:
+                status = "ok"
+            else:
+                status = "FAIL expected %d" % expected[depth]
+                failures += 1
+            print("%-16s depth %d %10d nodes %8.3f s %10.0f nodes/s  %s" % (
+                name, depth, nodes, elapsed, nodes / elapsed if elapsed else 0, status))
+
+    if total_time:
+        print("total %d nodes in %.3f s, %.0f nodes/s" % (total_nodes, total_time, total_nodes / total_time))
+    if failures:
+        print("%d count(s) did not match" % failures)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
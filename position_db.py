@@ -0,0 +1,417 @@
+# Description: On-disk store of ChessVar positions with fixed size records, read through mmap so tens of millions of
+#              positions can be scanned or looked up without loading them into memory.  Each record holds the Zobrist
+#              key, the packed position (see ChessVar.encode_positions) and the number of pieces of each type each
+#              color has captured.  A sorted index of the keys answers lookups by position.
+#
+#              Example:  with PositionWriter("games.cvdb") as writer:
+#                            writer.write(game)
+#                        with PositionDB("games.cvdb") as db:
+#                            for number in db.find(game.get_zobrist_key()):
+#                                print(db.get_game(number).to_fen())
+import heapq
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from ChessVar import POSITION_BYTES, encode_positions, make_piece, unpack_positions, ChessVar
+
+MAGIC = b"CVPD"
+INDEX_MAGIC = b"CVPI"
+VERSION = 1
+HEADER = struct.Struct("<4sII4x")  # magic, version, record size, padding to 16 bytes
+INDEX_HEADER = struct.Struct("<4sIQ")  # magic, version, number of indexed records
+
+PIECE_TYPES = "prnbqk"
+CAPTURED_BYTES = 12  # one byte per color and piece type, white's captures first
+RECORD = struct.Struct("<Q%ds%ds" % (POSITION_BYTES, CAPTURED_BYTES))  # key, packed position, captured counts
+_KEY = struct.Struct("<Q")
+INDEX_RUN = 1 << 20  # new records sorted in memory at a time when the index is brought up to date, 16 MB of pairs
+INDEX_CHUNK = 1 << 16  # index pairs read or written at a time while merging
+
+
+def index_path(path):
+    return path + ".idx"
+
+
+def pack_record(game):
+    """
+    Packs a game's position into one record
+    :param game: the ChessVar game
+    :return: RECORD.size bytes
+    """
+    captured = game.get_game_board().captured_pieces
+    counts = bytearray(CAPTURED_BYTES)
+    for offset, color in ((0, "WHITE"), (6, "BLACK")):
+        for piece in captured[color]:
+            counts[offset + PIECE_TYPES.index(str(piece).lower())] += 1
+    return RECORD.pack(game.get_zobrist_key(), encode_positions([game]), bytes(counts))
+
+
+class PositionWriter:
+    """
+    Appends records to a position file and rebuilds its index when closed
+    """
+
+    def __init__(self, path):
+        """
+        Opens a position file for appending, creating it if needed
+        :param path: path of the position file
+        """
+        self._path = path
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as file:
+                file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        else:
+            _check_header(path)
+        self._file = open(path, "ab")
+        self._pending = []
+
+    def write(self, game):
+        """
+        Appends one game's current position
+        :param game: the ChessVar game
+        """
+        self._pending.append(pack_record(game))
+        if len(self._pending) >= 4096:
+            self.flush()
+
+    def write_many(self, games):
+        """
+        Appends the current position of every game
+        :param games: iterable of ChessVar games
+        """
+        for game in games:
+            self.write(game)
+
+    def flush(self):
+        self._file.write(b"".join(self._pending))
+        self._pending = []
+        self._file.flush()
+
+    def close(self):
+        """
+        Writes any buffered records and rebuilds the index
+        """
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+            build_index(self._path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _check_header(path):
+    with open(path, "rb") as file:
+        try:
+            magic, version, record_size = HEADER.unpack(file.read(HEADER.size))
+        except struct.error:
+            raise ValueError(path + " is too short to be a position file") from None
+    if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+        raise ValueError(path + " is not a version %d position file" % VERSION)
+
+
+def _indexed_count(path, count):
+    """
+    Gets the number of records an existing index covers, so only the records after them need sorting
+    :param path: path of the position file
+    :param count: number of records in the position file
+    :return: number of indexed records, 0 if there is no usable index
+    """
+    try:
+        with open(index_path(path), "rb") as file:
+            magic, version, indexed = INDEX_HEADER.unpack(file.read(INDEX_HEADER.size))
+            size = os.fstat(file.fileno()).st_size
+    except (OSError, struct.error):
+        return 0
+    if magic != INDEX_MAGIC or version != VERSION or indexed > count or size != INDEX_HEADER.size + 16 * indexed:
+        return 0
+    return indexed
+
+
+def _read_pairs(file, count):
+    """
+    Reads (key, record number) pairs from an index or run file a chunk at a time
+    :param file: file positioned at the first pair
+    :param count: number of pairs to read
+    :return: generator of (key, record number)
+    """
+    while count:
+        pairs = array('Q')
+        pairs.fromfile(file, 2 * min(count, INDEX_CHUNK))
+        count -= len(pairs) // 2
+        yield from zip(pairs[::2], pairs[1::2])
+
+
+def _write_pairs(pairs, output):
+    """
+    Writes (key, record number) pairs a chunk at a time
+    :param pairs: iterable of (key, record number)
+    :param output: file to write to
+    """
+    chunk = array('Q')
+    for pair in pairs:
+        chunk.extend(pair)
+        if len(chunk) >= 2 * INDEX_CHUNK:
+            chunk.tofile(output)
+            chunk = array('Q')
+    chunk.tofile(output)
+
+
+def _splice_index(path, indexed, pairs, output):
+    """
+    Writes an existing index with new pairs merged into it.  Each new pair finds its place by binary search, and
+    the old entries up to that place are copied in one write
+    :param path: path of the existing index
+    :param indexed: number of entries in the existing index
+    :param pairs: sorted iterable of the new (key, record number) pairs, numbered after every indexed record
+    :param output: file to write to
+    """
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as index_map:
+        old = memoryview(index_map)[INDEX_HEADER.size:].cast('Q')
+        try:
+            copied = 0  # old entries written so far
+            chunk = array('Q')
+            for key, number in pairs:
+                low, high = copied, indexed
+                while low < high:  # first old entry with a greater key, a new record goes after older ones
+                    middle = (low + high) // 2
+                    if old[2 * middle] <= key:
+                        low = middle + 1
+                    else:
+                        high = middle
+                if low > copied:
+                    chunk.tofile(output)
+                    chunk = array('Q')
+                    output.write(old[2 * copied:2 * low])
+                    copied = low
+                chunk.append(key)
+                chunk.append(number)
+            chunk.tofile(output)
+            output.write(old[2 * copied:2 * indexed])
+        finally:
+            old.release()
+
+
+def build_index(path, run_size=INDEX_RUN):
+    """
+    Brings the sorted (key, record number) index of a position file up to date.  Only the records written since
+    the index was last built are sorted, in runs of at most run_size records each written to a temporary file.  The
+    runs are merged and spliced into the existing index, whose entries are copied in blocks, so memory use depends
+    on run_size and not on the size of the archive
+    :param path: path of the position file
+    :param run_size: number of new records sorted in memory at a time
+    """
+    runs = []  # (path, number of pairs) of each sorted run
+    try:
+        with PositionDB(path, use_index=False) as db:
+            count = len(db)
+            indexed = _indexed_count(path, count)
+            if indexed == count and os.path.exists(index_path(path)):
+                return  # nothing written since the last build
+
+            for first in range(indexed, count, run_size):
+                keys = db.get_keys(first, min(first + run_size, count))
+                pairs = array('Q', bytes(16 * len(keys)))
+                for position, offset in enumerate(sorted(range(len(keys)), key=keys.__getitem__)):
+                    pairs[2 * position] = keys[offset]
+                    pairs[2 * position + 1] = first + offset
+                runs.append((index_path(path) + ".run%d" % len(runs), len(keys)))
+                with open(runs[-1][0], "wb") as file:
+                    pairs.tofile(file)
+
+        temporary = index_path(path) + ".tmp"
+        files = [open(run, "rb") for run, _ in runs]
+        try:
+            with open(temporary, "wb") as output:  # native byte order, the index is rebuilt from the records if moved
+                output.write(INDEX_HEADER.pack(INDEX_MAGIC, VERSION, count))
+                pairs = heapq.merge(*(_read_pairs(file, size) for file, (_, size) in zip(files, runs)))
+                if indexed:
+                    _splice_index(index_path(path), indexed, pairs, output)
+                else:
+                    _write_pairs(pairs, output)
+        finally:
+            for file in files:
+                file.close()
+        os.replace(temporary, index_path(path))
+    finally:
+        for run, _ in runs:
+            os.remove(run)
+
+
+class PositionDB:
+    """
+    Read-only, memory-mapped view of a position file.  Records are read in place, a game or board is only built
+    when asked for
+    """
+
+    def __init__(self, path, use_index=True):
+        """
+        :param path: path of the position file
+        :param use_index: load the key index for find, when it exists
+        """
+        _check_header(path)
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        self._count = (len(self._map) - HEADER.size) // RECORD.size
+
+        self._index_file = self._index_map = self._index = None
+        self._indexed = 0
+        if use_index and os.path.exists(index_path(path)):
+            self._index_file = open(index_path(path), "rb")
+            self._index_map = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                magic, version, self._indexed = INDEX_HEADER.unpack_from(self._index_map)
+            except struct.error:
+                magic = None
+            if magic != INDEX_MAGIC or version != VERSION:
+                raise ValueError(index_path(path) + " is not a version %d position index" % VERSION)
+            self._index = memoryview(self._index_map)[INDEX_HEADER.size:].cast('Q')
+
+    def __len__(self):
+        return self._count
+
+    def record(self, number):
+        """
+        Gets one record without copying it, the view must be released before the database is closed
+        :param number: record number
+        :return: memoryview of the RECORD.size bytes
+        """
+        if not 0 <= number < self._count:
+            raise IndexError("record %d out of range" % number)
+        offset = HEADER.size + number * RECORD.size
+        return self._view[offset:offset + RECORD.size]
+
+    def get_key(self, number):
+        """
+        Gets a record's Zobrist key
+        :param number: record number
+        :return: 64-bit key
+        """
+        if not 0 <= number < self._count:
+            raise IndexError("record %d out of range" % number)
+        return _KEY.unpack_from(self._map, HEADER.size + number * RECORD.size)[0]
+
+    def get_keys(self, start=0, stop=None):
+        """
+        Gets the Zobrist keys of a range of records without decoding them
+        :param start: first record number
+        :param stop: record number to stop before, defaults to the end
+        :return: array('Q') of keys
+        """
+        stop = self._count if stop is None else min(stop, self._count)
+        start = min(start, stop)
+        words = self._view[HEADER.size + start * RECORD.size:HEADER.size + stop * RECORD.size].cast('Q')
+        keys = array('Q', words[::RECORD.size // 8])  # the key is the first 64-bit word of each record
+        words.release()
+        if sys.byteorder != "little":
+            keys.byteswap()
+        return keys
+
+    def get_position(self, number):
+        """
+        Gets a record's position without building any objects
+        :param number: record number
+        :return: tuple of (board string, turn, game state)
+        """
+        return unpack_positions(self.record(number)[8:8 + POSITION_BYTES])[0]
+
+    def get_captured(self, number):
+        """
+        Gets the number of pieces of each type each color had captured
+        :param number: record number
+        :return: dict of color to dict of lowercase piece symbol to count
+        """
+        counts = self.record(number)[8 + POSITION_BYTES:]
+        return {"WHITE": dict(zip(PIECE_TYPES, counts[:6])), "BLACK": dict(zip(PIECE_TYPES, counts[6:]))}
+
+    def get_game(self, number, board_class=None):
+        """
+        Rebuilds the game stored in a record, with its captured pieces
+        :param number: record number
+        :param board_class: GameBoard backend to use, defaults to GameBoard
+        :return: ChessVar game without move history
+        """
+        board_string, turn, state = self.get_position(number)
+        game = ChessVar.from_board_string(board_string, turn, state, board_class)
+        for color, counts in self.get_captured(number).items():
+            for piece_type, count in counts.items():  # white captures black pieces, black captures white pieces
+                symbol = piece_type.upper() if color == "BLACK" else piece_type
+                game.get_game_board().captured_pieces[color].extend(make_piece(symbol) for _ in range(count))
+        return game
+
+    def get_board(self, number, board_class=None):
+        """
+        Rebuilds the board stored in a record
+        :param number: record number
+        :param board_class: GameBoard backend to use, defaults to GameBoard
+        :return: the GameBoard
+        """
+        return self.get_game(number, board_class).get_game_board()
+
+    def find(self, key):
+        """
+        Finds the records holding a position
+        :param key: Zobrist key of the position, see ChessVar.get_zobrist_key
+        :return: list of record numbers in increasing order
+        """
+        numbers = []
+        if self._index is not None:
+            index = self._index
+            low, high = 0, self._indexed
+            while low < high:  # binary search for the first entry with the key
+                middle = (low + high) // 2
+                if index[2 * middle] < key:
+                    low = middle + 1
+                else:
+                    high = middle
+            while low < self._indexed and index[2 * low] == key:
+                numbers.append(index[2 * low + 1])
+                low += 1
+
+        # records written after the index was built are searched one by one
+        numbers.extend(number for number in range(self._indexed, self._count) if self.get_key(number) == key)
+        return sorted(numbers)
+
+    def scan(self, start=0, stop=None, chunk=4096):
+        """
+        Walks through records in order, decoding them a chunk at a time
+        :param start: first record number
+        :param stop: record number to stop before, defaults to the end
+        :param chunk: number of records decoded together
+        :return: generator of (record number, key, board string, turn, game state)
+        """
+        stop = self._count if stop is None else min(stop, self._count)
+        for first in range(start, stop, chunk):
+            last = min(first + chunk, stop)
+            # the chunk is decoded and its view released before yielding, so stopping early never keeps the
+            # file's memory exported and close still works
+            with self._view[HEADER.size + first * RECORD.size:HEADER.size + last * RECORD.size] as view:
+                keys = [key for key, _, _ in RECORD.iter_unpack(view)]
+                positions = unpack_positions(b"".join(
+                    view[offset + 8:offset + 8 + POSITION_BYTES] for offset in range(0, len(view), RECORD.size)))
+            for offset, (key, position) in enumerate(zip(keys, positions)):
+                yield (first + offset, key) + position
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+        self._file.close()
+        if self._index is not None:
+            self._index.release()
+            self._index_map.close()
+            self._index_file.close()
+            self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,341 @@
+# Description: asyncio game server hosting many ChessVar sessions in one process over a line protocol on TCP.
+#              Each request is one line and gets one reply line, board updates are pushed to subscribers:
+#
+#                  NEW                       -> OK <session>
+#                  MOVE <session> e2 e4      -> OK <game state>     or  ERR <reason>
+#                  MOVES <session>           -> MOVES e2e4 d2d4 ...
+#                  STATE <session>           -> STATE <session> <fen>
+#                  SUB <session>             -> OK <session>, then BOARD <session> <fen> after every move
+#                  UNSUB <session>           -> OK <session>
+#                  QUIT                      -> OK bye
+#
+#              A subscriber that reads too slowly has its oldest board updates dropped, since every update is a
+#              whole board, and sessions with no requests for idle_timeout seconds are removed.  Their subscribers
+#              get EVICTED <session>, which is never dropped, and no more updates of the session.
+#
+#              Run:  python server.py serve [--port 8765]
+#                    python server.py loadtest [--port 8765] [--clients 100] [--moves 50]
+#                    python server.py loadtest --spawn      (starts a server in the same process first)
+import argparse
+import asyncio
+import random
+import time
+
+from ChessVar import ChessVar, square_name
+
+DEFAULT_PORT = 8765
+DEFAULT_IDLE_TIMEOUT = 300.0  # seconds without requests before a session is removed
+DEFAULT_QUEUE_SIZE = 64  # board updates buffered per subscriber before the oldest are dropped
+MAX_LINE = 1024
+
+
+class Session:
+    """
+    One game hosted by the server and the connections watching it
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.game = ChessVar()
+        self.subscribers = set()
+        self.last_active = time.monotonic()
+
+
+class Connection:
+    """
+    One client connection.  Replies are written in order as requests arrive, pushed board updates go through
+    a bounded queue drained by their own task
+    """
+
+    def __init__(self, reader, writer, queue_size):
+        self.reader = reader
+        self.writer = writer
+        self.updates = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0  # board updates dropped because the client read too slowly
+        self.subscriptions = set()
+        self.handler = asyncio.current_task()  # the server task reading this connection's requests
+
+    def push(self, session_id, line):
+        """
+        Queues a board update without waiting, dropping the oldest queued update when the queue is full
+        """
+        if self.updates.full():
+            self.updates.get_nowait()
+            self.dropped += 1
+        self.updates.put_nowait((session_id, line))
+
+    def notify(self, line):
+        """
+        Sends a notice at once instead of queueing it, so a full queue cannot drop it
+        """
+        if not self.writer.is_closing():
+            self.writer.write(line.encode() + b"\n")
+
+    async def send_updates(self):
+        """
+        Writes queued board updates until the client disconnects, skipping those of sessions it no longer watches
+        """
+        try:
+            while True:
+                session_id, line = await self.updates.get()
+                if session_id in self.subscriptions:
+                    self.writer.write(line.encode() + b"\n")
+                    await self.writer.drain()  # waits while the client's socket buffer is full
+        except ConnectionError:
+            pass  # the request handler sees the connection close and cleans up
+
+
+class GameServer:
+    """
+    Hosts ChessVar sessions for line protocol clients
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 queue_size=DEFAULT_QUEUE_SIZE, max_sessions=100000):
+        """
+        :param host: address to listen on, local only by default
+        :param port: TCP port, 0 picks a free one
+        :param idle_timeout: seconds without requests before a session is removed
+        :param queue_size: board updates buffered per subscriber
+        :param max_sessions: most sessions hosted at once
+        """
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.queue_size = queue_size
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.moves_played = 0
+        self._next_id = 1
+        self._connections = set()
+        self._server = None
+        self._evictor = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_LINE)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._evictor = asyncio.ensure_future(self._evict_idle())
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        self._evictor.cancel()
+        self._server.close()
+        connections = list(self._connections)
+        for connection in connections:
+            connection.writer.close()  # the client handlers see end of file and finish
+        await asyncio.gather(*(connection.handler for connection in connections), return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def _evict_idle(self):
+        """
+        Removes sessions that have had no requests for idle_timeout seconds
+        """
+        while True:
+            await asyncio.sleep(min(self.idle_timeout / 4, 30.0))
+            cutoff = time.monotonic() - self.idle_timeout
+            for session_id, session in list(self.sessions.items()):
+                if session.last_active < cutoff:
+                    self._remove(session_id, "EVICTED " + session_id)
+
+    def _remove(self, session_id, notice):
+        session = self.sessions.pop(session_id)
+        for connection in session.subscribers:
+            connection.subscriptions.discard(session_id)  # its queued updates are skipped
+            connection.notify(notice)
+
+    async def _handle(self, reader, writer):
+        connection = Connection(reader, writer, self.queue_size)
+        self._connections.add(connection)
+        sender = asyncio.ensure_future(connection.send_updates())
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    break  # line too long
+                if not line:
+                    break
+                reply = self._request(connection, line.decode(errors="replace").split())
+                writer.write(reply.encode() + b"\n")
+                await writer.drain()  # stop reading requests while the client is not reading replies
+                if reply == "OK bye":
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            sender.cancel()
+            try:
+                await sender  # collects any error the sender ended with
+            except asyncio.CancelledError:
+                pass
+            self._connections.discard(connection)
+            for session_id in connection.subscriptions:
+                if session_id in self.sessions:
+                    self.sessions[session_id].subscribers.discard(connection)
+            writer.close()
+
+    def _request(self, connection, words):
+        """
+        Handles one request line
+        :param connection: the client's Connection
+        :param words: the request split into words
+        :return: the reply line
+        """
+        if not words:
+            return "ERR empty request"
+        command = words[0].upper()
+
+        if command == "QUIT":
+            return "OK bye"
+
+        if command == "NEW":
+            if len(self.sessions) >= self.max_sessions:
+                return "ERR server full"
+            session_id = str(self._next_id)
+            self._next_id += 1
+            self.sessions[session_id] = Session(session_id)
+            return "OK " + session_id
+
+        if len(words) < 2:
+            return "ERR missing session"
+        session = self.sessions.get(words[1])
+        if session is None:
+            return "ERR unknown session " + words[1]
+        session.last_active = time.monotonic()
+        game = session.game
+
+        if command == "MOVE":
+            if len(words) != 4:
+                return "ERR usage: MOVE <session> <from> <to>"
+            try:
+                valid = game.make_move(words[2], words[3])
+            except (ValueError, IndexError):
+                valid = False  # not a square name
+            if not valid:
+                return "ERR invalid move"
+            self.moves_played += 1
+            if session.subscribers:
+                update = "BOARD %s %s" % (session.session_id, game.to_fen())
+                for subscriber in session.subscribers:
+                    subscriber.push(session.session_id, update)
+            return "OK " + game.get_game_state()
+
+        if command == "MOVES":
+            return "MOVES " + " ".join(square_name(move[0], move[1]) + square_name(move[2], move[3])
+                                       for move in game.generate_moves())
+
+        if command == "STATE":
+            return "STATE %s %s" % (session.session_id, game.to_fen())
+
+        if command == "SUB":
+            session.subscribers.add(connection)
+            connection.subscriptions.add(session.session_id)
+            return "OK " + session.session_id
+
+        if command == "UNSUB":
+            session.subscribers.discard(connection)
+            connection.subscriptions.discard(session.session_id)
+            return "OK " + session.session_id
+
+        return "ERR unknown command " + command
+
+
+async def _request(reader, writer, line):
+    """
+    Sends a request and waits for its reply, skipping pushed board updates
+    """
+    writer.write(line.encode() + b"\n")
+    await writer.drain()
+    while True:
+        reply = (await reader.readline()).decode().rstrip("\n")
+        if not reply.startswith(("BOARD ", "EVICTED ")):
+            return reply
+
+
+async def _play(host, port, moves, seed, latencies):
+    """
+    One load test client: creates a session, watches it and plays random valid moves
+    """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    session_id = (await _request(reader, writer, "NEW")).split()[1]
+    await _request(reader, writer, "SUB " + session_id)
+
+    for _ in range(moves):
+        choices = (await _request(reader, writer, "MOVES " + session_id)).split()[1:]
+        if not choices:
+            break
+        move = rng.choice(choices)
+        split = 2 if move[2].isalpha() else 3
+        start = time.perf_counter()
+        reply = await _request(reader, writer, "MOVE %s %s %s" % (session_id, move[:split], move[split:]))
+        latencies.append(time.perf_counter() - start)
+        if reply != "OK UNFINISHED":
+            break  # the game is over
+
+    await _request(reader, writer, "QUIT")
+    writer.close()
+
+
+async def load_test(host="127.0.0.1", port=DEFAULT_PORT, clients=100, moves=50, seed=0):
+    """
+    Runs concurrent clients against a server and measures MOVE latency and throughput
+    :param host: server address
+    :param port: server port
+    :param clients: number of concurrent clients, each plays its own game
+    :param moves: most moves each client plays
+    :param seed: seed of the first client's moves
+    :return: dict with the number of moves, elapsed seconds, moves per second and latency percentiles in ms
+    """
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_play(host, port, moves, seed + number, latencies) for number in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def percentile(fraction):
+        return latencies[min(int(fraction * len(latencies)), len(latencies) - 1)] * 1000 if latencies else 0.0
+
+    return {"clients": clients, "moves": len(latencies), "elapsed": elapsed,
+            "moves_per_second": len(latencies) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(0.5), "p90_ms": percentile(0.9), "p99_ms": percentile(0.99),
+            "max_ms": latencies[-1] * 1000 if latencies else 0.0}
+
+
+async def _load_test_main(args):
+    server = None
+    port = args.port
+    if args.spawn:
+        server = GameServer(port=0)
+        await server.start()
+        port = server.port
+    result = await load_test(port=port, clients=args.clients, moves=args.moves)
+    print(" ".join("%s=%.2f" % (name, value) if isinstance(value, float) else "%s=%d" % (name, value)
+                   for name, value in result.items()))
+    if server is not None:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChessVar game server and load test client")
+    parser.add_argument("mode", choices=("serve", "loadtest"))
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT)
+    parser.add_argument("--clients", type=int, default=100, help="load test: concurrent clients")
+    parser.add_argument("--moves", type=int, default=50, help="load test: most moves per client")
+    parser.add_argument("--spawn", action="store_true", help="load test: start a server in this process")
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        asyncio.run(GameServer(port=args.port, idle_timeout=args.idle_timeout).serve_forever())
+    else:
+        asyncio.run(_load_test_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+# Description: Endgame tablebases for ChessVar.  For a small set of pieces, for example a white king and queen
+#              against a black king ("KQvK"), every placement of the pieces with either side to move is solved by
+#              retrograde analysis under this variant's rule that capturing the last piece of a type wins.  The
+#              result is one byte per position on disk, so a probe during play is a single lookup:
+#
+#                  0        draw, including positions where the side to move has no moves
+#                  odd n    the side to move wins in n plies
+#                  even n   the side to move loses in n plies
+#                  255      not a position, two pieces on one square
+#
+#              Moves come from GameBoard.generate_moves, so the tables follow exactly the moves the pieces'
+#              is_valid_move accepts.  A capture that leaves the captured type on the board leads into the table
+#              with one piece less, which is generated first.  Worker processes list the moves of the positions a
+#              chunk at a time and the results are consumed as they arrive.  A table of n pieces has 2 * 64^n
+#              positions: on one core three pieces solve in about ten seconds and four in about seventeen minutes
+#              with a peak of about 2 GB, so tables stop at four pieces.
+#
+#              Run:  python tablebase.py generate KQvK KRvK KPvK --dir tables [--workers 8]
+#                    python tablebase.py probe "8/8/8/3k4/8/8/3Q4/4K3 w 1" --dir tables
+import argparse
+import concurrent.futures
+import itertools
+import mmap
+import os
+import struct
+import tempfile
+import time
+from array import array
+
+from ChessVar import STANDARD_GEOMETRY, ChessVar, GameBoard
+
+MAGIC = b"CVTB"
+VERSION = 1
+HEADER = struct.Struct("<4sHH16s")  # magic, version, number of pieces, signature
+MAX_PIECES = 4  # a table of n pieces has 2 * 64^n positions, five pieces would be 2^31
+
+DRAW = 0
+INVALID = 255
+MAX_DISTANCE = 254  # longest distance stored, wins are odd so the longest win is 253
+
+PIECE_ORDER = "KQRBNP"  # order of the pieces of each side in a signature and in the position index
+
+WIN, LOSS = "WIN", "LOSS"
+
+
+def parse_signature(signature):
+    """
+    Reads a material signature: the white pieces, "v", the black pieces, for example "KQvK" or "KPPvKN"
+    :param signature: the signature text
+    :return: tuple of piece symbols in index order, white pieces upper case and black pieces lower case
+    """
+    white, separator, black = signature.upper().partition("V")
+    if not separator or not white or not black or (white + black).strip(PIECE_ORDER):
+        raise ValueError("a signature is the white pieces, 'v' and the black pieces, for example KQvK: " + signature)
+    if len(white) + len(black) > MAX_PIECES:
+        raise ValueError("tablebases have at most %d pieces" % MAX_PIECES)
+    return (tuple(sorted(white, key=PIECE_ORDER.index)) +
+            tuple(symbol.lower() for symbol in sorted(black, key=PIECE_ORDER.index)))
+
+
+def signature_name(pieces):
+    """
+    :param pieces: piece symbols in index order
+    :return: the signature text, for example "KQvK"
+    """
+    return "".join(piece for piece in pieces if piece.isupper()) + "v" + "".join(
+        piece.upper() for piece in pieces if piece.islower())
+
+
+def table_size(pieces):
+    return 2 * 64 ** len(pieces)
+
+
+def position_index(squares, white_to_move):
+    """
+    :param squares: square (row * 8 + col) of each piece in index order
+    :param white_to_move: True if white is to move
+    :return: index of the position in its table
+    """
+    index = 0 if white_to_move else 1
+    for square in squares:
+        index = index * 64 + square
+    return index
+
+
+def index_position(index, count):
+    """
+    The inverse of position_index
+    :param index: index in the table
+    :param count: number of pieces
+    :return: tuple of (list of squares in index order, True if white is to move)
+    """
+    squares = [0] * count
+    for number in range(count - 1, -1, -1):
+        index, squares[number] = divmod(index, 64)
+    return squares, index == 0
+
+
+def _sub_signature(pieces, removed):
+    """
+    :return: the pieces in index order with the one at position removed taken out
+    """
+    return pieces[:removed] + pieces[removed + 1:]
+
+
+def _list_moves(pieces, directory, start, stop):
+    """
+    Lists the moves of the positions start to stop of a table, in a worker process.  Everything that depends only
+    on a position's own moves is worked out here, so the parent only gets per-position counts and the moves inside
+    the table
+    :param pieces: piece symbols in index order
+    :param directory: directory holding the smaller tables that captures lead into
+    :param start: first index
+    :param stop: index to stop before
+    :return: tuple of (start, array of invalid indexes, array of (index, distance) pairs of positions that may be
+             solved with that distance, array('H') of the moves of each position that may not lose, bytes of the
+             longest win a capture into a smaller table gives the opponent from each position, array of move
+             sources, array of move destinations in this table)
+    """
+    count = len(pieces)
+    weights = [64 ** (count - 1 - number) for number in range(count)]  # what a move of each piece adds to the index
+    black_offset = 64 ** count  # index of the same placement with black to move
+    last_of_type = [pieces.count(piece) == 1 for piece in pieces]
+    tables = Tablebase(directory)
+    board = GameBoard()
+    board._load_board([[""] * 8 for _ in range(8)])
+    placed = [None] * count  # square of each piece on the board
+
+    invalid, pushes, sources, destinations = array('I'), array('I'), array('I'), array('I')
+    remaining = array('H', bytes(2 * (stop - start)))
+    longest_loss = bytearray(stop - start)
+
+    for index in range(start, stop):
+        squares, white_to_move = index_position(index, count)
+        if len(set(squares)) != count:
+            invalid.append(index)
+            continue
+
+        # Consecutive positions mostly differ in the last piece, so only the pieces that moved are set again
+        changed = [number for number in range(count) if placed[number] != squares[number]]
+        for number in changed:
+            if placed[number] is not None:
+                board.set_piece(placed[number] // 8, placed[number] % 8, "")
+        for number in changed:
+            board.set_piece(squares[number] // 8, squares[number] % 8, pieces[number])
+            placed[number] = squares[number]
+
+        side_offset = black_offset if white_to_move else -black_offset
+        piece_at = {square: number for number, square in enumerate(squares)}
+        not_losing = longest = 0
+        losing_capture = won = False
+        for start_row, start_col, end_row, end_col in board.generate_moves("WHITE" if white_to_move else "BLACK"):
+            begin, end = start_row * 8 + start_col, end_row * 8 + end_col
+            moved = piece_at[begin]
+            captured = piece_at.get(end)
+
+            if captured is None:
+                sources.append(index)
+                destinations.append(index + (end - begin) * weights[moved] + side_offset)
+                not_losing += 1
+            elif last_of_type[captured]:
+                won = True  # takes the last piece of its type
+                break
+            else:
+                after = list(squares)
+                after[moved] = end
+                smaller = _sub_signature(pieces, captured)
+                value = tables.probe_index(smaller, position_index(_sub_signature(after, captured),
+                                                                   not white_to_move))
+                if value is None:
+                    raise ValueError("generate the %s table first" % signature_name(smaller))
+                if value == DRAW or value % 2 == 0:
+                    not_losing += 1  # this move does not lose, the position never becomes a loss
+                    if value:
+                        pushes.extend((index, value + 1))  # the opponent loses: a win, unless a shorter one is found
+                else:
+                    longest = max(longest, value)
+                    losing_capture = True
+
+        # A win at once still keeps the count of the moves listed before it, the solver counts those moves down
+        remaining[index - start] = not_losing
+        longest_loss[index - start] = longest
+        if won:
+            pushes.extend((index, 1))
+        elif losing_capture and not not_losing:  # every move captures into a smaller table the opponent wins
+            pushes.extend((index, longest + 1))
+
+    tables.close()
+    return start, invalid, pushes, remaining, bytes(longest_loss), sources, destinations
+
+
+def _listed_chunks(pieces, directory, workers, chunk_size):
+    """
+    Lists the moves of every position of a table a chunk at a time, in worker processes unless workers is 1.  At
+    most two chunks per worker are listed ahead, so only their moves are held in memory and not the whole table's
+    :return: generator of the _list_moves results, in any order
+    """
+    size = table_size(pieces)
+    chunks = ((pieces, directory, start, min(start + chunk_size, size)) for start in range(0, size, chunk_size))
+
+    if workers == 1:
+        for chunk in chunks:
+            yield _list_moves(*chunk)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        while True:
+            while len(pending) < workers * 2:  # keep every worker busy without listing the whole table up front
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.add(executor.submit(_list_moves, *chunk))
+            if not pending:
+                return
+
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def required_signatures(signature):
+    """
+    Lists the tables a table's captures lead into, smallest first, ending with the table itself
+    :param signature: the signature text
+    :return: list of signature texts
+    """
+    order = []
+
+    def visit(pieces):
+        name = signature_name(pieces)
+        if name in order:
+            return
+        for number, piece in enumerate(pieces):
+            if pieces.count(piece) > 1:
+                visit(_sub_signature(pieces, number))
+        order.append(name)
+
+    visit(parse_signature(signature))
+    return order
+
+
+def generate(signature, directory, workers=None, chunk_size=1 << 14):
+    """
+    Solves one table by retrograde analysis and writes it to directory, the smaller tables its captures lead
+    into must be there already (see required_signatures)
+    :param signature: the signature text, for example "KQvK"
+    :param directory: directory to write signature.cvtb to
+    :param workers: number of worker processes listing moves, defaults to the number of cores, 1 lists them in
+                    this process
+    :param chunk_size: positions given to a worker at a time
+    :return: dict of the number of positions won, lost and drawn for the side to move
+    """
+    pieces = parse_signature(signature)
+    size = table_size(pieces)
+    os.makedirs(directory, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    values = bytearray(size)  # DRAW until solved
+    remaining = array('H', bytes(2 * size))  # moves that may still turn out not to lose
+    longest_loss = bytearray(size)  # longest win the opponent has after any move found so far
+    buckets = [array('I') for _ in range(INVALID)]  # bucket n holds positions that may be solved with value n
+    predecessor_count = array('I', bytes(4 * (size + 1)))  # moves into each position, at index + 1
+
+    def push(index, distance):
+        if distance >= INVALID:
+            raise ValueError("%s has a win longer than %d plies" % (signature, MAX_DISTANCE))
+        buckets[distance].append(index)
+
+    # The moves inside the table are kept on disk until they have all been counted, then read back once to build
+    # the predecessor index
+    with tempfile.TemporaryFile(dir=directory) as moves_file:
+        for start, invalid, pushes, counts, longest, sources, destinations in _listed_chunks(
+                pieces, directory, workers, chunk_size):
+            for index in invalid:
+                values[index] = INVALID
+            for number in range(0, len(pushes), 2):
+                push(pushes[number], pushes[number + 1])
+            remaining[start:start + len(counts)] = counts
+            longest_loss[start:start + len(longest)] = longest
+            for index in destinations:
+                predecessor_count[index + 1] += 1
+            array('I', [len(sources)]).tofile(moves_file)
+            sources.tofile(moves_file)
+            destinations.tofile(moves_file)
+
+        # Predecessors of each position, as one array sliced by offset.  The offsets go past 32 bits when a table
+        # has more than 2^32 moves
+        typecode = 'I' if sum(predecessor_count) < 1 << 32 else 'Q'
+        predecessor_count = array(typecode, itertools.accumulate(predecessor_count))
+        predecessors = array('I', bytes(4 * predecessor_count[size]))
+        fill = array(typecode, predecessor_count)
+
+        moves_file.seek(0)
+        while True:
+            length = array('I')
+            try:
+                length.fromfile(moves_file, 1)
+            except EOFError:
+                break
+            sources, destinations = array('I'), array('I')
+            sources.fromfile(moves_file, length[0])
+            destinations.fromfile(moves_file, length[0])
+            for source, destination in zip(sources, destinations):
+                predecessors[fill[destination]] = source
+                fill[destination] += 1
+        del fill, sources, destinations
+
+    # Solve in order of distance, so every position gets its shortest win or longest loss
+    solved = bytearray(size)
+    for distance in range(1, INVALID):
+        for index in buckets[distance]:
+            if solved[index]:
+                continue  # already solved with a shorter distance
+            solved[index] = 1
+            values[index] = distance
+            for number in range(predecessor_count[index], predecessor_count[index + 1]):
+                previous = predecessors[number]
+                if solved[previous]:
+                    continue
+                if distance % 2 == 0:  # the move leaves the opponent lost: a win
+                    push(previous, distance + 1)
+                else:
+                    remaining[previous] -= 1
+                    if longest_loss[previous] < distance:
+                        longest_loss[previous] = distance
+                    if not remaining[previous]:  # every move lets the opponent win
+                        push(previous, longest_loss[previous] + 1)
+        buckets[distance] = array('I')
+
+    path = os.path.join(directory, signature_name(pieces) + ".cvtb")
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(pieces), signature_name(pieces).encode()))
+        file.write(values)
+    os.replace(temporary, path)
+
+    counts = [values.count(value) for value in range(256)]
+    return {"positions": size - counts[INVALID], "wins": sum(counts[1:INVALID:2]),
+            "losses": sum(counts[2:INVALID:2]), "draws": counts[DRAW]}
+
+
+class Tablebase:
+    """
+    Read-only access to the tables in a directory, each table is memory-mapped the first time it is probed
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: directory holding .cvtb tables
+        """
+        self.directory = directory
+        self._tables = {}  # pieces in index order -> mmap of the table's values, None if there is no table
+
+    def _table(self, pieces):
+        table = self._tables.get(pieces, False)
+        if table is False:
+            table = None
+            path = os.path.join(self.directory, signature_name(pieces) + ".cvtb")
+            if os.path.exists(path):
+                with open(path, "rb") as file:
+                    table = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, version, count, name = HEADER.unpack_from(table)
+                if magic != MAGIC or version != VERSION or count != len(pieces) or len(table) != (
+                        HEADER.size + table_size(pieces)):
+                    raise ValueError(path + " is not a version %d tablebase" % VERSION)
+            self._tables[pieces] = table
+        return table
+
+    def probe_index(self, pieces, index):
+        """
+        :param pieces: piece symbols in index order
+        :param index: position index, see position_index
+        :return: the stored value, or None if there is no table for the pieces
+        """
+        table = self._table(pieces)
+        return None if table is None else table[HEADER.size + index]
+
+    def probe_board(self, board, color):
+        """
+        Looks up a position
+        :param board: the GameBoard
+        :param color: the color to move
+        :return: tuple of (WIN, LOSS or DRAW for the side to move, plies to the end of the game, 0 for a draw),
+                 or None if the position's pieces have no table or the board is not 8x8
+        """
+        if board.get_geometry() is not STANDARD_GEOMETRY:
+            return None  # the tables are indexed by 8x8 squares
+        symbols = board.get_symbols()
+        placed = sorted(((symbol, square) for square, symbol in enumerate(symbols) if symbol),
+                        key=lambda item: (item[0].islower(), PIECE_ORDER.index(item[0].upper())))
+        if not placed or len(placed) > MAX_PIECES:
+            return None
+
+        pieces = tuple(symbol for symbol, _ in placed)
+        value = self.probe_index(pieces, position_index([square for _, square in placed], color == "WHITE"))
+        if value is None or value == INVALID:
+            return None
+        if value == DRAW:
+            return "DRAW", 0
+        return (WIN if value % 2 else LOSS), value
+
+    def probe(self, game):
+        """
+        Looks up a game's position for the player to move
+        :param game: the ChessVar game
+        :return: tuple of (WIN, LOSS or DRAW, plies), or None if there is no table for the position or the board
+                 is not 8x8
+        """
+        if game.get_game_state() != "UNFINISHED":
+            return None
+        return self.probe_board(game.get_game_board(), game.get_current_player())
+
+    def best_move(self, game):
+        """
+        Picks the move that wins fastest, loses slowest or keeps the draw
+        :param game: the ChessVar game
+        :return: the move as (start_row, start_col, end_row, end_col), or None if the position has no table
+        """
+        if self.probe(game) is None:
+            return None
+        best, best_rank = None, None
+        for move in game.generate_moves():
+            game.apply_move(*move)
+            if game.get_game_state() != "UNFINISHED":
+                rank = (0, 0)  # wins now
+            else:
+                result = self.probe(game)
+                if result is None:
+                    rank = (2, 0)
+                elif result[0] == LOSS:
+                    rank = (1, result[1])  # the opponent loses, sooner is better
+                elif result[0] == "DRAW":
+                    rank = (2, 0)
+                else:
+                    rank = (3, -result[1])  # the opponent wins, later is better
+            game.undo_move()
+            if best_rank is None or rank < best_rank:
+                best, best_rank = move, rank
+        return best
+
+    def close(self):
+        for table in self._tables.values():
+            if table is not None:
+                table.close()
+        self._tables = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and probe ChessVar endgame tablebases")
+    parser.add_argument("mode", choices=("generate", "probe"))
+    parser.add_argument("arguments", nargs="+", help="signatures to generate, or one FEN style position to probe")
+    parser.add_argument("--dir", default="tables", help="directory of the tables")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to the core count")
+    args = parser.parse_args()
+
+    if args.mode == "probe":
+        tables = Tablebase(args.dir)
+        game = ChessVar.from_fen(" ".join(args.arguments))
+        print(tables.probe(game) or "no table")
+        return
+
+    done = set()
+    for signature in args.arguments:
+        for name in required_signatures(signature):
+            if name in done or (name != signature_name(parse_signature(signature)) and
+                                os.path.exists(os.path.join(args.dir, name + ".cvtb"))):
+                continue
+            start = time.perf_counter()
+            counts = generate(name, args.dir, args.workers)
+            done.add(name)
+            print("%-8s %10d positions  %d won  %d lost  %d drawn  %.1f s" % (
+                name, counts["positions"], counts["wins"], counts["losses"], counts["draws"],
+                time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
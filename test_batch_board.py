@@ -0,0 +1,65 @@
+import random
+import unittest
+
+from ChessVar import ChessVar, GAME_STATES
+
+try:
+    import numpy
+    from batch_board import BoardBatch
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class BoardBatchTest(unittest.TestCase):
+
+    def assert_matches(self, batch, games):
+        for number, game in enumerate(games):
+            self.assertEqual(batch.get_board_string(number), game.get_game_board().get_board_string())
+            self.assertEqual(int(batch.turns[number]), game.get_current_turn())
+            self.assertEqual(GAME_STATES[batch.states[number]], game.get_game_state())
+            self.assertEqual(batch.to_game(number).to_fen(), game.to_fen())
+            for color in ("WHITE", "BLACK"):
+                self.assertEqual(list(batch.piece_counts(color)[number]),
+                                 list(game.get_game_board().get_material(color).values()))
+                self.assertEqual(sorted(map(str, batch.to_game(number).get_game_board().captured_pieces[color])),
+                                 sorted(map(str, game.get_game_board().captured_pieces[color])))
+
+    def test_lockstep_moves_match_chessvar(self):
+        rng = random.Random(1)
+        games = [ChessVar() for _ in range(64)]
+        batch = BoardBatch.from_games(games)
+
+        for _ in range(40):
+            starts, ends = [], []
+            for game in games:
+                moves = game.generate_moves()
+                if not moves:
+                    starts.append(-1)
+                    ends.append(-1)
+                    continue
+                start_row, start_col, end_row, end_col = rng.choice(moves)
+                game.apply_move(start_row, start_col, end_row, end_col)
+                starts.append(start_row * 8 + start_col)
+                ends.append(end_row * 8 + end_col)
+            won = batch.apply_moves(starts, ends)
+
+            for number, game in enumerate(games):
+                if won[number]:
+                    self.assertNotEqual(game.get_game_state(), "UNFINISHED")
+            self.assert_matches(batch, games)
+
+        self.assertTrue(any(game.get_game_state() != "UNFINISHED" for game in games))
+
+    def test_round_trip(self):
+        game = ChessVar()
+        for start, end in (("e2", "e4"), ("d7", "d5"), ("e4", "d5")):
+            game.make_move(start, end)
+        batch = BoardBatch.from_games([game, ChessVar()])
+        self.assert_matches(batch, [game, ChessVar()])
+        self.assertEqual(BoardBatch.from_boards([game.get_game_board()]).get_board_string(0),
+                         game.get_game_board().get_board_string())
+
+
+if __name__ == "__main__":
+    unittest.main()
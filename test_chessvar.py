@@ -0,0 +1,311 @@
+import copy
+import pickle
+import random
+import unittest
+
+from ChessVar import (BitboardGameBoard, BoardGeometry, ChessVar, GameBoard, Pawn, Position, STANDARD_GEOMETRY,
+                      START_POSITION, decode_positions, encode_positions, make_piece, validate_moves)
+from perft import validate
+from transposition import TranspositionTable
+
+
+def play_random(game, plies, rng):
+    """
+    Plays random moves until the game ends, the player to move has no moves or plies moves were played
+    :return: the game
+    """
+    for _ in range(plies):
+        moves = game.generate_moves()
+        if game.get_game_state() != "UNFINISHED" or not moves:
+            break
+        game.apply_move(*rng.choice(moves))
+    return game
+
+
+class BitboardGameBoardTest(unittest.TestCase):
+
+    def test_same_answers_as_the_list_backend(self):
+        rng = random.Random(1)
+        for _ in range(10):
+            game = play_random(ChessVar(), rng.randint(0, 40), rng)
+            board = game.get_game_board()
+            bitboard = BitboardGameBoard.from_fen(board.to_fen())
+            self.assertEqual(bitboard.get_board_string(), board.get_board_string())
+            for start in range(64):
+                for end in range(64):
+                    move = divmod(start, 8) + divmod(end, 8)
+                    self.assertEqual(bitboard.is_valid_move(*move), board.is_valid_move(*move), move)
+
+    def test_pawn_steps_to_an_empty_square(self):
+        for board in (GameBoard(), BitboardGameBoard()):
+            self.assertTrue(Pawn("WHITE").is_valid_move(1, 4, 2, 4, board))
+            self.assertTrue(Pawn("BLACK").is_valid_move(6, 4, 5, 4, board))
+            self.assertTrue(board.is_valid_move(1, 4, 2, 4))
+            board.set_piece(2, 4, "n")
+            self.assertFalse(Pawn("WHITE").is_valid_move(1, 4, 2, 4, board))
+            self.assertFalse(board.is_valid_move(1, 4, 2, 4))
+        self.assertTrue(ChessVar(BitboardGameBoard()).make_move("e2", "e3"))
+
+
+class MoveGenerationTest(unittest.TestCase):
+
+    def test_generated_moves_are_the_moves_make_move_accepts(self):
+        rng = random.Random(2)
+        for board_class in (GameBoard, BitboardGameBoard):
+            validate(ChessVar(board_class()), 2)
+            for _ in range(10):
+                validate(play_random(ChessVar(board_class()), rng.randint(1, 40), rng), 1)
+
+
+def game_state(game):
+    """
+    Everything undo_move and redo_move must restore
+    """
+    board = game.get_game_board()
+    return (board.get_board_string(), game.get_current_turn(), game.get_current_player(), game.get_game_state(),
+            {color: [str(piece) for piece in pieces] for color, pieces in board.captured_pieces.items()},
+            game.get_zobrist_key(), game.get_move_history())
+
+
+class UndoRedoTest(unittest.TestCase):
+
+    def test_undo_and_redo_restore_the_game(self):
+        rng = random.Random(3)
+        game = ChessVar()
+        states = []
+        while game.get_game_state() == "UNFINISHED" and len(states) < 80:
+            states.append(game_state(game))
+            game.apply_move(*rng.choice(game.generate_moves()))
+        states.append(game_state(game))
+        self.assertTrue(any(states[-1][4].values()))  # some pieces were captured
+
+        for state in reversed(states[:-1]):
+            self.assertTrue(game.undo_move())
+            self.assertEqual(game_state(game), state)
+        self.assertFalse(game.undo_move())
+
+        for state in states[1:]:
+            self.assertTrue(game.redo_move())
+            self.assertEqual(game_state(game), state)
+        self.assertFalse(game.redo_move())
+
+    def test_a_new_move_clears_redo(self):
+        game = ChessVar()
+        game.make_move("e2", "e4")
+        game.undo_move()
+        game.make_move("d2", "d4")
+        self.assertFalse(game.redo_move())
+        self.assertEqual(game.get_move_history(), [("d2", "d4")])
+
+
+class MaterialTest(unittest.TestCase):
+
+    def test_material_follows_the_board(self):
+        rng = random.Random(4)
+        game = ChessVar()
+        board = game.get_game_board()
+        for _ in range(60):
+            if game.get_game_state() != "UNFINISHED":
+                break
+            game.apply_move(*rng.choice(game.generate_moves()))
+            if rng.random() < 0.2:
+                game.undo_move()
+            symbols = board.get_symbols()
+            for color, case in (("WHITE", str.upper), ("BLACK", str.lower)):
+                self.assertEqual(board.get_material(color),
+                                 {piece_type: symbols.count(case(piece_type)) for piece_type in "prnbqk"})
+
+    def test_taking_the_last_piece_of_a_type_wins(self):
+        game = ChessVar.from_fen("8/8/8/8/8/8/1p6/P6k w 1")
+        self.assertTrue(game.make_move("a1", "b2"))
+        self.assertEqual(game.get_game_board().get_piece_count("BLACK", "p"), 0)
+        self.assertEqual(game.get_game_state(), "WHITE_WON")
+
+
+class ZobristTest(unittest.TestCase):
+
+    def test_keys_match_a_board_built_from_scratch(self):
+        rng = random.Random(5)
+        game = ChessVar()
+        keys = {game.to_fen().rsplit(" ", 1)[0]: game.get_zobrist_key()}  # the position without the turn number
+        for _ in range(40):
+            if game.get_game_state() != "UNFINISHED":
+                break
+            game.apply_move(*rng.choice(game.generate_moves()))
+            self.assertEqual(game.get_zobrist_key(), ChessVar.from_fen(game.to_fen()).get_zobrist_key())
+            keys[game.to_fen().rsplit(" ", 1)[0]] = game.get_zobrist_key()
+        self.assertEqual(len(set(keys.values())), len(keys))
+
+    def test_repetition_count(self):
+        game = ChessVar()
+        for start, end in (("g1", "f3"), ("g8", "f6"), ("f3", "g1"), ("f6", "g8")):
+            game.make_move(start, end)
+        self.assertEqual(game.get_zobrist_key(), ChessVar().get_zobrist_key())
+        self.assertEqual(game.get_repetition_count(), 1)
+
+    def test_transposition_table_replacement(self):
+        table = TranspositionTable(16, "depth")
+        self.assertTrue(table.store(7, 3, "deep"))
+        self.assertFalse(table.store(23, 1, "shallow"))  # the same slot as key 7
+        self.assertEqual((table.probe(7), table.probe(23)), ((3, "deep"), None))
+        self.assertTrue(table.store(7, 1, "newer"))  # a key always replaces its own entry
+        self.assertEqual(table.probe(7), (1, "newer"))
+
+        table = TranspositionTable(16, "always")
+        table.store(7, 3, "deep")
+        self.assertTrue(table.store(23, 1, "shallow"))
+        self.assertEqual((table.probe(7), table.probe(23)), (None, (1, "shallow")))
+
+
+class FormatTest(unittest.TestCase):
+
+    def test_fen_and_bytes_round_trip(self):
+        self.assertEqual(ChessVar().to_fen(), "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w 1")
+        rng = random.Random(9)
+        games = [play_random(ChessVar(), rng.randint(0, 120), rng) for _ in range(30)]
+        self.assertTrue(any(game.get_game_state() != "UNFINISHED" for game in games))
+
+        for game in games:
+            fen = game.to_fen()
+            for board_class in (GameBoard, BitboardGameBoard):
+                self.assertEqual(ChessVar.from_fen(fen, board_class).to_fen(), fen)
+                self.assertEqual(ChessVar.from_bytes(game.to_bytes(), board_class).to_fen(), fen)
+            board = game.get_game_board()
+            self.assertEqual(GameBoard.from_bytes(board.to_bytes()).get_board_string(), board.get_board_string())
+            self.assertEqual(GameBoard.from_fen(board.to_fen()).get_board_string(), board.get_board_string())
+
+        self.assertEqual([game.to_fen() for game in decode_positions(encode_positions(games))],
+                         [game.to_fen() for game in games])
+
+    def test_bad_input(self):
+        for fen in ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w", "8/8/8/8/8/8/8/8 b 1",
+                    "rnbqkbnr/pppppppp/9/8/8/8/PPPPPPPP/RNBQKBNR w 1"):
+            with self.assertRaises(ValueError):
+                ChessVar.from_fen(fen)
+        with self.assertRaises(ValueError):
+            ChessVar.from_bytes(bytes(35))
+
+
+class ValidateMovesTest(unittest.TestCase):
+
+    def test_same_answers_as_is_valid_move(self):
+        rng = random.Random(13)
+        squares = [(row, col) for row in range(-1, 9) for col in range(-1, 9)]
+        for _ in range(10):
+            game = play_random(ChessVar(), rng.randint(0, 40), rng)
+            board = game.get_game_board()
+            moves = [(rng.choice(squares), rng.choice(squares)) for _ in range(500)]
+            moves += [(move[:2], move[2:]) for move in [(1, 4, 3, 4), (0, 1, 2, 2)]]
+            expected = [board.is_on_board(*start) and board.is_on_board(*end) and bool(board.get_symbol(*start)) and
+                        board.is_valid_move(*start, *end) for start, end in moves]
+            self.assertEqual(validate_moves(game, moves), expected)
+            self.assertEqual(validate_moves(board, moves), expected)
+        self.assertEqual(validate_moves(ChessVar(), [("e2", "e4"), ("e2", "e5"), ("e4", "e5")]), [True, False, False])
+
+
+class PositionTest(unittest.TestCase):
+
+    def test_games_from_a_template_are_independent(self):
+        game = ChessVar()
+        for start, end in (("e2", "e4"), ("d7", "d5"), ("e4", "d5")):
+            game.make_move(start, end)
+        position = Position.from_game(game)
+
+        for board_class in (GameBoard, BitboardGameBoard):
+            first = ChessVar.from_position(position, board_class)
+            second = ChessVar.from_position(position, board_class)
+            self.assertEqual(first.to_fen(), game.to_fen())
+            self.assertEqual([str(piece) for piece in first.get_game_board().captured_pieces["WHITE"]], ["p"])
+            self.assertEqual(first.get_zobrist_key(), game.get_zobrist_key())
+
+            first.make_move("d8", "d5")
+            self.assertEqual(second.to_fen(), game.to_fen())
+            self.assertEqual(ChessVar.from_position(position, board_class).to_fen(), position.to_fen())
+
+    def test_new_games_start_from_the_start_position(self):
+        game = ChessVar()
+        game.make_move("e2", "e4")
+        self.assertEqual(ChessVar().to_fen(), START_POSITION.to_fen())
+        self.assertEqual(GameBoard().get_board_string(), START_POSITION.board_string)
+
+
+class PieceTest(unittest.TestCase):
+
+    def test_one_shared_piece_per_type_and_color(self):
+        self.assertIs(Pawn("WHITE"), make_piece("P"))
+        self.assertIs(GameBoard().get_piece(1, 0), Pawn("WHITE"))
+        self.assertIs(BitboardGameBoard().get_piece(6, 0), Pawn("BLACK"))
+        self.assertIsNot(Pawn("WHITE"), Pawn("BLACK"))
+        piece = make_piece("q")
+        self.assertEqual((str(piece), piece.get_color), ("q", "BLACK"))
+        self.assertIs(copy.deepcopy(piece), piece)
+        self.assertIs(pickle.loads(pickle.dumps(piece)), piece)
+        self.assertIsNone(make_piece("x"))
+
+    def test_pieces_cannot_be_changed(self):
+        with self.assertRaises(AttributeError):
+            Pawn("WHITE")._color = "BLACK"
+        with self.assertRaises(AttributeError):
+            Pawn("WHITE").extra = 1
+
+    def test_invalid_symbols_are_rejected(self):
+        for board in (GameBoard(), BitboardGameBoard()):
+            with self.assertRaises(ValueError):
+                board.set_piece(0, 0, "x")
+            with self.assertRaises(ValueError):
+                board.set_piece(0, 0, "None")
+            self.assertEqual(board.get_symbol(0, 0), "R")
+            board.set_piece(0, 0, None)
+            self.assertEqual(board.get_symbol(0, 0), "")
+
+
+class GeometryTest(unittest.TestCase):
+
+    def test_geometries_are_shared(self):
+        self.assertIs(BoardGeometry(8, 8), STANDARD_GEOMETRY)
+        self.assertIs(BoardGeometry(10, 12), BoardGeometry(10, 12))
+        for rows, cols in ((3, 8), (8, 1), (8, 27), (16, 17)):
+            with self.assertRaises(ValueError):
+                BoardGeometry(rows, cols)
+
+    def test_moves_on_other_sizes(self):
+        rng = random.Random(22)
+        for rows, cols in ((10, 10), (6, 12)):
+            geometry = BoardGeometry(rows, cols)
+            for board_class in (GameBoard, BitboardGameBoard):
+                game = ChessVar(board_class(geometry))
+                validate(game, 2)
+                play_random(game, 20, rng)
+                validate(game, 1)
+                self.assertEqual(ChessVar.from_fen(game.to_fen(), board_class).to_fen(), game.to_fen())
+                with self.assertRaises(ValueError):
+                    game.to_bytes()
+
+
+class AttackMapTest(unittest.TestCase):
+
+    def test_updates_match_a_rebuilt_map(self):
+        rng = random.Random(23)
+        for board in (GameBoard(), BitboardGameBoard(), GameBoard(BoardGeometry(10, 10)),
+                      BitboardGameBoard(BoardGeometry(6, 12))):
+            game = ChessVar(board)
+            attacks = board.get_attack_map()
+            for _ in range(60):
+                moves = game.generate_moves()
+                if game.get_game_state() != "UNFINISHED" or not moves:
+                    break
+                game.apply_move(*rng.choice(moves))
+                if rng.random() < 0.2:
+                    game.undo_move()
+                self.assertEqual(attacks.verify(), [])
+
+    def test_queries(self):
+        attacks = GameBoard().get_attack_map()
+        self.assertTrue(attacks.is_attacked(2, 0, "WHITE"))  # the knight on b1
+        self.assertFalse(attacks.is_attacked(4, 4, "WHITE"))
+        self.assertEqual(attacks.attack_count(2, 2, "WHITE"), attacks.attackers(2, 2, "WHITE").bit_count())
+        self.assertIn((2, 0), attacks.squares(attacks.attacks_from(0, 1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import random
+import unittest
+
+from ChessVar import ChessVar
+from opening_book import BookBuilder, OpeningBook
+from test_support import DirectoryTestCase, random_games
+
+
+class OpeningBookTest(DirectoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.directory, "book.cvob")
+
+    def test_round_trip(self):
+        builder = BookBuilder(max_plies=6)
+        for game in random_games(200, max_plies=20):
+            builder.add_game(game)
+        builder.write(self.path)
+
+        with OpeningBook(self.path) as book:
+            self.assertEqual(len(book), len(builder))
+            for (key, start, end), counts in builder._counts.items():
+                self.assertIn((start, end, *counts), book.lookup(key))
+
+            game = ChessVar()
+            total = sum(book_move.games for book_move in book.moves(game))
+            self.assertEqual(total, 200)
+            self.assertIn(book.choose(game), game.generate_moves())
+            self.assertIn(book.choose(game, random.Random(1)), game.generate_moves())
+
+            game.make_move("a2", "a3")
+            game.make_move("a7", "a6")
+            game.make_move("h2", "h3")
+            game.make_move("h7", "h6")
+            game.make_move("a3", "a4")
+            game.make_move("h6", "h5")
+            game.make_move("b2", "b3")
+            self.assertEqual(book.moves(game), [])
+            self.assertIsNone(book.choose(game))
+
+    def test_results_are_counted_for_the_player_moving(self):
+        builder = BookBuilder(max_plies=2)
+        builder.add_moves([("e2", "e4"), ("d7", "d5")], "WHITE_WON")
+        builder.add_moves([("e2", "e4"), ("e7", "e5")], "BLACK_WON")
+        builder.write(self.path)
+
+        with OpeningBook(self.path) as book:
+            [book_move] = book.moves(ChessVar())
+            self.assertEqual((book_move.games, book_move.wins, book_move.losses), (2, 1, 1))
+            self.assertEqual(book_move.win_rate, 0.5)
+
+    def test_invalid_move_after_the_book_plies(self):
+        builder = BookBuilder(max_plies=2)
+        with self.assertRaises(ValueError):
+            builder.add_moves([("e2", "e4"), ("d7", "d5"), ("a1", "a5")], "WHITE_WON")
+        self.assertEqual((builder.games, len(builder)), (0, 0))
+
+        builder.add_moves([("e2", "e4"), ("d7", "d5"), ("a1", "a5")], "WHITE_WON", validate=False)
+        self.assertEqual((builder.games, len(builder)), (1, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
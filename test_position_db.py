@@ -0,0 +1,92 @@
+import os
+import unittest
+
+from position_db import PositionDB, PositionWriter, build_index, index_path
+from test_support import DirectoryTestCase, random_games
+
+
+class PositionDBTest(DirectoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.directory, "games.cvdb")
+
+    def assert_index_sorted(self, db):
+        pairs = [(db.get_key(number), number) for number in range(len(db))]
+        self.assertEqual(db._indexed, len(db))
+        self.assertEqual(list(zip(db._index[::2], db._index[1::2])), sorted(pairs))
+
+    def test_round_trip(self):
+        games = random_games(200)
+        with PositionWriter(self.path) as writer:
+            writer.write_many(games)
+
+        with PositionDB(self.path) as db:
+            self.assertEqual(len(db), len(games))
+            for number, game in enumerate(games):
+                stored = db.get_game(number)
+                self.assertEqual(stored.to_fen(), game.to_fen())
+                for color in ("WHITE", "BLACK"):
+                    self.assertEqual(sorted(map(str, stored.get_game_board().captured_pieces[color])),
+                                     sorted(map(str, game.get_game_board().captured_pieces[color])))
+                self.assertIn(number, db.find(game.get_zobrist_key()))
+            self.assertEqual([record[:2] for record in db.scan()],
+                             [(number, game.get_zobrist_key()) for number, game in enumerate(games)])
+
+    def test_close_after_a_partial_scan(self):
+        games = random_games(20, seed=5)
+        with PositionWriter(self.path) as writer:
+            writer.write_many(games)
+
+        db = PositionDB(self.path)
+        records = db.scan(chunk=8)
+        self.assertEqual(next(records)[:2], (0, games[0].get_zobrist_key()))
+        db.close()
+        records.close()
+
+    def test_appends_are_merged_into_the_index(self):
+        games = random_games(300, seed=2)
+        with PositionWriter(self.path) as writer:
+            writer.write_many(games[:100])
+        with PositionWriter(self.path) as writer:
+            writer.write_many(games[100:])
+
+        with PositionDB(self.path) as db:
+            self.assert_index_sorted(db)
+            for number, game in enumerate(games):
+                self.assertIn(number, db.find(game.get_zobrist_key()))
+
+    def test_unindexed_records_are_found(self):
+        games = random_games(50, seed=3)
+        with PositionWriter(self.path) as writer:
+            writer.write_many(games[:40])
+        writer = PositionWriter(self.path)
+        writer.write_many(games[40:])
+        writer.flush()
+
+        with PositionDB(self.path) as db:
+            self.assertEqual(db._indexed, 40)
+            self.assertIn(45, db.find(games[45].get_zobrist_key()))
+        writer.close()
+
+    def test_index_built_in_small_runs(self):
+        with PositionWriter(self.path) as writer:
+            writer.write_many(random_games(120, seed=4))
+        os.remove(index_path(self.path))
+        build_index(self.path, run_size=7)
+
+        with PositionDB(self.path) as db:
+            self.assert_index_sorted(db)
+        self.assertEqual(sorted(os.listdir(self.directory)), ["games.cvdb", "games.cvdb.idx"])
+
+    def test_truncated_file(self):
+        with open(self.path, "wb") as file:
+            file.write(b"CVPD")
+        with self.assertRaises(ValueError):
+            PositionDB(self.path)
+        with self.assertRaises(ValueError):
+            PositionWriter(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import random
+import tempfile
+import unittest
+
+from ChessVar import ChessVar
+
+
+def random_games(count, seed=1, max_plies=12):
+    """
+    Plays games of random moves from the starting position
+    :param count: number of games
+    :param seed: seed of the random.Random choosing the moves
+    :param max_plies: most moves in a game, each game plays at least one
+    :return: list of ChessVar games
+    """
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        game = ChessVar()
+        for _ in range(rng.randint(1, max_plies)):
+            if game.get_game_state() != "UNFINISHED":
+                break
+            game.apply_move(*rng.choice(game.generate_moves()))
+        games.append(game)
+    return games
+
+
+class DirectoryTestCase(unittest.TestCase):
+    """
+    Test case with a temporary directory, removed after each test
+    """
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
@@ -0,0 +1,90 @@
+import os
+import unittest
+
+from ChessVar import BoardGeometry, ChessVar, GameBoard
+from tablebase import (DRAW, INVALID, LOSS, WIN, Tablebase, generate, index_position, parse_signature,
+                       position_index, table_size)
+from test_support import DirectoryTestCase
+
+
+class TablebaseTest(DirectoryTestCase):
+
+    def assert_solved(self, signature):
+        """
+        Checks every position of a table against the values of the positions its moves lead to
+        """
+        pieces = parse_signature(signature)
+        with Tablebase(self.directory) as tables:
+            for index in range(table_size(pieces)):
+                value = tables.probe_index(pieces, index)
+                squares, white_to_move = index_position(index, len(pieces))
+                if len(set(squares)) != len(pieces):
+                    self.assertEqual(value, INVALID)
+                    continue
+
+                board = GameBoard()
+                board._load_board([[""] * 8 for _ in range(8)])
+                for piece, square in zip(pieces, squares):
+                    board.set_piece(square // 8, square % 8, piece)
+                after = []
+                for start_row, start_col, end_row, end_col in board.generate_moves(
+                        "WHITE" if white_to_move else "BLACK"):
+                    moved = squares.index(start_row * 8 + start_col)
+                    end = end_row * 8 + end_col
+                    if end in squares:  # every piece in these tables is the last of its type
+                        after = None
+                        break
+                    moved_squares = list(squares)
+                    moved_squares[moved] = end
+                    after.append(tables.probe_index(pieces, position_index(moved_squares, not white_to_move)))
+
+                if after is None:
+                    self.assertEqual(value, 1)
+                elif any(reply and reply % 2 == 0 for reply in after):
+                    self.assertEqual(value, min(reply for reply in after if reply and reply % 2 == 0) + 1)
+                elif after and all(reply % 2 for reply in after):
+                    self.assertEqual(value, max(after) + 1)
+                else:
+                    self.assertEqual(value, DRAW)
+
+    def test_small_tables_are_solved(self):
+        for signature, workers in (("KvK", 1), ("NvN", 2), ("PvK", 1)):
+            generate(signature, self.directory, workers=workers, chunk_size=1 << 10)
+            self.assert_solved(signature)
+        self.assertEqual(sorted(os.listdir(self.directory)), ["KvK.cvtb", "NvN.cvtb", "PvK.cvtb"])
+
+    def test_probe(self):
+        generate("PvK", self.directory, workers=1)
+        with Tablebase(self.directory) as tables:
+            game = ChessVar.from_fen("8/8/8/8/8/4k3/3P4/8 w 1")  # the king stands in front of the pawn
+            self.assertEqual(tables.probe(game), (WIN, 1))
+            move = tables.best_move(game)
+            game.apply_move(*move)
+            self.assertEqual(game.get_game_state(), "WHITE_WON")
+
+            game = ChessVar.from_fen("8/8/8/8/8/4k3/3P4/8 b 2")
+            self.assertEqual(tables.probe(game), (WIN, 1))
+            self.assertIsNone(tables.probe(ChessVar()))
+
+            game = ChessVar.from_fen("8/8/8/8/8/8/k7/P7 w 1")  # the pawn's only move is next to the king
+            self.assertEqual(tables.probe(game), (LOSS, 2))
+
+    def test_probe_needs_an_8x8_board(self):
+        generate("PvK", self.directory, workers=1)
+        board = GameBoard(BoardGeometry(10, 10))
+        board._load_board([[""] * 10 for _ in range(10)])
+        board.set_piece(1, 3, "P")
+        board.set_piece(9, 9, "k")  # square 99, past the end of an 8x8 index
+        with Tablebase(self.directory) as tables:
+            self.assertIsNone(tables.probe_board(board, "WHITE"))
+            self.assertIsNone(tables.probe(ChessVar(board)))
+            self.assertIsNone(tables.best_move(ChessVar(board)))
+
+    def test_smaller_table_is_needed(self):
+        with self.assertRaises(ValueError):
+            generate("PPvK", self.directory, workers=1)
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,234 @@
+# Description: Self-play tournament runner for ChessVar.  Plays N games between two move policies over a process
+#              pool so every core is used, gives every game its own seed so results can be reproduced, and streams
+#              each game's result back as soon as it finishes.
+#
+#              Run:  python tournament.py --white greedy --black random --games 1000 --workers 8
+import argparse
+import concurrent.futures
+import os
+import random
+import time
+
+from ChessVar import ChessVar
+from engine import Engine, PIECE_VALUES
+from mcts import MCTSPlayer
+
+DEFAULT_MAX_PLIES = 400  # games still unfinished after this many moves are recorded as "UNFINISHED"
+
+
+def random_policy(game, rng):
+    """
+    Plays a random valid move
+    :param game: the ChessVar game
+    :param rng: the game's random.Random
+    :return: move as (start_row, start_col, end_row, end_col), or None if there are no moves
+    """
+    moves = game.generate_moves()
+    return rng.choice(moves) if moves else None
+
+
+def greedy_policy(game, rng):
+    """
+    Captures the last piece of a type when it can, otherwise the most valuable piece it can, otherwise plays a
+    random move
+    :param game: the ChessVar game
+    :param rng: the game's random.Random
+    :return: move as (start_row, start_col, end_row, end_col), or None if there are no moves
+    """
+    board = game.get_game_board()
+    opponent = "BLACK" if game.get_current_player() == "WHITE" else "WHITE"
+    moves = game.generate_moves()
+    if not moves:
+        return None
+    best_value, best_moves = 0, moves
+
+    for move in moves:
+        victim = board.get_symbol(move[2], move[3])
+        if victim:
+            value = PIECE_VALUES[victim.lower()]
+            if board.get_piece_count(opponent, victim.lower()) == 1:
+                return move  # wins the game
+            if value > best_value:
+                best_value, best_moves = value, [move]
+            elif value == best_value:
+                best_moves.append(move)
+
+    return rng.choice(best_moves)
+
+
+class EnginePolicy:
+    """
+    Plays the engine's best move at a fixed depth.  The engine is created in the process that uses the policy so
+    the policy itself is cheap to send to worker processes
+    """
+
+    def __init__(self, depth=2, tt_size=1 << 16):
+        self.depth = depth
+        self.tt_size = tt_size
+        self._engine = None
+
+    def __getstate__(self):
+        return {"depth": self.depth, "tt_size": self.tt_size, "_engine": None}
+
+    def __call__(self, game, rng):
+        if self._engine is None:
+            self._engine = Engine(self.tt_size)
+        return self._engine.search(game, depth=self.depth).move
+
+
+class MCTSPolicy:
+    """
+    Plays the Monte Carlo tree search move with a fixed playout budget.  Like EnginePolicy the player is created in
+    the process that uses it.  It keeps its tree between the moves of one game and starts a new player, seeded from
+    the game's rng, for every game so results can still be replayed
+    """
+
+    def __init__(self, playouts=200):
+        self.playouts = playouts
+        self._player = None
+        self._game = None
+
+    def __getstate__(self):
+        return {"playouts": self.playouts, "_player": None, "_game": None}
+
+    def __call__(self, game, rng):
+        if self._game is not game:
+            self._player = MCTSPlayer(self.playouts, seed=rng.random())
+            self._game = game
+        return self._player.search(game).move
+
+
+# Policies that can be given by name
+POLICIES = {
+    "random": random_policy,
+    "greedy": greedy_policy,
+    "engine": EnginePolicy(depth=2),
+    "mcts": MCTSPolicy(playouts=200),
+}
+
+
+def _resolve(policy):
+    return POLICIES[policy] if isinstance(policy, str) else policy
+
+
+def play_game(white, black, seed, max_plies=DEFAULT_MAX_PLIES):
+    """
+    Plays one game between two policies
+    :param white: policy playing white, a name from POLICIES or a callable taking (game, rng)
+    :param black: policy playing black
+    :param seed: seed of the game's random.Random
+    :param max_plies: number of moves after which the game is stopped
+    :return: dict with the seed, winner from get_game_state, ply count and the pieces each color captured
+    """
+    rng = random.Random(seed)
+    players = {"WHITE": _resolve(white), "BLACK": _resolve(black)}
+    game = ChessVar()
+    plies = 0
+
+    while game.get_game_state() == "UNFINISHED" and plies < max_plies:
+        move = players[game.get_current_player()](game, rng)
+        if move is None:
+            break  # the player has no moves
+        game.apply_move(*move)
+        plies += 1
+
+    captured = game.get_game_board().captured_pieces
+    return {
+        "seed": seed,
+        "winner": game.get_game_state(),
+        "plies": plies,
+        "captured": {color: "".join(str(piece) for piece in pieces) for color, pieces in captured.items()},
+    }
+
+
+def _play_games(tasks):
+    """
+    Plays a chunk of games in a worker process
+    :param tasks: list of (game number, white, black, seed, max_plies)
+    :return: list of result dicts, each with the game number and the policy names added
+    """
+    results = []
+    for number, white, black, seed, max_plies in tasks:
+        result = play_game(white, black, seed, max_plies)
+        result["game"] = number
+        result["white"] = white if isinstance(white, str) else getattr(white, "__name__", type(white).__name__)
+        result["black"] = black if isinstance(black, str) else getattr(black, "__name__", type(black).__name__)
+        results.append(result)
+    return results
+
+
+def run_tournament(first, second, games, workers=None, seed=0, max_plies=DEFAULT_MAX_PLIES, chunk_size=4):
+    """
+    Plays games between two policies, swapping colors every game, and yields each result as soon as it finishes.
+    Game n uses seed + n, so any game can be replayed on its own with play_game
+    :param first: policy playing white in the even numbered games, a name from POLICIES or a picklable callable
+    :param second: policy playing white in the odd numbered games
+    :param games: number of games
+    :param workers: number of worker processes, defaults to the number of cores, 1 plays in this process
+    :param seed: seed of the first game
+    :param max_plies: number of moves after which a game is stopped
+    :param chunk_size: games sent to a worker at a time
+    :return: generator of result dicts in the order the games finish
+    """
+    tasks = [(number, first, second, seed + number, max_plies) if number % 2 == 0 else
+             (number, second, first, seed + number, max_plies) for number in range(games)]
+    chunks = [tasks[index:index + chunk_size] for index in range(0, games, chunk_size)]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from _play_games(chunk)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        chunk_iter = iter(chunks)
+
+        while True:
+            while len(pending) < workers * 2:  # keep every worker busy without queueing every game up front
+                chunk = next(chunk_iter, None)
+                if chunk is None:
+                    break
+                pending.add(executor.submit(_play_games, chunk))
+            if not pending:
+                return
+
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a ChessVar self-play tournament")
+    parser.add_argument("--white", default="greedy", choices=sorted(POLICIES), help="policy white in game 0")
+    parser.add_argument("--black", default="random", choices=sorted(POLICIES), help="policy black in game 0")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to the core count")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-plies", type=int, default=DEFAULT_MAX_PLIES)
+    parser.add_argument("--verbose", action="store_true", help="print every game")
+    args = parser.parse_args()
+
+    wins = {"first": 0, "second": 0, "UNFINISHED": 0}  # by role, the two policies may be the same
+    plies = 0
+    start = time.perf_counter()
+
+    for result in run_tournament(args.white, args.black, args.games, args.workers, args.seed, args.max_plies):
+        if result["winner"] == "UNFINISHED":
+            wins["UNFINISHED"] += 1
+        else:
+            white_won = result["winner"] == "WHITE_WON"
+            wins["first" if white_won == (result["game"] % 2 == 0) else "second"] += 1
+        plies += result["plies"]
+        if args.verbose:
+            print(result)
+
+    elapsed = time.perf_counter() - start
+    print("games %d  %s (white in even games) %d  %s (white in odd games) %d  unfinished %d  avg plies %.1f  "
+          "%.1f games/s  %.0f plies/s" % (
+              args.games, args.white, wins["first"], args.black, wins["second"], wins["UNFINISHED"],
+              plies / max(args.games, 1), args.games / elapsed, plies / elapsed))
+
+
+if __name__ == "__main__":
+    main()
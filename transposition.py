@@ -0,0 +1,240 @@
+# Description: Bounded transposition table keyed on the 64-bit Zobrist keys from ChessVar.get_zobrist_key, used to
+#              cache analysis and search results by position instead of by board strings.  SharedTranspositionTable
+#              keeps search entries in shared memory for searches running in several processes.
+from array import array
+from multiprocessing import shared_memory
+
+REPLACEMENT_POLICIES = ("depth", "always")
+
+
+class TranspositionTable:
+    """
+    Fixed size hash table from Zobrist key to a (depth, value) entry.  Each key has a single slot, when two keys
+    share a slot the replacement policy decides which entry is kept:
+
+    "depth": keep the entry searched to the greater depth, a new entry wins ties and always replaces its own key
+    "always": the newest entry always replaces the old one
+    """
+
+    def __init__(self, size=1 << 16, replacement="depth"):
+        """
+        Creates an empty table
+        :param size: number of entries the table holds
+        :param replacement: replacement policy, "depth" or "always"
+        """
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        if replacement not in REPLACEMENT_POLICIES:
+            raise ValueError("replacement must be one of " + ", ".join(REPLACEMENT_POLICIES))
+
+        self._size = size
+        self._replacement = replacement
+        self._keys = array('Q', [0]) * size
+        self._depths = array('h', [-1]) * size  # -1 marks an empty slot
+        self._values = [None] * size
+        self._used = 0
+
+        self.hits = 0  # probes that found their key
+        self.misses = 0  # probes that did not
+
+    def __len__(self):
+        return self._used
+
+    def probe(self, key):
+        """
+        Looks up a position
+        :param key: Zobrist key of the position
+        :return: tuple of (depth, value) stored for the key, or None if the key is not in the table
+        """
+        slot = key % self._size
+
+        if self._depths[slot] >= 0 and self._keys[slot] == key:
+            self.hits += 1
+            return self._depths[slot], self._values[slot]
+
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, value):
+        """
+        Stores the result for a position, subject to the replacement policy
+        :param key: Zobrist key of the position
+        :param depth: depth the value was searched to, 0 for positions that were not searched
+        :param value: the result to cache
+        :return: True if the entry was stored, False if the policy kept the existing entry
+        """
+        slot = key % self._size
+        stored_depth = self._depths[slot]
+
+        if stored_depth < 0:
+            self._used += 1
+        elif self._replacement == "depth" and self._keys[slot] != key and depth < stored_depth:
+            return False  # keep the deeper result of the other position
+
+        self._keys[slot] = key
+        self._depths[slot] = depth
+        self._values[slot] = value
+        return True
+
+    def clear(self):
+        """
+        Removes every entry and resets the hit counters
+        """
+        self._depths = array('h', [-1]) * self._size
+        self._values = [None] * self._size
+        self._used = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_stats(self):
+        """
+        Gets the usage of the table
+        :return: dict with the size, number of used slots, hits and misses
+        """
+        return {"size": self._size, "used": self._used, "hits": self.hits, "misses": self.misses}
+
+
+# Attached shared tables of this process by shared memory name, so a table sent to a worker many times is only
+# attached once
+_ATTACHED = {}
+
+
+def _attach(name, size, replacement):
+    table = _ATTACHED.get(name)
+    if table is None:
+        table = _ATTACHED[name] = SharedTranspositionTable(size, replacement, name)
+    return table
+
+
+class SharedTranspositionTable:
+    """
+    Transposition table in shared memory, so worker processes searching the same position share what they find.
+    Holds the engine's (score, flag, best move) values packed into 64 bits next to the key, and has the same probe
+    and store as TranspositionTable.  Entries are written without locks: the key is stored XORed with the packed
+    value, so an entry half written by another process fails the key check and reads as a miss, never as a wrong
+    result.  The block also holds a stop flag the workers use to end a search together.
+
+    The process that creates the table must unlink it when done.  Processes it starts get the table by pickling it
+    or by passing name
+    """
+
+    def __init__(self, size=1 << 16, replacement="depth", name=None):
+        """
+        Creates a table, or attaches to an existing one
+        :param size: number of entries the table holds
+        :param replacement: replacement policy, "depth" or "always"
+        :param name: shared memory name of an existing table to attach to, None creates a new table
+        """
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        if replacement not in REPLACEMENT_POLICIES:
+            raise ValueError("replacement must be one of " + ", ".join(REPLACEMENT_POLICIES))
+
+        self._size = size
+        self._replacement = replacement
+        if name is None:
+            self._memory = shared_memory.SharedMemory(create=True, size=8 * (2 * size + 1))
+            self._memory.buf[:] = bytes(self._memory.size)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+        self._words = self._memory.buf.cast('Q')  # stop flag, then (key ^ data, data) for each slot
+
+        self.hits = 0  # probes by this process that found their key
+        self.misses = 0  # probes that did not
+
+    def __reduce__(self):
+        return _attach, (self._memory.name, self._size, self._replacement)
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    def __len__(self):
+        words = self._words
+        return sum(1 for slot in range(self._size) if words[2 * slot + 2])
+
+    def probe(self, key):
+        """
+        Looks up a position
+        :param key: Zobrist key of the position
+        :return: tuple of (depth, (score, flag, move)) stored for the key, or None if the key is not in the table
+        """
+        index = 2 * (key % self._size) + 1
+        words = self._words
+        data = words[index + 1]
+
+        if data and words[index] ^ data == key:
+            self.hits += 1
+            move = None
+            if data >> 10 & 1:
+                start, end = data >> 11 & 63, data >> 17 & 63
+                move = (start // 8, start % 8, end // 8, end % 8)
+            return (data & 255) - 1, ((data >> 32) - (1 << 31), data >> 8 & 3, move)
+
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, value):
+        """
+        Stores the result for a position, subject to the replacement policy
+        :param key: Zobrist key of the position
+        :param depth: depth the value was searched to, 0 to 254
+        :param value: tuple of (score, flag, move), the score a 32-bit integer, the flag 0 to 3 and the move
+                      (start_row, start_col, end_row, end_col) or None
+        :return: True if the entry was stored, False if the policy kept the existing entry
+        """
+        index = 2 * (key % self._size) + 1
+        words = self._words
+        stored = words[index + 1]
+
+        if (stored and self._replacement == "depth" and words[index] ^ stored != key and
+                depth < (stored & 255) - 1):
+            return False  # keep the deeper result of the other position
+
+        score, flag, move = value
+        data = (depth + 1) | flag << 8 | (score + (1 << 31)) << 32
+        if move is not None:
+            data |= 1 << 10 | (move[0] * 8 + move[1]) << 11 | (move[2] * 8 + move[3]) << 17
+        words[index] = key ^ data
+        words[index + 1] = data
+        return True
+
+    def request_stop(self):
+        """
+        Tells every process searching with this table to stop
+        """
+        self._words[0] = 1
+
+    def stop_requested(self):
+        return self._words[0] != 0
+
+    def reset_stop(self):
+        self._words[0] = 0
+
+    def clear(self):
+        """
+        Removes every entry, clears the stop flag and resets this process's hit counters
+        """
+        self._memory.buf[:] = bytes(self._memory.size)
+        self.hits = 0
+        self.misses = 0
+
+    def get_stats(self):
+        """
+        Gets the usage of the table
+        :return: dict with the size, number of used slots, and this process's hits and misses
+        """
+        return {"size": self._size, "used": len(self), "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        """
+        Detaches this process from the table
+        """
+        self._words.release()
+        self._memory.close()
+
+    def unlink(self):
+        """
+        Frees the shared memory, called once by the process that created the table after every process closed it
+        """
+        self._memory.unlink()